@@ -0,0 +1,34 @@
+"""Data version counter bumped by the ETL after each load
+
+Revision ID: 0002_data_version
+Revises: 0001_init
+Create Date: 2025-09-02 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0002_data_version"
+down_revision = "0001_init"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Single-row table; readers poll it to invalidate in-process caches
+    op.create_table(
+        "data_version",
+        sa.Column("id", sa.SmallInteger(), primary_key=True, nullable=False),
+        sa.Column("version", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.CheckConstraint("id = 1", name="ck_data_version_single_row"),
+    )
+    op.execute("INSERT INTO data_version (id, version) VALUES (1, 0);")
+
+
+def downgrade() -> None:
+    op.drop_table("data_version")
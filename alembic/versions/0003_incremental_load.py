@@ -0,0 +1,47 @@
+"""Row fingerprints on procedures and source-file/chunk load manifests
+
+Revision ID: 0003_incremental_load
+Revises: 0002_data_version
+Create Date: 2025-09-09 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0003_incremental_load"
+down_revision = "0002_data_version"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Content hash of the loaded values; merges skip rows whose hash is unchanged
+    op.add_column("procedures", sa.Column("row_hash", sa.BigInteger(), nullable=True))
+
+    op.create_table(
+        "load_manifests",
+        sa.Column("source_file", sa.String(length=255), primary_key=True, nullable=False),
+        sa.Column("file_hash", sa.String(length=64), nullable=True),
+        sa.Column("chunk_count", sa.Integer(), nullable=True),
+        sa.Column("row_count", sa.BigInteger(), nullable=True),
+        sa.Column("loaded_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_table(
+        "load_manifest_chunks",
+        sa.Column("source_file", sa.String(length=255), nullable=False),
+        sa.Column("chunk_index", sa.Integer(), nullable=False),
+        sa.Column("chunk_hash", sa.String(length=64), nullable=False),
+        sa.Column("row_count", sa.Integer(), nullable=False),
+        sa.Column("loaded_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint("source_file", "chunk_index", name="pk_load_manifest_chunks"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("load_manifest_chunks")
+    op.drop_table("load_manifests")
+    op.drop_column("procedures", "row_hash")
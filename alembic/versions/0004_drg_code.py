@@ -0,0 +1,54 @@
+"""Structured DRG code on procedures plus a DRG dictionary table
+
+Revision ID: 0004_drg_code
+Revises: 0003_incremental_load
+Create Date: 2025-09-16 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0004_drg_code"
+down_revision = "0003_incremental_load"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "drgs",
+        sa.Column("drg_code", sa.Integer(), primary_key=True, autoincrement=False, nullable=False),
+        sa.Column("description", sa.String(length=255), nullable=True),
+        sa.Column("ms_drg_definition", sa.String(length=255), nullable=False),
+    )
+
+    op.add_column("procedures", sa.Column("drg_code", sa.Integer(), nullable=True))
+    # Backfill from the "<code> - <description>" definitions already loaded
+    op.execute(
+        "UPDATE procedures SET drg_code = substring(ms_drg_definition from '^\\s*(\\d+)')::int "
+        "WHERE ms_drg_definition ~ '^\\s*\\d+';"
+    )
+    op.execute(
+        """
+        INSERT INTO drgs (drg_code, description, ms_drg_definition)
+        SELECT DISTINCT ON (drg_code)
+            drg_code,
+            nullif(trim(regexp_replace(ms_drg_definition, '^\\s*\\d+\\s*-?\\s*', '')), ''),
+            ms_drg_definition
+        FROM procedures
+        WHERE drg_code IS NOT NULL
+        ORDER BY drg_code, ms_drg_definition
+        ON CONFLICT (drg_code) DO NOTHING;
+        """
+    )
+    op.create_index("idx_procedures_drg_code", "procedures", ["drg_code"])
+
+
+def downgrade() -> None:
+    op.drop_index("idx_procedures_drg_code", table_name="procedures")
+    op.drop_column("procedures", "drg_code")
+    op.drop_table("drgs")
@@ -0,0 +1,69 @@
+"""Denormalized provider_search materialized view for radius searches
+
+Revision ID: 0005_provider_search
+Revises: 0004_drg_code
+Create Date: 2025-09-23 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0005_provider_search"
+down_revision = "0004_drg_code"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # btree_gist lets the DRG code and the earth point share one GiST index
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist;")
+
+    # One row per provider x DRG with the earth point precomputed, so searches
+    # neither join nor call ll_to_earth per row
+    op.execute(
+        """
+        CREATE MATERIALIZED VIEW provider_search AS
+        SELECT
+            p.provider_id,
+            p.name,
+            p.city,
+            p.state,
+            p.zip_code,
+            p.latitude,
+            p.longitude,
+            ll_to_earth(p.latitude, p.longitude) AS earth,
+            r.rating,
+            pr.drg_code,
+            pr.ms_drg_definition,
+            pr.total_discharges,
+            pr.average_covered_charges,
+            pr.average_total_payments,
+            pr.average_medicare_payments
+        FROM procedures pr
+        JOIN providers p ON p.provider_id = pr.provider_id
+        LEFT JOIN ratings r ON r.provider_id = p.provider_id
+        WHERE p.latitude IS NOT NULL AND p.longitude IS NOT NULL;
+        """
+    )
+    # Unique index is required for REFRESH ... CONCURRENTLY
+    op.execute(
+        "CREATE UNIQUE INDEX uq_provider_search_provider_drg ON provider_search (provider_id, ms_drg_definition);"
+    )
+    # DRG code + bounding box
+    op.execute("CREATE INDEX idx_provider_search_drg_earth ON provider_search USING gist (drg_code, earth);")
+    # DRG code, ordered by charges
+    op.execute(
+        "CREATE INDEX idx_provider_search_drg_charges ON provider_search (drg_code, average_covered_charges);"
+    )
+    # Free-text DRG searches: bounding box alone, plus trigram on the definition
+    op.execute("CREATE INDEX idx_provider_search_earth ON provider_search USING gist (earth);")
+    op.execute(
+        "CREATE INDEX idx_provider_search_drg_trgm ON provider_search USING GIN (ms_drg_definition gin_trgm_ops);"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS provider_search;")
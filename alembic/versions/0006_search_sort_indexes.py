@@ -0,0 +1,54 @@
+"""Keyset pagination indexes for the provider_search sort orders
+
+Revision ID: 0006_search_sort_indexes
+Revises: 0005_provider_search
+Create Date: 2025-09-30 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0006_search_sort_indexes"
+down_revision = "0005_provider_search"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Each index matches one ORDER BY key in app.queries.sort_keys, so a page
+    # after a cursor is a single row-comparison index range (same cost for any page).
+    # Distance pages use a KNN scan (earth <-> origin) of idx_provider_search_drg_earth.
+    op.execute("DROP INDEX IF EXISTS idx_provider_search_drg_charges;")
+    op.execute(
+        """
+        CREATE INDEX idx_provider_search_drg_charges ON provider_search (
+            drg_code,
+            (average_covered_charges IS NULL),
+            average_covered_charges,
+            provider_id COLLATE "C",
+            ms_drg_definition COLLATE "C"
+        );
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX idx_provider_search_drg_rating ON provider_search (
+            drg_code,
+            (rating IS NULL),
+            (-rating),
+            provider_id COLLATE "C",
+            ms_drg_definition COLLATE "C"
+        );
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_provider_search_drg_rating;")
+    op.execute("DROP INDEX IF EXISTS idx_provider_search_drg_charges;")
+    op.execute(
+        "CREATE INDEX idx_provider_search_drg_charges ON provider_search (drg_code, average_covered_charges);"
+    )
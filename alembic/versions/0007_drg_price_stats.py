@@ -0,0 +1,156 @@
+"""Grid cells on provider_search plus the drg_price_stats regional rollup
+
+Revision ID: 0007_drg_price_stats
+Revises: 0006_search_sort_indexes
+Create Date: 2025-10-07 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0007_drg_price_stats"
+down_revision = "0006_search_sort_indexes"
+branch_labels = None
+depends_on = None
+
+
+# Must match app.price_stats.STATS_CELL_DEG / HIST_RATIO
+CELL_DEG = 0.5
+N_COLS = 720
+HIST_RATIO = 1.02
+
+
+def _create_provider_search(with_grid_cell: bool) -> None:
+    grid_cell = (
+        f",\n            (floor((p.latitude + 90) / {CELL_DEG})::int * {N_COLS}"
+        f" + mod(floor((p.longitude + 180) / {CELL_DEG})::int, {N_COLS})) AS grid_cell"
+        if with_grid_cell
+        else ""
+    )
+    op.execute(
+        f"""
+        CREATE MATERIALIZED VIEW provider_search AS
+        SELECT
+            p.provider_id,
+            p.name,
+            p.city,
+            p.state,
+            p.zip_code,
+            p.latitude,
+            p.longitude,
+            ll_to_earth(p.latitude, p.longitude) AS earth,
+            r.rating,
+            pr.drg_code,
+            pr.ms_drg_definition,
+            pr.total_discharges,
+            pr.average_covered_charges,
+            pr.average_total_payments,
+            pr.average_medicare_payments{grid_cell}
+        FROM procedures pr
+        JOIN providers p ON p.provider_id = pr.provider_id
+        LEFT JOIN ratings r ON r.provider_id = p.provider_id
+        WHERE p.latitude IS NOT NULL AND p.longitude IS NOT NULL;
+        """
+    )
+    # Indexes from 0005 and 0006
+    op.execute(
+        "CREATE UNIQUE INDEX uq_provider_search_provider_drg ON provider_search (provider_id, ms_drg_definition);"
+    )
+    op.execute("CREATE INDEX idx_provider_search_drg_earth ON provider_search USING gist (drg_code, earth);")
+    op.execute("CREATE INDEX idx_provider_search_earth ON provider_search USING gist (earth);")
+    op.execute(
+        "CREATE INDEX idx_provider_search_drg_trgm ON provider_search USING GIN (ms_drg_definition gin_trgm_ops);"
+    )
+    op.execute(
+        """
+        CREATE INDEX idx_provider_search_drg_charges ON provider_search (
+            drg_code, (average_covered_charges IS NULL), average_covered_charges,
+            provider_id COLLATE "C", ms_drg_definition COLLATE "C"
+        );
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX idx_provider_search_drg_rating ON provider_search (
+            drg_code, (rating IS NULL), (-rating), provider_id COLLATE "C", ms_drg_definition COLLATE "C"
+        );
+        """
+    )
+    if with_grid_cell:
+        # Exact refinement of the edge cells of a radius
+        op.execute("CREATE INDEX idx_provider_search_drg_cell ON provider_search (drg_code, grid_cell);")
+
+
+def upgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS provider_search;")
+    _create_provider_search(with_grid_cell=True)
+
+    # Per DRG and region (state, ZIP3, grid cell): counts, sums, min/max and a
+    # discharge-weighted histogram over log-spaced charge buckets (bucket b covers
+    # [HIST_RATIO^b, HIST_RATIO^(b+1)); -1 holds charges <= 0). Sums and
+    # histograms add up, so any set of regions merges without the raw rows.
+    # Rows without a discharge count weigh 1.
+    op.execute(
+        f"""
+        CREATE MATERIALIZED VIEW drg_price_stats AS
+        WITH priced AS (
+            SELECT
+                drg_code,
+                state,
+                left(zip_code, 3) AS zip3,
+                grid_cell,
+                average_covered_charges::float8 AS charges,
+                coalesce(nullif(total_discharges, 0), 1)::float8 AS weight,
+                CASE WHEN average_covered_charges > 0
+                    THEN floor(ln(average_covered_charges::float8) / ln({HIST_RATIO}))::int
+                    ELSE -1 END AS bucket
+            FROM provider_search
+            WHERE drg_code IS NOT NULL AND average_covered_charges IS NOT NULL
+        ), regions AS (
+            SELECT drg_code, 'state'::text AS region_type, state AS region_key, charges, weight, bucket
+            FROM priced WHERE state IS NOT NULL
+            UNION ALL
+            SELECT drg_code, 'zip3', zip3, charges, weight, bucket FROM priced WHERE zip3 ~ '^[0-9]{{3}}$'
+            UNION ALL
+            SELECT drg_code, 'cell', grid_cell::text, charges, weight, bucket FROM priced
+        ), buckets AS (
+            SELECT
+                drg_code, region_type, region_key, bucket,
+                count(*) AS n,
+                sum(weight) AS weight,
+                sum(charges) AS charge_sum,
+                sum(charges * weight) AS weighted_sum,
+                min(charges) AS min_charges,
+                max(charges) AS max_charges
+            FROM regions
+            GROUP BY drg_code, region_type, region_key, bucket
+        )
+        SELECT
+            drg_code,
+            region_type,
+            region_key,
+            sum(n)::int AS provider_count,
+            sum(weight) AS discharges,
+            sum(charge_sum) AS charge_sum,
+            sum(weighted_sum) AS weighted_charge_sum,
+            min(min_charges) AS min_charges,
+            max(max_charges) AS max_charges,
+            array_agg(bucket ORDER BY bucket) AS hist_buckets,
+            array_agg(weight ORDER BY bucket) AS hist_weights
+        FROM buckets
+        GROUP BY drg_code, region_type, region_key;
+        """
+    )
+    # Unique index is required for REFRESH ... CONCURRENTLY; also the lookup key
+    op.execute(
+        "CREATE UNIQUE INDEX uq_drg_price_stats_region ON drg_price_stats (drg_code, region_type, region_key);"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS drg_price_stats;")
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS provider_search;")
+    _create_provider_search(with_grid_cell=False)
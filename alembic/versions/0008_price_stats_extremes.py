@@ -0,0 +1,107 @@
+"""Cheapest and priciest provider per drg_price_stats region
+
+Revision ID: 0008_price_stats_extremes
+Revises: 0007_drg_price_stats
+Create Date: 2025-10-09 00:00:00.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0008_price_stats_extremes"
+down_revision = "0007_drg_price_stats"
+branch_labels = None
+depends_on = None
+
+
+# Must match app.price_stats.HIST_RATIO
+HIST_RATIO = 1.02
+
+
+def _create_drg_price_stats(with_extremes: bool) -> None:
+    # As in 0007. With extremes, each region also names its cheapest and
+    # priciest provider; equal charges go to the lowest provider_id, as in
+    # cheapest_stmt(). Charges only grow with the bucket, so the region's
+    # extreme is the extreme of its first / last bucket.
+    priced_extra = regions_extra = bucket_extremes = region_extremes = ""
+    if with_extremes:
+        priced_extra = ",\n                provider_id,\n                name"
+        regions_extra = ", provider_id, name"
+        bucket_extremes = """,
+                (array_agg(provider_id ORDER BY charges, provider_id COLLATE "C"))[1] AS cheapest_provider_id,
+                (array_agg(name ORDER BY charges, provider_id COLLATE "C"))[1] AS cheapest_name,
+                (array_agg(provider_id ORDER BY charges DESC, provider_id COLLATE "C"))[1] AS priciest_provider_id,
+                (array_agg(name ORDER BY charges DESC, provider_id COLLATE "C"))[1] AS priciest_name"""
+        region_extremes = """,
+            (array_agg(cheapest_provider_id ORDER BY bucket))[1] AS cheapest_provider_id,
+            (array_agg(cheapest_name ORDER BY bucket))[1] AS cheapest_name,
+            (array_agg(priciest_provider_id ORDER BY bucket DESC))[1] AS priciest_provider_id,
+            (array_agg(priciest_name ORDER BY bucket DESC))[1] AS priciest_name"""
+    op.execute(
+        f"""
+        CREATE MATERIALIZED VIEW drg_price_stats AS
+        WITH priced AS (
+            SELECT
+                drg_code,
+                state,
+                left(zip_code, 3) AS zip3,
+                grid_cell,
+                average_covered_charges::float8 AS charges,
+                coalesce(nullif(total_discharges, 0), 1)::float8 AS weight,
+                CASE WHEN average_covered_charges > 0
+                    THEN floor(ln(average_covered_charges::float8) / ln({HIST_RATIO}))::int
+                    ELSE -1 END AS bucket{priced_extra}
+            FROM provider_search
+            WHERE drg_code IS NOT NULL AND average_covered_charges IS NOT NULL
+        ), regions AS (
+            SELECT drg_code, 'state'::text AS region_type, state AS region_key, charges, weight, bucket{regions_extra}
+            FROM priced WHERE state IS NOT NULL
+            UNION ALL
+            SELECT drg_code, 'zip3', zip3, charges, weight, bucket{regions_extra}
+            FROM priced WHERE zip3 ~ '^[0-9]{{3}}$'
+            UNION ALL
+            SELECT drg_code, 'cell', grid_cell::text, charges, weight, bucket{regions_extra} FROM priced
+        ), buckets AS (
+            SELECT
+                drg_code, region_type, region_key, bucket,
+                count(*) AS n,
+                sum(weight) AS weight,
+                sum(charges) AS charge_sum,
+                sum(charges * weight) AS weighted_sum,
+                min(charges) AS min_charges,
+                max(charges) AS max_charges{bucket_extremes}
+            FROM regions
+            GROUP BY drg_code, region_type, region_key, bucket
+        )
+        SELECT
+            drg_code,
+            region_type,
+            region_key,
+            sum(n)::int AS provider_count,
+            sum(weight) AS discharges,
+            sum(charge_sum) AS charge_sum,
+            sum(weighted_sum) AS weighted_charge_sum,
+            min(min_charges) AS min_charges,
+            max(max_charges) AS max_charges,
+            array_agg(bucket ORDER BY bucket) AS hist_buckets,
+            array_agg(weight ORDER BY bucket) AS hist_weights{region_extremes}
+        FROM buckets
+        GROUP BY drg_code, region_type, region_key;
+        """
+    )
+    op.execute(
+        "CREATE UNIQUE INDEX uq_drg_price_stats_region ON drg_price_stats (drg_code, region_type, region_key);"
+    )
+
+
+def upgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS drg_price_stats;")
+    _create_drg_price_stats(with_extremes=True)
+
+
+def downgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS drg_price_stats;")
+    _create_drg_price_stats(with_extremes=False)
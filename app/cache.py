@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import re
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Hashable, Optional
+
+from .config import settings
+
+
+def normalize_drg(term: str) -> str:
+    # DRG matching is case-insensitive, so case and spacing variants share one entry
+    return re.sub(r"\s+", " ", term).strip().lower()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+
+
+@dataclass
+class CachedResponse:
+    payload: bytes
+    expires_at: float
+    # Extra response headers stored with the body (e.g. X-Next-Cursor)
+    headers: dict = field(default_factory=dict)
+
+    @property
+    def size(self) -> int:
+        return len(self.payload) + sum(len(k) + len(v) for k, v in self.headers.items())
+
+
+class ResultCache:
+    # LRU + TTL cache of serialized responses, bounded by total payload bytes.
+    # Entries belong to one data version; seeing a newer version drops them all.
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._bytes = 0
+        self._version: Optional[int] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _sync_version(self, version: int) -> None:
+        if version != self._version:
+            if self._entries:
+                self.stats.invalidations += len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
+
+    def _drop(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def get(self, key: Hashable, version: int) -> Optional[bytes]:
+        entry = self.lookup(key, version)
+        return entry.payload if entry is not None else None
+
+    def lookup(self, key: Hashable, version: int) -> Optional[CachedResponse]:
+        if not self.enabled:
+            return None
+        self._sync_version(version)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._drop(key)
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return entry
+
+    def put(self, key: Hashable, version: int, payload: bytes, headers: Optional[dict] = None) -> None:
+        entry = CachedResponse(payload=payload, expires_at=time.monotonic() + self.ttl_seconds, headers=headers or {})
+        if not self.enabled or entry.size > self.max_bytes:
+            return
+        self._sync_version(version)
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = entry
+        self._bytes += entry.size
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.stats.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def snapshot(self) -> dict:
+        lookups = self.stats.hits + self.stats.misses
+        return {
+            **asdict(self.stats),
+            "hit_ratio": (self.stats.hits / lookups) if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "data_version": self._version,
+        }
+
+
+provider_cache = ResultCache(settings.result_cache_max_bytes, settings.result_cache_ttl_seconds)
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import math
+from typing import Any, Mapping, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import ProviderSearch
+from .pagination import Cursor
+from .queries import DrgFilter, parse_drg_code
+from .versioning import VersionedResource
+
+
+# earthdistance's earth() radius in meters; distances mirror ll_to_earth + earth_distance
+EARTH_RADIUS_M = 6378168.0
+
+# Columns returned per result, in ProviderResult field order
+_TEXT_COLUMNS = ("provider_id", "name", "city", "state", "zip_code")
+_PRICE_COLUMNS = ("average_covered_charges", "average_total_payments", "average_medicare_payments")
+
+
+def ll_to_xyz(lats, lons) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    return (
+        EARTH_RADIUS_M * np.cos(lat) * np.cos(lon),
+        EARTH_RADIUS_M * np.cos(lat) * np.sin(lon),
+        EARTH_RADIUS_M * np.sin(lat),
+    )
+
+
+def _float_column(values) -> np.ndarray:
+    return np.array([float(v) if v is not None else np.nan for v in values], dtype=np.float64)
+
+
+def _rank(*keys: np.ndarray) -> np.ndarray:
+    # Position of each row in np.lexsort order (last key is the primary one)
+    order = np.lexsort(keys)
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return rank
+
+
+class ProviderColumns:
+    # provider_search held as NumPy columns. Rows are sorted by drg_code so an
+    # exact code match is one contiguous slice; free text arrives already
+    # resolved to codes (main.resolve_drg), as on the SQL path. Filtering,
+    # distances and ordering are vectorized; the result matches provider_search_stmt
+    # row for row for every sort order. Price and rating orders are precomputed
+    # as ranks, so sorting a page is an integer argsort.
+
+    def __init__(self, rows: Sequence[Mapping[str, Any]]):
+        codes = np.array([r["drg_code"] if r["drg_code"] is not None else -1 for r in rows], dtype=np.int64)
+        order = np.argsort(codes, kind="stable")
+        rows = [rows[i] for i in order]
+        self.drg_code = codes[order]
+
+        self.text = {name: np.array([r[name] for r in rows], dtype=object) for name in _TEXT_COLUMNS}
+        self.definitions, self.definition_ids = np.unique(
+            np.array([r["ms_drg_definition"] for r in rows], dtype=object), return_inverse=True
+        )
+        self.prices = {name: _float_column(r[name] for r in rows) for name in _PRICE_COLUMNS}
+        self.rating = _float_column(r["rating"] for r in rows)
+        self.x, self.y, self.z = ll_to_xyz([r["latitude"] for r in rows], [r["longitude"] for r in rows])
+
+        # Tie-breaker: codepoint order of (provider_id, definition), as COLLATE "C" in SQL
+        tie = sorted(range(len(rows)), key=lambda i: (rows[i]["provider_id"], rows[i]["ms_drg_definition"]))
+        self.tie_rank = np.empty(len(rows), dtype=np.int64)
+        self.tie_rank[tie] = np.arange(len(rows))
+        # NULLs last: price ascending, rating descending
+        charges, rating = self.prices["average_covered_charges"], self.rating
+        self.sort_rank = {
+            "price": _rank(self.tie_rank, np.nan_to_num(charges), np.isnan(charges)),
+            "rating": _rank(self.tie_rank, -np.nan_to_num(rating), np.isnan(rating)),
+        }
+
+    def __len__(self) -> int:
+        return len(self.drg_code)
+
+    def _drg_rows(self, drg: DrgFilter) -> np.ndarray:
+        # Same filters as queries.drg_condition: a code as typed or resolved codes
+        if drg is not None and not isinstance(drg, str):
+            codes = sorted(set(drg))
+        elif not drg or not drg.strip():
+            return np.arange(len(self))
+        else:
+            code = parse_drg_code(drg)
+            if code is None:
+                raise ValueError(f"free-text DRG term {drg!r}: resolve it to codes with DrgIndex.resolve() first")
+            codes = [code]
+        # Each code is one contiguous slice; codes ascend, so the rows stay in order
+        slices = [np.arange(*np.searchsorted(self.drg_code, [code, code + 1])) for code in codes]
+        return np.concatenate(slices) if slices else np.arange(0)
+
+    def chord_m(self, lat: float, lon: float, idx: np.ndarray) -> np.ndarray:
+        # cube <-> distance between the earth points
+        ox, oy, oz = ll_to_xyz(lat, lon)
+        return np.sqrt((self.x[idx] - ox) ** 2 + (self.y[idx] - oy) ** 2 + (self.z[idx] - oz) ** 2)
+
+    @staticmethod
+    def distance_m(chord: np.ndarray) -> np.ndarray:
+        # earth_distance(): chord length turned into a great-circle distance
+        ratio = chord / (2.0 * EARTH_RADIUS_M)
+        return np.where(ratio > 1.0, math.pi * EARTH_RADIUS_M, 2.0 * EARTH_RADIUS_M * np.arcsin(np.minimum(ratio, 1.0)))
+
+    def _after(self, cursor: Cursor, idx: np.ndarray, chord: np.ndarray) -> np.ndarray:
+        # Mask of rows strictly after the cursor, mirroring queries.keyset_condition
+        pid = self.text["provider_id"][idx]
+        definition = self.definitions[self.definition_ids[idx]]
+        ties = (pid > cursor.provider_id) | ((pid == cursor.provider_id) & (definition > cursor.ms_drg_definition))
+        ties = ties.astype(bool)
+        if cursor.sort == "distance":
+            value = float(cursor.value)
+            return (chord > value) | ((chord == value) & ties)
+        values = self.rating[idx] if cursor.sort == "rating" else self.prices["average_covered_charges"][idx]
+        missing = np.isnan(values)
+        if cursor.value is None:
+            return missing & ties
+        value = float(cursor.value)
+        beyond = values < value if cursor.sort == "rating" else values > value
+        return missing | beyond | ((values == value) & ties)
+
+    def search(
+        self,
+        drg: DrgFilter,
+        lat: float,
+        lon: float,
+        radius_km: float,
+        limit: int = 100,
+        sort: str = "price",
+        after: Optional[Cursor] = None,
+    ) -> tuple[list[dict], Optional[Cursor]]:
+        # One page of results plus the cursor of its last row when more follow
+        idx = self._drg_rows(drg)
+        chord = self.chord_m(lat, lon, idx)
+        dist = self.distance_m(chord)
+        hit = dist <= radius_km * 1000.0
+        idx, chord, dist = idx[hit], chord[hit], dist[hit]
+        if after is not None:
+            keep = self._after(after, idx, chord)
+            idx, chord, dist = idx[keep], chord[keep], dist[keep]
+
+        if sort == "distance":
+            order = np.lexsort((self.tie_rank[idx], chord))
+        else:
+            order = np.argsort(self.sort_rank[sort][idx], kind="stable")
+        has_more = len(order) > limit
+        order = order[:limit]
+        idx, chord, dist = idx[order], chord[order], dist[order]
+
+        columns = {name: values[idx].tolist() for name, values in self.text.items()}
+        columns["ms_drg_definition"] = self.definitions[self.definition_ids[idx]].tolist()
+        for name, values in self.prices.items():
+            columns[name] = [None if v != v else v for v in values[idx].tolist()]
+        columns["rating"] = [None if v != v else int(v) for v in self.rating[idx].tolist()]
+        columns["distance_km"] = (dist / 1000.0).tolist()
+        keys = list(columns)
+        results = [dict(zip(keys, values)) for values in zip(*columns.values())]
+        if not has_more:
+            return results, None
+        last = results[-1]
+        if sort == "distance":
+            value = float(chord[-1])
+        elif sort == "rating":
+            value = last["rating"]
+        else:
+            value = repr(last["average_covered_charges"]) if last["average_covered_charges"] is not None else None
+        return results, Cursor(sort, value, last["provider_id"], last["ms_drg_definition"])
+
+
+async def _fetch_provider_rows(session: AsyncSession) -> Sequence[Mapping[str, Any]]:
+    stmt = select(
+        ProviderSearch.provider_id,
+        ProviderSearch.name,
+        ProviderSearch.city,
+        ProviderSearch.state,
+        ProviderSearch.zip_code,
+        ProviderSearch.latitude,
+        ProviderSearch.longitude,
+        ProviderSearch.drg_code,
+        ProviderSearch.ms_drg_definition,
+        ProviderSearch.average_covered_charges,
+        ProviderSearch.average_total_payments,
+        ProviderSearch.average_medicare_payments,
+        ProviderSearch.rating,
+    )
+    return (await session.execute(stmt)).mappings().all()
+
+
+provider_columns = VersionedResource(_fetch_provider_rows, ProviderColumns)
@@ -1,15 +1,122 @@
+import time
+from dataclasses import asdict, dataclass
+
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from .config import settings
+from .metrics import POOL_TIMEOUTS, POOL_WAIT_SECONDS, instrument_engine, observe_pool
+from .slow_queries import SlowQueryLog
 
 
 Base = declarative_base()
 
-engine = create_async_engine(settings.database_url, pool_pre_ping=True, future=True)
+
+@dataclass
+class PoolStats:
+    checkouts: int = 0
+    waiting: int = 0
+    max_waiting: int = 0
+    wait_seconds_total: float = 0.0
+    max_wait_seconds: float = 0.0
+    timeouts: int = 0
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    # Times every connection checkout, including waits for a free connection
+    # once pool_size + max_overflow are in use (and opening new connections)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        stats = self.stats
+        stats.waiting += 1
+        stats.max_waiting = max(stats.max_waiting, stats.waiting)
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            stats.timeouts += 1
+            POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            stats.waiting -= 1
+            waited = time.perf_counter() - start
+            stats.wait_seconds_total += waited
+            stats.max_wait_seconds = max(stats.max_wait_seconds, waited)
+            POOL_WAIT_SECONDS.observe(waited)
+        stats.checkouts += 1
+        observe_pool(self)
+        return conn
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        observe_pool(self)
+
+
+def _engine_url():
+    # asyncpg-side cache of server-prepared statements, per connection
+    return make_url(settings.database_url).update_query_dict(
+        {"prepared_statement_cache_size": str(settings.db_statement_cache_size)}
+    )
+
+
+engine = create_async_engine(
+    _engine_url(),
+    poolclass=InstrumentedPool,
+    pool_pre_ping=settings.db_pool_pre_ping,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_recycle=settings.db_pool_recycle,
+    query_cache_size=settings.db_query_cache_size,
+    future=True,
+)
+instrument_engine(engine)
 async_session_maker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
 
+slow_query_log = SlowQueryLog(
+    threshold_ms=settings.slow_query_threshold_ms,
+    sample_rate=settings.slow_query_sample_rate,
+    max_entries=settings.slow_query_max_entries,
+)
+
+
+async def explain_analyze(statement: str, parameters: tuple) -> list[str]:
+    # Straight through asyncpg: the statement is already in its $n form, and
+    # going around SQLAlchemy keeps the EXPLAIN itself out of the cursor events
+    async with engine.connect() as conn:
+        raw = await conn.get_raw_connection()
+        rows = await raw.driver_connection.fetch(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", *parameters)
+    return [row[0] for row in rows]
+
+
+if settings.slow_query_log:
+    slow_query_log.install(engine, explain_analyze)
+
+
+def pool_metrics() -> dict:
+    pool = engine.sync_engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "max_overflow": settings.db_max_overflow,
+        **asdict(pool.stats),
+    }
+
+
 async def get_session() -> AsyncSession:
     async with async_session_maker() as session:
         yield session
-
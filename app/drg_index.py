@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import bisect
+import re
+from functools import lru_cache
+from typing import Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .drg_semantic import SEMANTIC_MIN_SCORE, DrgSemanticIndex, covered
+from .models import Drg
+from .queries import parse_drg_code
+from .versioning import VersionedResource
+
+
+# pg_trgm splits text into runs of alphanumerics, lowercases them and pads each
+# word with two spaces in front and one behind
+_WORD_RE = re.compile(r"[^\W_]+")
+
+# Free-text DRG terms match definitions whose word_similarity() reaches
+# DRG_MIN_SIMILARITY (so typos still resolve), plus plain substring matches.
+# Only the DRGs within DRG_MATCH_MARGIN of the best score are kept.
+DRG_MIN_SIMILARITY = 0.4
+DRG_MATCH_MARGIN = 0.1
+
+# Trigram-only suggestions below this word similarity are noise
+SUGGEST_MIN_SIMILARITY = 0.3
+
+
+def words(text: str) -> list[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+def trigrams(text: str) -> list[str]:
+    # In order of appearance, repeats kept (word_similarity needs positions)
+    out = []
+    for word in words(text):
+        padded = f"  {word} "
+        out.extend(padded[i : i + 3] for i in range(len(padded) - 2))
+    return out
+
+
+def _word_similarity(wanted: set, seq: list[str]) -> float:
+    # iterate_word_similarity() from pg_trgm (non-strict mode). The ratios are
+    # compared in double precision: with trigram counts this small, distinct
+    # ratios never round to the same float4, so only the result is rounded.
+    ulen1 = len(wanted)
+    if not ulen1:
+        return 0.0
+    found = [t in wanted for t in seq]
+    lastpos: dict[str, int] = {}
+    lower, count, ulen2, best = -1, 0, 0, 0.0
+    for i, trg in enumerate(seq):
+        if lower >= 0 or found[i]:
+            if lastpos.get(trg, -1) < 0:
+                ulen2 += 1
+                if found[i]:
+                    count += 1
+            lastpos[trg] = i
+        if not found[i]:
+            continue
+        if lower == -1:
+            lower, ulen2 = i, 1
+        current = count / (ulen1 + ulen2 - count)
+        # Moving the start of the run right may drop unmatched trigrams
+        tmp_count, tmp_ulen2, prev_lower = count, ulen2, lower
+        for tmp_lower in range(lower, i + 1):
+            tmp = tmp_count / (ulen1 + tmp_ulen2 - tmp_count)
+            if tmp > current:
+                current, ulen2, lower, count = tmp, tmp_ulen2, tmp_lower, tmp_count
+            t = seq[tmp_lower]
+            if lastpos.get(t) == tmp_lower:
+                tmp_ulen2 -= 1
+                if found[tmp_lower]:
+                    tmp_count -= 1
+        best = max(best, current)
+        if best == 1.0:
+            break
+        for tmp_lower in range(prev_lower, lower):
+            t = seq[tmp_lower]
+            if lastpos.get(t) == tmp_lower:
+                lastpos[t] = -1
+    return float(np.float32(best))
+
+
+def word_similarity(needle: str, haystack: str) -> float:
+    # pg_trgm word_similarity(needle, haystack): the best similarity between the
+    # needle's trigram set and any contiguous run of the haystack's trigrams
+    return _word_similarity(set(trigrams(needle)), trigrams(haystack))
+
+
+class DrgIndex:
+    # The DRG dictionary (a few hundred definitions) held for fuzzy lookups:
+    # a sorted word list for prefix matches and a trigram -> entries inverted
+    # index, so a query only scores definitions that share enough trigrams.
+    # resolve() ranks by pg_trgm word_similarity() (DRG_MIN_SIMILARITY) and by
+    # TF-IDF similarity to the definitions and lay synonyms (drg_semantic), so
+    # "knee replacment" and "heart attack" both land on the right codes.
+
+    def __init__(self, entries: Sequence[tuple[int, str]]):
+        entries = sorted(set(entries))
+        self.codes = np.array([code for code, _ in entries], dtype=np.int64)
+        self.definitions = [definition for _, definition in entries]
+        self.lowered = [d.lower() for d in self.definitions]
+        prefixes = sorted({(w, i) for i, d in enumerate(self.definitions) for w in words(d)})
+        self.prefix_words = [w for w, _ in prefixes]
+        self.prefix_ids = np.array([i for _, i in prefixes], dtype=np.int64)
+        self.trigrams = [trigrams(d) for d in self.definitions]
+        postings: dict[str, list[int]] = {}
+        for i, seq in enumerate(self.trigrams):
+            for trg in set(seq):
+                postings.setdefault(trg, []).append(i)
+        self.postings = {trg: np.array(ids, dtype=np.int64) for trg, ids in postings.items()}
+        self.semantic = DrgSemanticIndex(self.codes.tolist(), self.definitions)
+        self._resolve = lru_cache(maxsize=4096)(self._ranked)
+        self._suggest = lru_cache(maxsize=4096)(self._suggestions)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def _shared(self, wanted: set) -> np.ndarray:
+        # Distinct trigrams of the query found in each definition
+        hits = [self.postings[t] for t in wanted if t in self.postings]
+        if not hits:
+            return np.zeros(len(self), dtype=np.int64)
+        return np.bincount(np.concatenate(hits), minlength=len(self))
+
+    def _scores(self, term: str, min_score: float) -> dict[int, float]:
+        # word_similarity >= min_score for every definition that can reach it;
+        # the score is at most shared / ulen1, which prunes the rest
+        wanted = set(trigrams(term))
+        if not wanted:
+            return {}
+        shared = self._shared(wanted)
+        candidates = np.flatnonzero(shared >= min_score * len(wanted))
+        scores = {}
+        for i in candidates.tolist():
+            score = _word_similarity(wanted, self.trigrams[i])
+            if score >= min_score:
+                scores[i] = score
+        return scores
+
+    def _ranked(self, term: str) -> tuple[int, ...]:
+        # Trigram matches must contain every query word (typos allowed), so
+        # "heart surgery" does not land on HEART FAILURE
+        query_words = words(term)
+        scores = {
+            i: score
+            for i, score in self._scores(term, DRG_MIN_SIMILARITY).items()
+            if covered(query_words, self.semantic.row_words[i], skip_generic=False)
+        }
+        # Literal, case-insensitive containment: % and _ in the term are not wildcards
+        needle = term.lower()
+        substring = {i for i, d in enumerate(self.lowered) if needle in d}
+        wanted = set(trigrams(term))
+        for i in substring:
+            scores.setdefault(i, _word_similarity(wanted, self.trigrams[i]))
+        # An entry's score is the better of its trigram and TF-IDF scores
+        semantic = self.semantic.scores(term)
+        for i in np.flatnonzero(semantic >= SEMANTIC_MIN_SCORE).tolist():
+            scores[i] = max(scores.get(i, 0.0), float(semantic[i]))
+        if not scores:
+            return ()
+        best = max(scores.values())
+        kept = [i for i, s in scores.items() if i in substring or s >= best - DRG_MATCH_MARGIN]
+        kept.sort(key=lambda i: (-scores[i], self.codes[i]))
+        return tuple(dict.fromkeys(int(self.codes[i]) for i in kept))
+
+    def resolve(self, term: Optional[str]) -> list[int]:
+        # DRG codes a free-text term stands for, best match first
+        if not term or not term.strip():
+            return []
+        code = parse_drg_code(term)
+        if code is not None:
+            return [code]
+        return list(self._resolve(term.strip()))
+
+    def _prefix_hits(self, word: str) -> set:
+        lo = bisect.bisect_left(self.prefix_words, word)
+        hi = bisect.bisect_left(self.prefix_words, word + "\U0010ffff", lo)
+        return set(self.prefix_ids[lo:hi].tolist())
+
+    def _suggestions(self, q: str, limit: int) -> tuple[int, ...]:
+        # Definitions containing every query word as a word prefix come first
+        # (what the user is typing), then typo-tolerant trigram matches. Both
+        # are ordered by shared trigrams; word_similarity() only runs on the
+        # few trigram candidates that could fill the remaining slots.
+        tokens = words(q)
+        if not tokens:
+            return ()
+        hits = self._prefix_hits(tokens[0])
+        for token in tokens[1:]:
+            hits &= self._prefix_hits(token)
+        wanted = set(trigrams(q))
+        shared = self._shared(wanted)
+        ranked = sorted(hits, key=lambda i: (-shared[i], self.codes[i]))[:limit]
+        if len(ranked) < limit:
+            candidates = np.flatnonzero(shared >= SUGGEST_MIN_SIMILARITY * len(wanted))
+            candidates = [i for i in candidates[np.argsort(-shared[candidates], kind="stable")].tolist() if i not in hits]
+            fuzzy = {}
+            for i in candidates[: 2 * limit]:
+                score = _word_similarity(wanted, self.trigrams[i])
+                if score >= SUGGEST_MIN_SIMILARITY:
+                    fuzzy[i] = score
+            ranked += sorted(fuzzy, key=lambda i: (-fuzzy[i], self.codes[i]))
+        return tuple(ranked[:limit])
+
+    def suggest(self, q: str, limit: int = 10) -> list[dict]:
+        return [
+            {"drg_code": int(self.codes[i]), "ms_drg_definition": self.definitions[i]}
+            for i in self._suggest(" ".join(words(q)), limit)
+        ]
+
+
+async def _fetch_drgs(session: AsyncSession) -> list[tuple[int, str]]:
+    rows = (await session.execute(select(Drg.drg_code, Drg.ms_drg_definition))).all()
+    return [(r.drg_code, r.ms_drg_definition) for r in rows]
+
+
+drg_index = VersionedResource(_fetch_drgs, DrgIndex)
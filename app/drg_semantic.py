@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import math
+import re
+from typing import Sequence
+
+import numpy as np
+
+
+# Lay terms -> MS-DRG codes. Only codes present in the loaded dictionary are
+# used, so older or newer grouper versions simply contribute fewer rows.
+SYNONYMS = {
+    "hip replacement": (469, 470),
+    "knee replacement": (469, 470),
+    "joint replacement": (461, 462, 469, 470),
+    "hip surgery": (469, 470, 480, 481, 482),
+    "brain surgery": (25, 26, 27),
+    "heart surgery": (216, 217, 218, 219, 220, 221, 231, 232, 233, 234, 235, 236),
+    "knee surgery": (469, 470, 485, 486, 487, 488, 489),
+    "hip fracture": (480, 481, 482, 535, 536),
+    "broken hip": (480, 481, 482, 535, 536),
+    "back surgery": (453, 454, 455, 459, 460, 518, 519, 520),
+    "spine surgery": (453, 454, 455, 459, 460, 471, 472, 473, 518, 519, 520),
+    "neck surgery": (471, 472, 473),
+    "heart attack": (280, 281, 282),
+    "myocardial infarction": (280, 281, 282),
+    "chf": (291, 292, 293),
+    "congestive heart failure": (291, 292, 293),
+    "heart bypass": (231, 232, 233, 234, 235, 236),
+    "bypass surgery": (231, 232, 233, 234, 235, 236),
+    "cabg": (231, 232, 233, 234, 235, 236),
+    "cardiac stent": (246, 247, 248, 249, 321, 322),
+    "angioplasty": (246, 247, 248, 249, 250, 251, 321, 322),
+    "pacemaker": (242, 243, 244),
+    "afib": (308, 309, 310),
+    "atrial fibrillation": (308, 309, 310),
+    "irregular heartbeat": (308, 309, 310),
+    "chest pain": (313,),
+    "fainting": (312,),
+    "stroke": (64, 65, 66),
+    "mini stroke": (69,),
+    "tia": (69,),
+    "pneumonia": (193, 194, 195),
+    "lung infection": (177, 178, 179, 193, 194, 195),
+    "copd": (190, 191, 192),
+    "emphysema": (190, 191, 192),
+    "asthma": (202, 203),
+    "respiratory failure": (189, 207, 208),
+    "ventilator": (207, 208),
+    "sepsis": (871, 872),
+    "blood infection": (871, 872),
+    "kidney failure": (682, 683, 684),
+    "uti": (689, 690),
+    "urinary tract infection": (689, 690),
+    "bladder infection": (689, 690),
+    "kidney infection": (689, 690),
+    "gi bleed": (377, 378, 379),
+    "stomach bleeding": (377, 378, 379),
+    "stomach flu": (391, 392),
+    "gastroenteritis": (391, 392),
+    "bowel surgery": (329, 330, 331),
+    "colon surgery": (329, 330, 331),
+    "appendectomy": (338, 339, 340, 341, 342, 343),
+    "appendix removal": (338, 339, 340, 341, 342, 343),
+    "gallbladder removal": (411, 412, 413, 414, 415, 416, 417, 418, 419),
+    "cholecystectomy": (411, 412, 413, 414, 415, 416, 417, 418, 419),
+    "pancreatitis": (438, 439, 440),
+    "diabetes": (637, 638, 639),
+    "dehydration": (640, 641),
+    "skin infection": (602, 603),
+    "hysterectomy": (742, 743),
+    "c section": (783, 784, 785, 786, 787, 788),
+    "cesarean": (783, 784, 785, 786, 787, 788),
+    "childbirth": (783, 784, 785, 786, 787, 788, 805, 806, 807),
+    "vaginal delivery": (805, 806, 807),
+    "psychosis": (885,),
+    "alcohol abuse": (894, 895, 896, 897),
+    "drug overdose": (917, 918),
+    "poisoning": (917, 918),
+}
+
+# TF-IDF matches below this cosine are not considered
+SEMANTIC_MIN_SCORE = 0.5
+
+# Head words that say what kind of thing is meant, not what part of the body or
+# which condition. A TF-IDF match only counts when every other query word is
+# found in the matched text; otherwise "eye surgery" would match "hip surgery".
+GENERIC_WORDS = frozenset(
+    """
+    surgery surgeries surgical operation operations procedure procedures treatment treatments disease diseases
+    disorder disorders infection infections problem problems condition conditions repair
+    """.split()
+)
+
+# Character n-gram lengths (within padded words, so prefixes and suffixes count)
+NGRAM_RANGE = (3, 5)
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+def _grams(word: str) -> set:
+    padded = f" {word} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def covered(query_words: Sequence[str], text_words: Sequence[str], skip_generic: bool = True) -> bool:
+    # Every (specific) query word appears in the text as a word, a word prefix,
+    # or with a typo (at least half of its trigrams found in one text word)
+    for word in query_words:
+        if (skip_generic and word in GENERIC_WORDS) or word in text_words:
+            continue
+        grams = _grams(word)
+        if not any(
+            w.startswith(word) or 2 * len(grams & _grams(w)) >= len(grams) for w in text_words
+        ):
+            return False
+    return True
+
+
+def features(text: str) -> tuple[dict, dict]:
+    # (character n-gram counts, word counts)
+    chars: dict = {}
+    tokens: dict = {}
+    lo, hi = NGRAM_RANGE
+    for word in _WORD_RE.findall(text.lower()):
+        tokens[word] = tokens.get(word, 0) + 1
+        padded = f" {word} "
+        for n in range(lo, hi + 1):
+            for i in range(len(padded) - n + 1):
+                gram = padded[i : i + n]
+                chars[gram] = chars.get(gram, 0) + 1
+    return chars, tokens
+
+
+class TfidfMatrix:
+    # TF-IDF rows (sublinear tf, smoothed idf) in two blocks, character n-grams
+    # and words, each L2-normalized and scaled by 1/sqrt(2). The dot product of
+    # two such vectors is the mean of the two cosines. Stored as CSR of the
+    # transpose (feature -> rows), so scoring a query touches only the columns
+    # of its own features: one gather and one np.bincount.
+
+    def __init__(self, texts: Sequence[str]):
+        docs = [features(t) for t in texts]
+        self.n_rows = len(docs)
+        self.vocab: list[dict] = [{}, {}]
+        df: list[dict] = [{}, {}]
+        for doc in docs:
+            for block, counts in enumerate(doc):
+                for f in counts:
+                    df[block][f] = df[block].get(f, 0) + 1
+        self.idf: list[np.ndarray] = []
+        offset = 0
+        for block in (0, 1):
+            names = sorted(df[block])
+            self.vocab[block] = {f: offset + j for j, f in enumerate(names)}
+            self.idf.append(np.array([math.log((1 + self.n_rows) / (1 + df[block][f])) + 1.0 for f in names]))
+            offset += len(names)
+        self.n_features = offset
+
+        cols, rows, data = [], [], []
+        for r, doc in enumerate(docs):
+            ids, weights = self._weights(doc)
+            cols.append(ids)
+            rows.append(np.full(len(ids), r, dtype=np.int64))
+            data.append(weights)
+        cols = np.concatenate(cols) if cols else np.zeros(0, dtype=np.int64)
+        rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+        data = np.concatenate(data) if data else np.zeros(0)
+        order = np.argsort(cols, kind="stable")
+        self.rows, self.data = rows[order], data[order]
+        self.indptr = np.zeros(self.n_features + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cols, minlength=self.n_features), out=self.indptr[1:])
+
+    def _weights(self, doc: tuple[dict, dict]) -> tuple[np.ndarray, np.ndarray]:
+        # Known features of a document and their weights
+        all_ids, all_weights = [], []
+        start = 0
+        for block, counts in enumerate(doc):
+            vocab = self.vocab[block]
+            known = [(vocab[f], c) for f, c in counts.items() if f in vocab]
+            if known:
+                ids = np.array([i for i, _ in known], dtype=np.int64)
+                tf = 1.0 + np.log(np.array([c for _, c in known], dtype=np.float64))
+                w = tf * self.idf[block][ids - start]
+                all_ids.append(ids)
+                all_weights.append(w / np.linalg.norm(w) / math.sqrt(2.0))
+            start += len(vocab)
+        if not all_ids:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        return np.concatenate(all_ids), np.concatenate(all_weights)
+
+    def scores(self, text: str) -> np.ndarray:
+        # Cosine similarity of the text against every row
+        ids, weights = self._weights(features(text))
+        if not len(ids):
+            return np.zeros(self.n_rows)
+        starts, ends = self.indptr[ids], self.indptr[ids + 1]
+        lengths = ends - starts
+        total = int(lengths.sum())
+        if not total:
+            return np.zeros(self.n_rows)
+        # Positions of every stored value in the query's columns
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+        return np.bincount(
+            self.rows[offsets], weights=self.data[offsets] * np.repeat(weights, lengths), minlength=self.n_rows
+        )
+
+
+class DrgSemanticIndex:
+    # TF-IDF over each DRG definition (without the code) plus the synonym
+    # phrases. An entry scores the best of its rows: its own definition or any
+    # synonym naming its code.
+
+    def __init__(self, codes: Sequence[int], definitions: Sequence[str]):
+        entries: dict[int, list[int]] = {}
+        for i, code in enumerate(codes):
+            entries.setdefault(int(code), []).append(i)
+        texts = [d.split(" - ", 1)[-1] for d in definitions]
+        owners = [[i] for i in range(len(texts))]
+        for phrase, targets in SYNONYMS.items():
+            owned = [i for code in targets for i in entries.get(code, ())]
+            if owned:
+                texts.append(phrase)
+                owners.append(owned)
+        self.n_entries = len(definitions)
+        self.row_words = [frozenset(_WORD_RE.findall(t.lower())) for t in texts]
+        self.matrix = TfidfMatrix(texts)
+        # (row, entry) pairs, so the per-entry maximum is one np.maximum.at
+        self.owner_rows = np.array([r for r, owned in enumerate(owners) for _ in owned], dtype=np.int64)
+        self.owner_entries = np.array([i for owned in owners for i in owned], dtype=np.int64)
+
+    def scores(self, text: str) -> np.ndarray:
+        # Best cosine per DrgIndex entry, from rows that cover the text
+        row_scores = self.matrix.scores(text)
+        query_words = _WORD_RE.findall(text.lower())
+        for r in np.flatnonzero(row_scores >= SEMANTIC_MIN_SCORE).tolist():
+            if not covered(query_words, self.row_words[r]):
+                row_scores[r] = 0.0
+        out = np.zeros(self.n_entries)
+        np.maximum.at(out, self.owner_entries, row_scores[self.owner_rows])
+        return out
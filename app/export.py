@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import csv
+import io
+from typing import AsyncIterator, Iterable, Optional
+
+import orjson
+
+from .config import settings
+from .database import async_session_maker
+from .serialization import RESULT_COLUMNS, result_dicts
+
+
+EXPORT_COLUMNS = RESULT_COLUMNS
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def encode_ndjson(rows: Iterable) -> bytes:
+    return b"".join(orjson.dumps(item) + b"\n" for item in result_dicts(rows))
+
+
+def encode_csv(rows: Iterable, header: bool = False) -> bytes:
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    width = len(EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow(["" if value is None else value for value in tuple(row)[:width]])
+    return buf.getvalue().encode()
+
+
+async def stream_export(stmt, fmt: str, params: Optional[dict] = None) -> AsyncIterator[bytes]:
+    # Rows come from a server-side cursor in fixed-size batches and are encoded
+    # batch by batch, so memory stays flat and the first bytes go out while the
+    # query is still running. The session lives inside the generator because
+    # request-scoped dependencies are closed before the body is streamed.
+    batch_rows = settings.export_batch_rows
+    if fmt == "csv":
+        yield encode_csv((), header=True)
+    async with async_session_maker() as session:
+        result = await session.stream(stmt, params, execution_options={"yield_per": batch_rows})
+        async for rows in result.partitions(batch_rows):
+            yield encode_csv(rows) if fmt == "csv" else encode_ndjson(rows)
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import sys
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from .config import settings
+
+
+# US ZIP5 codes are dense in [00000, 99999], so a flat array indexed by the
+# integer ZIP gives O(1) lookups with no hashing and no per-call allocation.
+ZIP_SPACE = 100_000
+
+
+class ZipIndex:
+    def __init__(self, table: np.ndarray):
+        if table.shape != (ZIP_SPACE, 2):
+            raise ValueError(f"ZIP table must have shape ({ZIP_SPACE}, 2), got {table.shape}")
+        self.table = table
+        # memoryview indexing returns plain Python floats, which is cheaper
+        # than going through numpy scalars on the request path
+        self._flat = memoryview(np.ascontiguousarray(table, dtype=np.float64)).cast("B").cast("d")
+
+    @classmethod
+    def from_frame(cls, frame) -> "ZipIndex":
+        # frame: DataFrame with postal_code, latitude, longitude columns
+        table = np.full((ZIP_SPACE, 2), np.nan, dtype=np.float64)
+        codes = frame["postal_code"].astype(str).str.strip()
+        ok = codes.str.fullmatch(r"\d{5}") & frame["latitude"].notna() & frame["longitude"].notna()
+        idx = codes[ok].astype(np.int64).to_numpy()
+        table[idx, 0] = frame.loc[ok, "latitude"].astype(np.float64).to_numpy()
+        table[idx, 1] = frame.loc[ok, "longitude"].astype(np.float64).to_numpy()
+        return cls(table)
+
+    @classmethod
+    def from_pgeocode(cls, country: str = "us") -> "ZipIndex":
+        import pgeocode
+
+        nomi = pgeocode.Nominatim(country)
+        # One vectorized query over the whole ZIP space instead of per-request lookups
+        frame = nomi.query_postal_code([f"{i:05d}" for i in range(ZIP_SPACE)])
+        return cls.from_frame(frame)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "ZipIndex":
+        return cls(np.load(path, mmap_mode="r"))
+
+    def save(self, path: str | Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as fh:
+            np.save(fh, np.asarray(self.table, dtype=np.float64))
+        tmp.replace(path)
+
+    def lookup(self, zip_code: str) -> Optional[tuple[float, float]]:
+        if len(zip_code) != 5 or not (zip_code.isascii() and zip_code.isdigit()):
+            return None
+        i = int(zip_code) * 2
+        lat = self._flat[i]
+        if lat != lat:  # NaN: unknown ZIP
+            return None
+        return lat, self._flat[i + 1]
+
+    def lookup_many(self, zip_codes) -> tuple[np.ndarray, np.ndarray]:
+        # Vectorized lookup for an iterable of ZIP strings; unknown or malformed -> NaN
+        codes = np.asarray(zip_codes, dtype=object)
+        lat = np.full(len(codes), np.nan, dtype=np.float64)
+        lon = np.full(len(codes), np.nan, dtype=np.float64)
+        valid = np.fromiter(
+            (isinstance(z, str) and len(z) == 5 and z.isascii() and z.isdigit() for z in codes),
+            dtype=bool,
+            count=len(codes),
+        )
+        if valid.any():
+            idx = codes[valid].astype(np.int64)
+            lat[valid] = self.table[idx, 0]
+            lon[valid] = self.table[idx, 1]
+        return lat, lon
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(~np.isnan(self.table[:, 0])))
+
+
+def load_zip_index(path: str | Path) -> ZipIndex:
+    # Prefer the memory-mapped snapshot; build it from pgeocode once if missing
+    path = Path(path)
+    if path.exists():
+        return ZipIndex.load(path)
+    index = ZipIndex.from_pgeocode()
+    try:
+        index.save(path)
+    except OSError:
+        pass
+    return index
+
+
+@lru_cache(maxsize=None)
+def get_zip_index() -> ZipIndex:
+    return load_zip_index(settings.zip_index_path)
+
+
+if __name__ == "__main__":
+    # Build (or rebuild) the snapshot: python -m app.geo [path]
+    target = Path(sys.argv[1] if len(sys.argv) > 1 else settings.zip_index_path)
+    ZipIndex.from_pgeocode().save(target)
+    print(f"Wrote ZIP centroid snapshot to {target} ({len(ZipIndex.load(target))} ZIPs)")
@@ -1,122 +1,265 @@
 from __future__ import annotations
 
-import math
-from typing import List
+import asyncio
+import secrets
+from contextlib import asynccontextmanager
+from typing import List, Literal, Optional
 
 import orjson
-import pgeocode
-from fastapi import Depends, FastAPI, HTTPException, Query
-from fastapi.responses import ORJSONResponse
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy import and_, func, literal, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from .cache import normalize_drg, provider_cache
+from .columnar import provider_columns
 from .config import settings
-from .database import get_session
-from .models import Procedure, Provider, Rating
-from .nl import extract_params_with_openai, is_scope_relevant
-from .schemas import AskRequest, AskResponse, ProviderResult
+from .database import async_session_maker, get_session, pool_metrics, slow_query_log
+from .drg_index import drg_index
+from .export import MEDIA_TYPES, stream_export
+from .geo import get_zip_index
+from .metrics import MetricsMiddleware, mark_process_dead, render, timed
+from .nl import aclose_async_client, extract_params_async, is_scope_relevant, parse_cache
+from .pagination import NEXT_CURSOR_HEADER, Cursor, InvalidCursor, decode_cursor, encode_cursor
+from .price_stats import radius_price_summary, region_price_summary
+from .queries import (
+    average_cost_stmt,
+    best_rated_stmt,
+    cheapest_stmt,
+    compare_costs_stmt,
+    DrgFilter,
+    drg_cache_key,
+    parse_drg_code,
+    provider_search_query,
+    search_conditions,
+)
+from .schemas import AskRequest, AskResponse, BatchQuery, BatchRequest, BatchResponse, ProviderResult
+from .serialization import encode_results
+from .slow_queries import RequestContextMiddleware
+from .spatial import providers_within
+from .versioning import data_version
 
 
-def _orjson_dumps(v, *, default):
-    return orjson.dumps(v, default=default).decode()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the ZIP centroid snapshot before serving instead of on the first request
+    get_zip_index()
+    if settings.search_backend == "memory":
+        async with async_session_maker() as session:
+            await provider_columns.get(session)
+            await drg_index.get(session)
+    yield
+    await aclose_async_client()
+    parse_cache.close()
+    mark_process_dead()
 
 
-app = FastAPI(title=settings.app_name, default_response_class=ORJSONResponse)
+app = FastAPI(title=settings.app_name, default_response_class=ORJSONResponse, lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
+if settings.slow_query_log:
+    # Lets captured slow queries name the route and parameters that issued them
+    app.add_middleware(RequestContextMiddleware)
 
 
 # Serve simple static frontend at /ui (directory created below)
 app.mount("/ui", StaticFiles(directory="frontend", html=True), name="ui")
 
 
-nomi = pgeocode.Nominatim("us")
+def geocode_zip(zip_code: str) -> tuple[float, float]:
+    with timed("geocode"):
+        coords = get_zip_index().lookup(zip_code)
+    if coords is None:
+        raise HTTPException(status_code=400, detail="Invalid or unsupported ZIP code for geocoding")
+    return coords
 
 
-def haversine_sql(lat_lit: float, lon_lit: float, lat_col, lon_col):
-    # Haversine distance in kilometers between (lat_lit, lon_lit) and (lat_col, lon_col)
-    lat1 = func.radians(literal(lat_lit))
-    lon1 = func.radians(literal(lon_lit))
-    lat2 = func.radians(lat_col)
-    lon2 = func.radians(lon_col)
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    a = func.pow(func.sin(dlat / 2.0), 2) + func.cos(lat1) * func.cos(lat2) * func.pow(func.sin(dlon / 2.0), 2)
-    c = 2.0 * func.atan2(func.sqrt(a), func.sqrt(1.0 - a))
-    return 6371.0 * c
+async def resolve_drg(session: AsyncSession, term: Optional[str]) -> DrgFilter:
+    # Free text -> the DRG codes it stands for, ranked in-process over the DRG
+    # dictionary (trigram + TF-IDF), so SQL is an exact drg_code lookup. Codes
+    # and empty terms pass through.
+    if not term or not term.strip() or parse_drg_code(term) is not None:
+        return term
+    index = await drg_index.get(session)
+    with timed("drg_resolve"):
+        return index.resolve(term)
 
 
-def geocode_zip(zip_code: str) -> tuple[float, float]:
-    rec = nomi.query_postal_code(zip_code)
-    if rec is None or (isinstance(rec.latitude, float) and math.isnan(rec.latitude)):
-        raise HTTPException(status_code=400, detail="Invalid or unsupported ZIP code for geocoding")
-    return float(rec.latitude), float(rec.longitude)
+def _page_response(payload: bytes, headers: dict) -> Response:
+    return Response(content=payload, media_type="application/json", headers=headers)
+
+
+async def _provider_page(
+    session: AsyncSession,
+    drg: str,
+    zip_code: str,
+    lat: float,
+    lon: float,
+    radius_km: int,
+    sort: str = "price",
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> tuple[bytes, dict]:
+    # One /providers page as (JSON body, headers), served from the result cache
+    # when possible. Raises InvalidCursor for a cursor from another search.
+    drg = normalize_drg(drg)
+    # Cursors are tied to the search (not the page size) and resume right after
+    # the last row returned. Price and rating pages are an index range scan per
+    # DRG code (queries.provider_search_stmt); distance pages re-walk the KNN
+    # order up to the cursor, so they get slower the further a search pages.
+    query = (drg_cache_key(drg), zip_code, radius_km, sort)
+    after = decode_cursor(cursor, sort, query)
+    version = await data_version.current(session)
+    cache_key = ("providers", *query, limit, cursor)
+    with timed("result_cache"):
+        cached = provider_cache.lookup(cache_key, version)
+    if cached is not None:
+        return cached.payload, cached.headers
+
+    # Both backends filter on the codes resolved here, from the drgs dictionary
+    drg_filter = await resolve_drg(session, drg)
+    if drg_filter == []:
+        # Free text that names no DRG
+        payload = orjson.dumps([])
+        provider_cache.put(cache_key, version, payload)
+        return payload, {}
+
+    if settings.search_backend == "memory":
+        columns = await provider_columns.get(session)
+        with timed("memory_search"):
+            results, next_cursor = columns.search(drg_filter, lat, lon, radius_km, limit=limit, sort=sort, after=after)
+        with timed("serialize"):
+            payload = orjson.dumps(results)
+        headers = {NEXT_CURSOR_HEADER: encode_cursor(next_cursor, query)} if next_cursor is not None else {}
+        provider_cache.put(cache_key, version, payload, headers)
+        return payload, headers
+
+    # Radius filter runs against the in-process spatial index when enabled; SQL
+    # then only applies the DRG match to the candidate providers
+    with timed("spatial_index"):
+        nearby = await providers_within(session, lat, lon, radius_km)
+    distances = None
+    if nearby is not None:
+        if len(nearby[0]) == 0:
+            payload = orjson.dumps([])
+            provider_cache.put(cache_key, version, payload)
+            return payload, {}
+        distances = dict(zip(nearby[0].tolist(), nearby[1].tolist()))
+
+    # Served from the provider_search materialized view (no per-request join)
+    # through a prebuilt statement for this query shape; one extra row tells
+    # whether another page follows
+    stmt, params = provider_search_query(
+        drg_filter,
+        lat,
+        lon,
+        radius_km,
+        limit=limit + 1,
+        provider_ids=list(distances) if distances is not None else None,
+        sort=sort,
+        after=after,
+    )
+
+    result = await session.execute(stmt, params)
+    with timed("materialize"):
+        rows = result.all()
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if sort == "price":
+            value = str(last.sort_key) if last.sort_key is not None else None
+        elif sort == "distance":
+            value = float(last.sort_key)
+        else:
+            value = last.sort_key
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            Cursor(sort, value, last.provider_id, last.ms_drg_definition), query
+        )
+    # Rows are already in ProviderResult shape (float prices from SQL); encode
+    # them directly instead of building and re-validating models.
+    # response_model on the route still documents the schema.
+    with timed("serialize"):
+        payload = encode_results(rows, distances)
+    provider_cache.put(cache_key, version, payload, headers)
+    return payload, headers
 
 
 @app.get("/providers", response_model=List[ProviderResult])
 async def get_providers(
+    drg: str = Query(..., description="DRG code (exact match, e.g. 470 or 'DRG 470') or text to search in ms_drg_definition"),
+    zip: str = Query(..., min_length=5, max_length=5, description="Base ZIP code"),
+    radius_km: int = Query(40, ge=1, le=500, description="Search radius in kilometers"),
+    sort: Literal["price", "distance", "rating"] = Query("price", description="price (lowest first), distance (nearest first) or rating (highest first)"),
+    limit: int = Query(100, ge=1, le=500, description="Page size"),
+    cursor: Optional[str] = Query(None, description=f"Opaque cursor from the {NEXT_CURSOR_HEADER} response header"),
+    session: AsyncSession = Depends(get_session),
+):
+    lat, lon = geocode_zip(zip)
+    try:
+        payload, headers = await _provider_page(session, drg, zip, lat, lon, radius_km, sort, limit, cursor)
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return _page_response(payload, headers)
+
+
+@app.post("/providers/batch", response_model=BatchResponse)
+async def get_providers_batch(body: BatchRequest):
+    # All ZIPs are geocoded in one vectorized pass. Distinct queries then run
+    # concurrently, each on its own pooled connection (BATCH_CONCURRENCY at a
+    # time) and through the /providers result cache; duplicates run once.
+    # A failing item reports its error without failing the batch.
+    with timed("geocode"):
+        lats, lons = get_zip_index().lookup_many([q.zip for q in body.queries])
+    semaphore = asyncio.Semaphore(settings.batch_concurrency)
+    tasks: dict[tuple, asyncio.Task] = {}
+
+    async def run(q: BatchQuery, lat: float, lon: float) -> bytes:
+        async with semaphore:
+            async with async_session_maker() as session:
+                payload, _ = await _provider_page(session, q.drg, q.zip, lat, lon, q.radius_km, q.sort, q.limit)
+                return payload
+
+    for q, lat, lon in zip(body.queries, lats.tolist(), lons.tolist()):
+        key = (normalize_drg(q.drg), q.zip, q.radius_km, q.sort, q.limit)
+        if lat == lat and key not in tasks:
+            tasks[key] = asyncio.create_task(run(q, lat, lon))
+    if tasks:
+        await asyncio.wait(tasks.values())
+
+    items = []
+    for i, (q, lat) in enumerate(zip(body.queries, lats.tolist())):
+        if lat != lat:  # NaN: unknown or malformed ZIP
+            items.append({"index": i, "results": None, "error": "Invalid or unsupported ZIP code for geocoding"})
+            continue
+        task = tasks[(normalize_drg(q.drg), q.zip, q.radius_km, q.sort, q.limit)]
+        if task.exception() is not None:
+            items.append({"index": i, "results": None, "error": f"Query failed: {type(task.exception()).__name__}"})
+        else:
+            # Cached page bytes are embedded as-is rather than decoded and re-encoded
+            items.append({"index": i, "results": orjson.Fragment(task.result()), "error": None})
+    return Response(content=orjson.dumps({"results": items}), media_type="application/json")
+
+
+@app.get("/providers/export")
+async def export_providers(
     drg: str = Query(..., description="DRG code or text to search in ms_drg_definition"),
     zip: str = Query(..., min_length=5, max_length=5, description="Base ZIP code"),
     radius_km: int = Query(40, ge=1, le=500, description="Search radius in kilometers"),
+    sort: Literal["price", "distance", "rating"] = Query("price"),
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
     session: AsyncSession = Depends(get_session),
 ):
+    # Every matching row, streamed; no row cap, no result cache
     lat, lon = geocode_zip(zip)
-    origin = func.ll_to_earth(literal(lat), literal(lon))
-    target = func.ll_to_earth(Provider.latitude, Provider.longitude)
-    radius_m = radius_km * 1000.0
-    # Use earthdistance/cube: bounding box uses GiST index, then precise distance filter
-    distance_expr = func.earth_distance(origin, target) / literal(1000.0)
-
-    drg_like = f"%{drg}%"
-
-    stmt = (
-        select(
-            Provider.provider_id,
-            Provider.name,
-            Provider.city,
-            Provider.state,
-            Provider.zip_code,
-            Procedure.ms_drg_definition,
-            Procedure.average_covered_charges,
-            Procedure.average_total_payments,
-            Procedure.average_medicare_payments,
-            Rating.rating,
-            distance_expr.label("distance_km"),
-        )
-        .join(Procedure, Procedure.provider_id == Provider.provider_id)
-        .join(Rating, Rating.provider_id == Provider.provider_id, isouter=True)
-        .where(
-            and_(
-                Procedure.ms_drg_definition.ilike(drg_like),
-                Provider.latitude.isnot(None),
-                Provider.longitude.isnot(None),
-                func.earth_box(origin, literal(radius_m)).op('@>')(target),
-                func.earth_distance(origin, target) <= literal(radius_m),
-            )
-        )
-        .order_by(Procedure.average_covered_charges.asc())
-        .limit(100)
+    drg_filter = await resolve_drg(session, normalize_drg(drg))
+    stmt, params = provider_search_query(drg_filter, lat, lon, radius_km, limit=None, sort=sort)
+    filename = f"providers_{zip}_{radius_km}km.{format}"
+    return StreamingResponse(
+        stream_export(stmt, format, params),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
 
-    rows = (await session.execute(stmt)).all()
-    results: List[ProviderResult] = []
-    for row in rows:
-        results.append(
-            ProviderResult(
-                provider_id=row.provider_id,
-                name=row.name,
-                city=row.city,
-                state=row.state,
-                zip_code=row.zip_code,
-                ms_drg_definition=row.ms_drg_definition,
-                average_covered_charges=float(row.average_covered_charges) if row.average_covered_charges is not None else None,  # type: ignore
-                average_total_payments=float(row.average_total_payments) if row.average_total_payments is not None else None,  # type: ignore
-                average_medicare_payments=float(row.average_medicare_payments) if row.average_medicare_payments is not None else None,  # type: ignore
-                rating=row.rating,
-                distance_km=float(row.distance_km) if row.distance_km is not None else None,  # type: ignore
-            )
-        )
-    return results
-
 
 @app.post("/ask", response_model=AskResponse)
 async def ask(body: AskRequest, session: AsyncSession = Depends(get_session)):
@@ -128,94 +271,87 @@ async def ask(body: AskRequest, session: AsyncSession = Depends(get_session)):
             )
         )
 
-    params = extract_params_with_openai(q)
+    params = await extract_params_async(q)
     if not params.zip_code:
         raise HTTPException(status_code=400, detail="Please include a 5-digit ZIP code in your question.")
     lat, lon = geocode_zip(params.zip_code)
     radius_km = params.radius_km or 40
-    origin = func.ll_to_earth(literal(lat), literal(lon))
-    target = func.ll_to_earth(Provider.latitude, Provider.longitude)
-    radius_m = radius_km * 1000.0
-    distance_expr = func.earth_distance(origin, target) / literal(1000.0)
-
-    drg_like = f"%{params.drg_query or ''}%" if params.drg_query else "%"
-
-    base = (
-        select(
-            Provider.provider_id,
-            Provider.name,
-            Provider.city,
-            Provider.state,
-            Provider.zip_code,
-            Procedure.ms_drg_definition,
-            Procedure.average_covered_charges,
-            Rating.rating,
-            distance_expr.label("distance_km"),
-        )
-        .join(Procedure, Procedure.provider_id == Provider.provider_id)
-        .join(Rating, Rating.provider_id == Provider.provider_id, isouter=True)
-        .where(
-            and_(
-                Procedure.ms_drg_definition.ilike(drg_like),
-                Provider.latitude.isnot(None),
-                Provider.longitude.isnot(None),
-                func.earth_box(origin, literal(radius_m)).op('@>')(target),
-                func.earth_distance(origin, target) <= literal(radius_m),
-            )
-        )
+    # "hip surgery" or "pneumonia" (from the LLM or the fallback parser) becomes
+    # the DRG codes it stands for
+    drg_filter = await resolve_drg(session, params.drg_query)
+    if drg_filter == [] and params.drg_guessed:
+        drg_filter = None
+    if drg_filter == []:
+        return AskResponse(answer=f"I couldn't match '{params.drg_query}' to a procedure. Try a DRG code, e.g. DRG 470.")
+    with timed("spatial_index"):
+        nearby = await providers_within(session, lat, lon, radius_km)
+    if nearby is not None and len(nearby[0]) == 0:
+        return AskResponse(answer="No matching hospitals found within the radius.")
+    conditions = search_conditions(
+        drg_filter, lat, lon, radius_km, provider_ids=nearby[0].tolist() if nearby is not None else None
     )
 
     if params.intent == "best_rated":
-        stmt = base.order_by(
-            Rating.rating.desc().nullslast(),
-            Procedure.average_covered_charges.asc().nullslast(),
-        ).limit(500)
-        rows = (await session.execute(stmt)).all()
+        rows = (await session.execute(best_rated_stmt(conditions, params.top_k))).all()
         if not rows:
             return AskResponse(answer="No matching hospitals found within the radius.")
-        # Deduplicate by provider to avoid repeating the same hospital across many DRGs
-        unique_rows = []
-        seen_provider_ids = set()
-        for r in rows:
-            if r.provider_id in seen_provider_ids:
-                continue
-            seen_provider_ids.add(r.provider_id)
-            unique_rows.append(r)
-            if len(unique_rows) >= params.top_k:
-                break
         parts = [
             f"{r.name} (rating: {r.rating if r.rating is not None else 'N/A'})"
-            for r in unique_rows
+            for r in rows
         ]
         return AskResponse(answer="; ".join(parts))
 
-    if params.intent == "average_cost":
-        stmt = (
-            select(
-                func.avg(Procedure.average_covered_charges).label("avg_cost"),
-                func.count().label("count"),
-            )
-            .join(Procedure, Procedure.provider_id == Provider.provider_id)
-            .where(
-                and_(
-                    Procedure.ms_drg_definition.ilike(drg_like),
-                    Provider.latitude.isnot(None),
-                    Provider.longitude.isnot(None),
-                    func.earth_box(origin, literal(radius_m)).op('@>')(target),
-                    func.earth_distance(origin, target) <= literal(radius_m),
+    # Single-DRG aggregates come from the drg_price_stats rollup (exact rows
+    # only in the grid cells on the radius edge), cheapest and priciest names
+    # included: at most two statements. Several DRGs aggregate live.
+    drg_code = parse_drg_code(params.drg_query)
+    if isinstance(drg_filter, list) and len(drg_filter) == 1:
+        drg_code = drg_filter[0]
+    if params.intent in ("average_cost", "compare_costs") and drg_code is not None:
+        summary = await radius_price_summary(session, drg_code, lat, lon, radius_km)
+        if not summary.provider_count:
+            return AskResponse(answer="No matching hospitals found within the radius.")
+        if params.intent == "average_cost":
+            return AskResponse(
+                answer=(
+                    f"Average covered charges: ${summary.mean:,.0f} across {summary.provider_count} hospitals "
+                    f"(${summary.weighted_mean:,.0f} weighted by discharges)."
                 )
             )
+        low, high = summary.min_charges, summary.max_charges
+        return AskResponse(
+            answer=(
+                f"Across {summary.provider_count} hospital prices, covered charges range from ${low:,.0f} ({summary.cheapest_name}) "
+                f"to ${high:,.0f} ({summary.priciest_name}), a spread of ${high - low:,.0f}. "
+                f"Discharge-weighted median about ${summary.percentile(0.5):,.0f}; middle half about "
+                f"${summary.percentile(0.25):,.0f}-${summary.percentile(0.75):,.0f}; average ${summary.mean:,.0f}."
+            )
         )
-        row = (await session.execute(stmt)).one_or_none()
+
+    if params.intent == "average_cost":
+        row = (await session.execute(average_cost_stmt(conditions))).one_or_none()
         if not row or row.avg_cost is None:
             return AskResponse(answer="No matching hospitals found to compute an average.")
         return AskResponse(
             answer=f"Average covered charges: ${float(row.avg_cost):,.0f} across {int(row.count)} hospitals."
         )
 
+    if params.intent == "compare_costs":
+        row = (await session.execute(compare_costs_stmt(conditions))).one_or_none()
+        if not row or not row.count:
+            return AskResponse(answer="No matching hospitals found to compare costs.")
+        low, high = float(row.min_cost), float(row.max_cost)
+        return AskResponse(
+            answer=(
+                f"Across {int(row.count)} hospital prices, covered charges range from ${low:,.0f} ({row.cheapest}) "
+                f"to ${high:,.0f} ({row.priciest}), a spread of ${high - low:,.0f}. "
+                f"Median ${float(row.median):,.0f}; middle half ${float(row.p25):,.0f}-${float(row.p75):,.0f}; "
+                f"average ${float(row.avg_cost):,.0f}."
+            )
+        )
+
     # default and 'cheapest'
-    stmt = base.order_by(Procedure.average_covered_charges.asc().nullslast()).limit(params.top_k)
-    rows = (await session.execute(stmt)).all()
+    rows = (await session.execute(cheapest_stmt(conditions, params.top_k))).all()
     if not rows:
         return AskResponse(answer="No matching hospitals found within the radius.")
     best = rows[0]
@@ -224,6 +360,80 @@ async def ask(body: AskRequest, session: AsyncSession = Depends(get_session)):
     )
 
 
+@app.get("/drgs/suggest")
+async def suggest_drgs(
+    q: str = Query(..., min_length=1, max_length=100, description="What the user has typed so far"),
+    limit: int = Query(10, ge=1, le=50),
+    session: AsyncSession = Depends(get_session),
+):
+    # Autocomplete from the in-process DRG dictionary; no query per keystroke
+    # beyond the periodic data version check
+    index = await drg_index.get(session)
+    return index.suggest(q, limit)
+
+
+@app.get("/price-stats")
+async def price_stats(
+    drg: str = Query(..., description="DRG code, e.g. 470 or 'DRG 470'"),
+    state: Optional[str] = Query(None, min_length=2, max_length=2),
+    zip3: Optional[str] = Query(None, pattern=r"^\d{3}$"),
+    zip: Optional[str] = Query(None, min_length=5, max_length=5, description="Center of a radius (with radius_km)"),
+    radius_km: int = Query(40, ge=1, le=500),
+    session: AsyncSession = Depends(get_session),
+):
+    # Pre-aggregated charges for one DRG by state, ZIP3, or radius around a ZIP
+    drg_code = parse_drg_code(drg)
+    if drg_code is None:
+        raise HTTPException(status_code=400, detail="drg must be a DRG code")
+    if state is not None:
+        summary = await region_price_summary(session, drg_code, "state", state.upper())
+    elif zip3 is not None:
+        summary = await region_price_summary(session, drg_code, "zip3", zip3)
+    elif zip is not None:
+        lat, lon = geocode_zip(zip)
+        summary = await radius_price_summary(session, drg_code, lat, lon, radius_km)
+    else:
+        raise HTTPException(status_code=400, detail="Pass one of state, zip3 or zip")
+    return {"drg_code": drg_code, **summary.as_dict()}
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {"providers": provider_cache.snapshot(), "nl_parse": parse_cache.snapshot()}
+
+
+@app.get("/pool/stats")
+async def pool_stats():
+    return pool_metrics()
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    # Closed unless ADMIN_TOKEN is set; captured parameters may hold user input
+    if settings.admin_token is None:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token.encode(), settings.admin_token.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+@app.get("/admin/slow-queries", dependencies=[Depends(require_admin)])
+async def slow_queries(limit: int = Query(50, ge=1, le=1000)):
+    # Newest first; plans appear once the background EXPLAIN finishes
+    return {"enabled": settings.slow_query_log, **slow_query_log.snapshot(limit)}
+
+
+@app.delete("/admin/slow-queries", dependencies=[Depends(require_admin)])
+async def clear_slow_queries():
+    slow_query_log.clear()
+    return {"status": "ok"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    # Prometheus text format; aggregated over all workers in multiprocess mode
+    body, content_type = render()
+    return Response(content=body, media_type=content_type)
+
+
 @app.get("/")
 async def root():
     return {"status": "ok"}
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import os
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+from sqlalchemy import event
+
+
+# With several workers (uvicorn --workers, gunicorn) set PROMETHEUS_MULTIPROC_DIR
+# to an empty directory shared by all of them before they start: every process
+# then writes its samples to mmap'd files there and /metrics, whichever worker
+# serves it, aggregates all of them. The ETL picks it up too when it runs on the
+# same host with the same directory.
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR") or os.getenv("prometheus_multiproc_dir")
+
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Time from request start until the response is fully sent",
+    ["method", "route", "status"],
+)
+STAGE_SECONDS = Histogram(
+    "app_stage_duration_seconds",
+    "Time spent in one stage of request handling",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+
+POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections in use", multiprocess_mode="livesum")
+POOL_CHECKED_IN = Gauge("db_pool_checked_in", "Idle pooled connections", multiprocess_mode="livesum")
+POOL_OVERFLOW = Gauge("db_pool_overflow", "Connections open beyond pool_size", multiprocess_mode="livesum")
+POOL_WAIT_SECONDS = Histogram(
+    "db_pool_checkout_seconds", "Time to check a connection out of the pool", buckets=STAGE_BUCKETS
+)
+POOL_TIMEOUTS = Counter("db_pool_timeouts", "Checkouts that gave up after pool_timeout")
+
+ETL_ROWS = Counter("etl_rows", "Rows processed by an ETL stage", ["stage"])
+ETL_SECONDS = Counter("etl_stage_seconds", "Wall time spent in an ETL stage", ["stage"])
+ETL_LAST_RUN_ROWS_PER_SECOND = Gauge(
+    "etl_last_run_rows_per_second", "Throughput of each stage in the most recent ETL run", ["stage"],
+    multiprocess_mode="mostrecent",
+)
+
+STAGES = (
+    "geocode",
+    "result_cache",
+    "nl_cache",
+    "llm",
+    "drg_resolve",
+    "spatial_index",
+    "memory_search",
+    "db_execute",
+    "materialize",
+    "serialize",
+)
+# Label children resolved once; .labels() takes a lock and a dict lookup per call
+_stage_children = {name: STAGE_SECONDS.labels(name) for name in STAGES}
+
+
+def timed(stage: str):
+    # with timed("geocode"): ...
+    return _stage_children[stage].time()
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    _stage_children[stage].observe(seconds)
+
+
+def observe_pool(pool) -> None:
+    POOL_CHECKED_OUT.set(pool.checkedout())
+    POOL_CHECKED_IN.set(pool.checkedin())
+    POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+
+def instrument_engine(engine) -> None:
+    # Statement round trips, timed around the DBAPI cursor call. With asyncpg
+    # this covers prepare, execute and fetching the rows; turning them into
+    # Row objects is the "materialize" stage.
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_start = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_metrics_start", None)
+        if start is not None:
+            observe_stage("db_execute", time.perf_counter() - start)
+
+
+class MetricsMiddleware:
+    # Plain ASGI middleware (BaseHTTPMiddleware adds a task and stream copies per
+    # request). Routes are labelled by their path template so the label set stays
+    # bounded; anything not matched by an API route is "other".
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "other"
+            REQUEST_SECONDS.labels(scope["method"], path, str(status)).observe(time.perf_counter() - start)
+
+
+def render() -> tuple[bytes, str]:
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead() -> None:
+    # Drops this worker's live gauges (pool state) from the shared directory
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
@@ -1,5 +1,8 @@
 from sqlalchemy import (
+    BigInteger,
+    CheckConstraint,
     Column,
+    DateTime,
     Integer,
     String,
     Float,
@@ -7,11 +10,24 @@ from sqlalchemy import (
     Index,
     UniqueConstraint,
     Numeric,
+    PrimaryKeyConstraint,
+    SmallInteger,
+    func,
 )
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import relationship
+from sqlalchemy.types import UserDefinedType
 from .database import Base
 
 
+class Earth(UserDefinedType):
+    # earthdistance's `earth` domain (a cube); only produced and consumed in SQL
+    cache_ok = True
+
+    def get_col_spec(self, **kw):
+        return "earth"
+
+
 class Provider(Base):
     __tablename__ = "providers"
 
@@ -39,19 +55,33 @@ class Procedure(Base):
     # FK uses provider_id external id to simplify ETL joins across CSV
     provider_id = Column(String(32), ForeignKey("providers.provider_id", ondelete="CASCADE"), nullable=False, index=True)
     ms_drg_definition = Column(String(255), nullable=False, index=True)
+    # Numeric MS-DRG code (DRG_Cd) for exact, btree-indexed lookups
+    drg_code = Column(Integer, nullable=True)
     total_discharges = Column(Integer, nullable=True)
     average_covered_charges = Column(Numeric(14, 2), nullable=True)
     average_total_payments = Column(Numeric(14, 2), nullable=True)
     average_medicare_payments = Column(Numeric(14, 2), nullable=True)
+    # ETL content fingerprint of the loaded values; unchanged rows are not rewritten
+    row_hash = Column(BigInteger, nullable=True)
 
     provider = relationship("Provider", back_populates="procedures", lazy="joined")
 
     __table_args__ = (
         Index("idx_procedures_drg", "ms_drg_definition"),
+        Index("idx_procedures_drg_code", "drg_code"),
         UniqueConstraint("provider_id", "ms_drg_definition", name="uq_procedure_per_provider_drg"),
     )
 
 
+class Drg(Base):
+    __tablename__ = "drgs"
+
+    # DRG dictionary maintained by the ETL: one row per MS-DRG code
+    drg_code = Column(Integer, primary_key=True, autoincrement=False)
+    description = Column(String(255), nullable=True)
+    ms_drg_definition = Column(String(255), nullable=False)
+
+
 class Rating(Base):
     __tablename__ = "ratings"
 
@@ -65,3 +95,92 @@ class Rating(Base):
         UniqueConstraint("provider_id", name="uq_rating_per_provider"),
     )
 
+
+class DataVersion(Base):
+    __tablename__ = "data_version"
+
+    # Single row (id=1); the ETL bumps `version` whenever it commits a load
+    id = Column(SmallInteger, primary_key=True)
+    version = Column(BigInteger, nullable=False, server_default="0")
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        CheckConstraint("id = 1", name="ck_data_version_single_row"),
+    )
+
+
+class LoadManifest(Base):
+    __tablename__ = "load_manifests"
+
+    # One row per source CSV: whole-file hash of the last complete load
+    source_file = Column(String(255), primary_key=True)
+    file_hash = Column(String(64), nullable=True)
+    chunk_count = Column(Integer, nullable=True)
+    row_count = Column(BigInteger, nullable=True)
+    loaded_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
+class LoadManifestChunk(Base):
+    __tablename__ = "load_manifest_chunks"
+
+    # Content hash per CSV chunk, written in the same transaction as the chunk's rows
+    source_file = Column(String(255), nullable=False)
+    chunk_index = Column(Integer, nullable=False)
+    chunk_hash = Column(String(64), nullable=False)
+    row_count = Column(Integer, nullable=False)
+    loaded_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        PrimaryKeyConstraint("source_file", "chunk_index", name="pk_load_manifest_chunks"),
+    )
+
+
+class ProviderSearch(Base):
+    __tablename__ = "provider_search"
+
+    # Materialized view (migration 0005), refreshed by the ETL after each load:
+    # one row per provider x DRG with the earth point precomputed
+    provider_id = Column(String(32), primary_key=True)
+    ms_drg_definition = Column(String(255), primary_key=True)
+    name = Column(String(255), nullable=False)
+    city = Column(String(128))
+    state = Column(String(8))
+    zip_code = Column(String(16))
+    latitude = Column(Float)
+    longitude = Column(Float)
+    earth = Column(Earth)
+    rating = Column(Integer)
+    drg_code = Column(Integer)
+    total_discharges = Column(Integer)
+    average_covered_charges = Column(Numeric(14, 2))
+    average_total_payments = Column(Numeric(14, 2))
+    average_medicare_payments = Column(Numeric(14, 2))
+    # 0.5 degree lat/lon cell (migration 0007), keys drg_price_stats "cell" rows
+    grid_cell = Column(Integer)
+
+    __table_args__ = {"info": {"is_view": True}}
+
+
+class DrgPriceStats(Base):
+    __tablename__ = "drg_price_stats"
+
+    # Materialized view (migration 0007) refreshed after provider_search: price
+    # rollups per DRG and region, region_type one of state / zip3 / cell
+    drg_code = Column(Integer, primary_key=True)
+    region_type = Column(String(8), primary_key=True)
+    region_key = Column(String(16), primary_key=True)
+    provider_count = Column(Integer, nullable=False)
+    discharges = Column(Float, nullable=False)
+    charge_sum = Column(Float, nullable=False)
+    weighted_charge_sum = Column(Float, nullable=False)
+    min_charges = Column(Float)
+    max_charges = Column(Float)
+    hist_buckets = Column(ARRAY(Integer), nullable=False)
+    hist_weights = Column(ARRAY(Float), nullable=False)
+    # Provider at min_charges / max_charges (migration 0008)
+    cheapest_provider_id = Column(String(32))
+    cheapest_name = Column(String(255))
+    priciest_provider_id = Column(String(32))
+    priciest_name = Column(String(255))
+
+    __table_args__ = {"info": {"is_view": True}}
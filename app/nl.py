@@ -1,21 +1,34 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import os
 import re
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
 
-from tenacity import retry, stop_after_attempt, wait_exponential
+import httpx
+from tenacity import AsyncRetrying, stop_after_attempt, wait_exponential
+
+from .config import settings
+from .metrics import timed
+from .nl_cache import NLParseCache, prompt_version
 
 try:
-    from openai import OpenAI
+    from openai import AsyncOpenAI
 except Exception:  # pragma: no cover
-    OpenAI = None  # type: ignore
+    AsyncOpenAI = None  # type: ignore
 
 
 INTENT_CHOICES = {"cheapest", "best_rated", "average_cost", "compare_costs"}
 
+SYSTEM_PROMPT = (
+    "You are a data assistant that extracts structured parameters for hospital pricing queries. "
+    "Return a strict JSON object with keys: intent (one of cheapest, best_rated, average_cost, compare_costs), "
+    "drg_query (the DRG code if one is given, otherwise the procedure or condition in plain words, or null), zip_code (5-digit string or null), radius_km (integer or null), top_k (int). "
+    "If query mentions miles, convert to kilometers. If not provided, use radius_km=40."
+)
+
 
 def is_scope_relevant(question: str) -> bool:
     q = question.lower()
@@ -42,14 +55,41 @@ class NLParams:
     zip_code: Optional[str]
     radius_km: Optional[int]
     top_k: int = 3
+    # drg_query is leftover question text from the fallback parser; when it
+    # names no DRG, /ask searches all DRGs instead of reporting no match
+    drg_guessed: bool = False
+
+
+# Words of a question that are about the search, not the procedure; whatever
+# remains after removing them, the ZIP and the radius is the procedure text
+_QUERY_WORDS = set(
+    """
+    a about all an and any are around at average avg be best by can center centers cheap cheaper cheapest close
+    closer closest code compare comparison cost costs could do does expensive facilities facility find for from
+    get give good hospital hospitals how i in is it km kilometers know least list looking lowest me mean mi mile
+    miles most much my near nearby nearest need of on one ones option options or place places please price prices pricing
+    priciest provider providers range rate rated rating ratings show some spread tell than that the there these
+    this those to top us vary want we what where which who will with within would you your zip
+    """.split()
+)
+# Contraction endings: "What's" -> "What", "don't" -> "do"
+_CONTRACTION_RE = re.compile(r"(?:n't|'s|'re|'ve|'ll|'d|'m)\b", re.IGNORECASE)
+
+
+def _procedure_text(question: str) -> Optional[str]:
+    # "Who is cheapest for hip surgery near 10001?" -> "hip surgery"
+    text = re.sub(r"\b\d{1,3}\s*(?:miles?|mi|km|kilometers)\b|\b\d{5}\b", " ", question, flags=re.IGNORECASE)
+    text = _CONTRACTION_RE.sub("", text.replace("\u2019", "'"))
+    kept = [w for w in re.findall(r"[A-Za-z]+", text) if w.lower() not in _QUERY_WORDS]
+    return " ".join(kept) or None
 
 
 def _fallback_parse(question: str) -> NLParams:
-    # naive regex-based extraction as fallback if OpenAI not configured
-    drg = None
-    m = re.search(r"\bdrg\s*(\d{3})\b", question, re.IGNORECASE)
-    if m:
-        drg = m.group(1)
+    # naive regex-based extraction as fallback if OpenAI not configured; text
+    # that is not a DRG code is left for the DRG resolver (drg_index)
+    m = re.search(r"\b(?:ms-)?drg\s*#?\s*(\d{1,3})\b", question, re.IGNORECASE)
+    drg = m.group(1) if m else _procedure_text(question)
+    guessed = m is None and drg is not None
     zip_code = None
     m = re.search(r"\b(\d{5})\b", question)
     if m:
@@ -64,7 +104,9 @@ def _fallback_parse(question: str) -> NLParams:
         radius_km = int(m2.group(1))
     # intent
     q = question.lower()
-    if any(w in q for w in ["cheap", "cheapest", "low cost", "lowest"]):
+    if any(w in q for w in ["compare", "comparison", "price range", "spread", "vary"]):
+        intent = "compare_costs"
+    elif any(w in q for w in ["cheap", "cheapest", "low cost", "lowest"]):
         intent = "cheapest"
     elif any(w in q for w in ["best", "top", "highest rating", "rated"]):
         intent = "best_rated"
@@ -72,38 +114,17 @@ def _fallback_parse(question: str) -> NLParams:
         intent = "average_cost"
     else:
         intent = "cheapest"
-    return NLParams(intent=intent, drg_query=drg, zip_code=zip_code, radius_km=radius_km, top_k=3)
+    return NLParams(intent=intent, drg_query=drg, zip_code=zip_code, radius_km=radius_km, top_k=3, drg_guessed=guessed)
 
 
-@retry(wait=wait_exponential(multiplier=1, min=1, max=8), stop=stop_after_attempt(3))
-def extract_params_with_openai(question: str) -> NLParams:
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key or OpenAI is None:
-        return _fallback_parse(question)
+def _chat_messages(question: str) -> list[dict[str, str]]:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"Question: {question}"},
+    ]
 
-    # Fail-safe: if OpenAI SDK or HTTP stack has issues, fall back to regex parsing
-    try:
-        client = OpenAI(api_key=api_key)
-        system = (
-            "You are a data assistant that extracts structured parameters for hospital pricing queries. "
-            "Return a strict JSON object with keys: intent (one of cheapest, best_rated, average_cost, compare_costs), "
-            "drg_query (string or null), zip_code (5-digit string or null), radius_km (integer or null), top_k (int). "
-            "If query mentions miles, convert to kilometers. If not provided, use radius_km=40."
-        )
-        user = f"Question: {question}"
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            temperature=0.0,
-            messages=[
-                {"role": "system", "content": system},
-                {"role": "user", "content": user},
-            ],
-            response_format={"type": "json_object"},
-        )
-        content = resp.choices[0].message.content or "{}"
-        data = json.loads(content)
-    except Exception:
-        return _fallback_parse(question)
+
+def _params_from_payload(data: Dict[str, Any]) -> NLParams:
     intent = str(data.get("intent") or "cheapest").strip().lower()
     if intent not in INTENT_CHOICES:
         intent = "cheapest"
@@ -133,3 +154,80 @@ def extract_params_with_openai(question: str) -> NLParams:
         intent=intent, drg_query=drg_query, zip_code=zip_code, radius_km=radius_km, top_k=top_k
     )
 
+
+# Bump when NLParams or _params_from_payload change shape
+PARAMS_SCHEMA_VERSION = "2"
+
+parse_cache = NLParseCache(
+    max_entries=settings.nl_cache_max_entries,
+    version=prompt_version(SYSTEM_PROMPT, settings.openai_model, PARAMS_SCHEMA_VERSION),
+    path=settings.nl_cache_path,
+)
+
+_async_client: Optional["AsyncOpenAI"] = None
+
+
+def get_async_client(api_key: str) -> "AsyncOpenAI":
+    # One client (and one pooled httpx connection pool) shared by all /ask requests
+    global _async_client
+    if _async_client is None:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.nl_max_connections,
+                max_keepalive_connections=settings.nl_max_connections,
+            ),
+            timeout=httpx.Timeout(settings.nl_timeout_seconds),
+        )
+        _async_client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=settings.openai_base_url,
+            max_retries=0,  # retries are ours, bounded by the latency budget
+            http_client=http_client,
+        )
+    return _async_client
+
+
+async def aclose_async_client() -> None:
+    global _async_client
+    if _async_client is not None:
+        client, _async_client = _async_client, None
+        await client.close()
+
+
+async def _extract_via_llm(client: "AsyncOpenAI", question: str) -> NLParams:
+    async for attempt in AsyncRetrying(
+        wait=wait_exponential(multiplier=0.1, max=1),
+        stop=stop_after_attempt(settings.nl_max_attempts),
+        reraise=True,
+    ):
+        with attempt:
+            resp = await client.chat.completions.create(
+                model=settings.openai_model,
+                temperature=0.0,
+                messages=_chat_messages(question),
+                response_format={"type": "json_object"},
+            )
+            data = json.loads(resp.choices[0].message.content or "{}")
+    return _params_from_payload(data)
+
+
+async def extract_params_async(question: str) -> NLParams:
+    # Non-blocking extraction for the async /ask handler. The whole LLM exchange,
+    # retries included, must finish within nl_timeout_seconds; otherwise it is
+    # cancelled and we answer from the regex parser.
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key or AsyncOpenAI is None:
+        return _fallback_parse(question)
+    with timed("nl_cache"):
+        cached = await parse_cache.get(question)
+    if cached is not None:
+        return NLParams(**cached)
+    try:
+        client = get_async_client(api_key)
+        with timed("llm"):
+            params = await asyncio.wait_for(_extract_via_llm(client, question), timeout=settings.nl_timeout_seconds)
+    except Exception:
+        return _fallback_parse(question)
+    # Only LLM answers are cached; a fallback parse must not mask a later LLM answer
+    await parse_cache.put(question, asdict(params))
+    return params
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+def normalize_question(question: str) -> str:
+    # Questions that differ only in case, punctuation or spacing share an entry
+    q = re.sub(r"[^0-9a-z]+", " ", question.lower())
+    return q.strip()
+
+
+def prompt_version(*parts: str) -> str:
+    # Fingerprint of everything that shapes the LLM answer (prompt, model, ...)
+    return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()[:16]
+
+
+class NLParseCache:
+    # Bounded LRU of extracted /ask parameters, optionally backed by a SQLite file
+    # so entries survive restarts and are shared between workers. Keys embed the
+    # prompt version; entries written under another version are purged on open.
+
+    def __init__(self, max_entries: int, version: str, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.version = version
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._puts_since_trim = 0
+
+    def key(self, question: str) -> str:
+        return f"{self.version}:{normalize_question(question)}"
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)  # type: ignore[arg-type]
+            db = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS nl_parse_cache ("
+                " key TEXT PRIMARY KEY, version TEXT NOT NULL, params TEXT NOT NULL, last_used REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS idx_nl_parse_cache_last_used ON nl_parse_cache(last_used)")
+            db.execute("DELETE FROM nl_parse_cache WHERE version <> ?", (self.version,))
+            self._db = db
+        return self._db
+
+    def _db_get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._db_lock:
+            db = self._connect()
+            row = db.execute("SELECT params FROM nl_parse_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE nl_parse_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+            return json.loads(row[0])
+
+    def _db_put(self, key: str, params: Dict[str, Any]) -> None:
+        with self._db_lock:
+            db = self._connect()
+            db.execute(
+                "INSERT INTO nl_parse_cache (key, version, params, last_used) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET params = excluded.params, last_used = excluded.last_used",
+                (key, self.version, json.dumps(params), time.time()),
+            )
+            self._puts_since_trim += 1
+            if self._puts_since_trim >= max(1, self.max_entries // 10):
+                self._puts_since_trim = 0
+                db.execute(
+                    "DELETE FROM nl_parse_cache WHERE key NOT IN "
+                    "(SELECT key FROM nl_parse_cache ORDER BY last_used DESC LIMIT ?)",
+                    (self.max_entries,),
+                )
+
+    def _remember(self, key: str, params: Dict[str, Any]) -> None:
+        self._memory[key] = params
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    async def get(self, question: str) -> Optional[Dict[str, Any]]:
+        if self.max_entries <= 0:
+            return None
+        key = self.key(question)
+        params = self._memory.get(key)
+        if params is not None:
+            self._memory.move_to_end(key)
+        elif self.path:
+            params = await asyncio.to_thread(self._db_get, key)
+            if params is not None:
+                self._remember(key, params)
+        if params is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return dict(params)
+
+    async def put(self, question: str, params: Dict[str, Any]) -> None:
+        if self.max_entries <= 0:
+            return
+        key = self.key(question)
+        self._remember(key, dict(params))
+        if self.path:
+            await asyncio.to_thread(self._db_put, key, params)
+
+    def close(self) -> None:
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def snapshot(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "persistent": bool(self.path),
+            "prompt_version": self.version,
+        }
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+from typing import Any, Hashable, Optional
+
+import orjson
+
+
+# /providers sort orders; ties are always broken by (provider_id, ms_drg_definition)
+SORT_MODES = ("price", "distance", "rating")
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class Cursor:
+    # Sort key of the last row of a page. `value` is the primary sort value:
+    # price as a decimal string (None for missing charges), rating as an int
+    # (None when unrated), distance as the earth chord length in meters.
+    sort: str
+    value: Any
+    provider_id: str
+    ms_drg_definition: str
+
+
+def query_fingerprint(query: Hashable) -> str:
+    # Binds a cursor to the search that produced it
+    return hashlib.sha256(repr(query).encode()).hexdigest()[:12]
+
+
+def encode_cursor(cursor: Cursor, query: Hashable) -> str:
+    raw = orjson.dumps(
+        {
+            "s": cursor.sort,
+            "q": query_fingerprint(query),
+            "k": [cursor.value, cursor.provider_id, cursor.ms_drg_definition],
+        }
+    )
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(token: Optional[str], sort: str, query: Hashable) -> Optional[Cursor]:
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data = orjson.loads(raw)
+        value, provider_id, definition = data["k"]
+        cursor_sort, fingerprint = data["s"], data["q"]
+    except (ValueError, KeyError, TypeError) as exc:
+        raise InvalidCursor("Malformed cursor") from exc
+    if cursor_sort != sort or fingerprint != query_fingerprint(query):
+        raise InvalidCursor("Cursor does not belong to this search")
+    if not isinstance(provider_id, str) or not isinstance(definition, str):
+        raise InvalidCursor("Malformed cursor")
+    if sort == "price" and value is not None:
+        try:
+            if not isinstance(value, str) or not Decimal(value).is_finite():
+                raise InvalidCursor("Malformed cursor")
+        except InvalidOperation as exc:
+            raise InvalidCursor("Malformed cursor") from exc
+    if sort == "rating" and value is not None and not isinstance(value, int):
+        raise InvalidCursor("Malformed cursor")
+    if sort == "distance" and not isinstance(value, (int, float)):
+        raise InvalidCursor("Malformed cursor")
+    return Cursor(sort=sort, value=value, provider_id=provider_id, ms_drg_definition=definition)
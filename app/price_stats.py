@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import any_, bindparam, func, literal, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.types import Integer, String
+
+from .models import DrgPriceStats, ProviderSearch
+from .spatial import KM_PER_DEG_LAT, haversine_km
+
+
+# Fixed in migration 0007 (provider_search.grid_cell and the drg_price_stats histograms)
+STATS_CELL_DEG = 0.5
+N_COLS = int(round(360 / STATS_CELL_DEG))
+HIST_RATIO = 1.02
+
+
+def grid_cell(lat: float, lon: float) -> int:
+    return math.floor((lat + 90.0) / STATS_CELL_DEG) * N_COLS + math.floor((lon + 180.0) / STATS_CELL_DEG) % N_COLS
+
+
+def hist_bucket(charges: np.ndarray) -> np.ndarray:
+    # Same bucketing as the drg_price_stats view: floor(ln(c) / ln(ratio)), -1 for c <= 0
+    charges = np.asarray(charges, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        buckets = np.floor(np.log(charges) / math.log(HIST_RATIO))
+    return np.where(charges > 0, buckets, -1).astype(np.int64)
+
+
+@dataclass
+class PriceSummary:
+    # Mergeable price statistics: plain sums plus a discharge-weighted histogram
+    # of log-spaced charge buckets (bucket -> total discharges)
+    provider_count: int = 0
+    discharges: float = 0.0
+    charge_sum: float = 0.0
+    weighted_charge_sum: float = 0.0
+    min_charges: Optional[float] = None
+    max_charges: Optional[float] = None
+    cheapest_provider_id: Optional[str] = None
+    cheapest_name: Optional[str] = None
+    priciest_provider_id: Optional[str] = None
+    priciest_name: Optional[str] = None
+    hist: dict = field(default_factory=dict)
+
+    def _extend(self, low: Optional[float], high: Optional[float], cheapest: tuple, priciest: tuple) -> None:
+        # cheapest / priciest: (provider_id, name) at low / high. Equal charges
+        # go to the lowest provider_id, as in cheapest_stmt() and the view.
+        if low is not None and (
+            self.min_charges is None or (low, cheapest[0] or "") < (self.min_charges, self.cheapest_provider_id or "")
+        ):
+            self.min_charges = low
+            self.cheapest_provider_id, self.cheapest_name = cheapest
+        if high is not None and (
+            self.max_charges is None or (-high, priciest[0] or "") < (-self.max_charges, self.priciest_provider_id or "")
+        ):
+            self.max_charges = high
+            self.priciest_provider_id, self.priciest_name = priciest
+
+    def add_rollup(self, row) -> None:
+        self.provider_count += row.provider_count
+        self.discharges += row.discharges
+        self.charge_sum += row.charge_sum
+        self.weighted_charge_sum += row.weighted_charge_sum
+        self._extend(
+            row.min_charges,
+            row.max_charges,
+            (row.cheapest_provider_id, row.cheapest_name),
+            (row.priciest_provider_id, row.priciest_name),
+        )
+        for bucket, weight in zip(row.hist_buckets, row.hist_weights):
+            self.hist[bucket] = self.hist.get(bucket, 0.0) + weight
+
+    def add_prices(
+        self,
+        charges: Iterable[float],
+        discharges: Iterable[Optional[int]],
+        providers: Optional[Sequence[tuple[str, str]]] = None,
+    ) -> None:
+        # Exact rows; missing or zero discharge counts weigh 1, as in the view.
+        # providers: (provider_id, name) per row, to name the cheapest / priciest
+        charges = np.asarray(list(charges), dtype=np.float64)
+        if len(charges) == 0:
+            return
+        if providers is None:
+            providers = [(None, None)] * len(charges)
+        low = min(range(len(charges)), key=lambda i: (charges[i], providers[i][0] or ""))
+        high = min(range(len(charges)), key=lambda i: (-charges[i], providers[i][0] or ""))
+        weights = np.array([float(d) if d else 1.0 for d in discharges], dtype=np.float64)
+        self.provider_count += len(charges)
+        self.discharges += float(weights.sum())
+        self.charge_sum += float(charges.sum())
+        self.weighted_charge_sum += float((charges * weights).sum())
+        self._extend(float(charges[low]), float(charges[high]), tuple(providers[low]), tuple(providers[high]))
+        buckets, totals = np.unique(hist_bucket(charges), return_inverse=True)
+        for bucket, weight in zip(buckets.tolist(), np.bincount(totals, weights=weights).tolist()):
+            self.hist[bucket] = self.hist.get(bucket, 0.0) + weight
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.charge_sum / self.provider_count if self.provider_count else None
+
+    @property
+    def weighted_mean(self) -> Optional[float]:
+        return self.weighted_charge_sum / self.discharges if self.discharges else None
+
+    def percentile(self, q: float) -> Optional[float]:
+        # Discharge-weighted, to within one bucket (~HIST_RATIO); the bucket's
+        # geometric midpoint, clamped to the observed min/max
+        if not self.hist:
+            return None
+        buckets = sorted(self.hist)
+        cumulative = np.cumsum([self.hist[b] for b in buckets])
+        bucket = buckets[int(np.searchsorted(cumulative, q * cumulative[-1]))]
+        value = 0.0 if bucket < 0 else HIST_RATIO ** (bucket + 0.5)
+        return min(max(value, self.min_charges), self.max_charges)
+
+    def as_dict(self) -> dict:
+        return {
+            "provider_count": self.provider_count,
+            "discharges": self.discharges,
+            "mean": self.mean,
+            "weighted_mean": self.weighted_mean,
+            "min": self.min_charges,
+            "max": self.max_charges,
+            "p25": self.percentile(0.25),
+            "median": self.percentile(0.5),
+            "p75": self.percentile(0.75),
+        }
+
+
+def covering_cells(lat: float, lon: float, radius_km: float) -> tuple[list[int], list[int]]:
+    # (cells entirely inside the radius, cells crossing its edge). On cells this
+    # small the farthest point from the origin is a corner, so a cell is inside
+    # when all four corners are.
+    dlat = radius_km / KM_PER_DEG_LAT
+    lat_lo, lat_hi = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+    rows = np.arange(math.floor((lat_lo + 90.0) / STATS_CELL_DEG), math.floor((lat_hi + 90.0) / STATS_CELL_DEG) + 1)
+    ratio = math.sin(math.radians(dlat)) / max(math.cos(math.radians(lat)), 1e-12)
+    if lat_lo <= -90.0 or lat_hi >= 90.0 or ratio >= 1.0:
+        cols = np.arange(N_COLS)
+    else:
+        dlon = math.degrees(math.asin(ratio))
+        first = math.floor((lon - dlon + 180.0) / STATS_CELL_DEG)
+        last = math.floor((lon + dlon + 180.0) / STATS_CELL_DEG)
+        cols = np.unique(np.arange(first, last + 1) % N_COLS)
+
+    row_grid, col_grid = (g.ravel() for g in np.meshgrid(rows, cols, indexing="ij"))
+    south = row_grid * STATS_CELL_DEG - 90.0
+    west = col_grid * STATS_CELL_DEG - 180.0
+    farthest = np.max(
+        [
+            haversine_km(lat, lon, corner_lat, corner_lon)
+            for corner_lat in (south, south + STATS_CELL_DEG)
+            for corner_lon in (west, west + STATS_CELL_DEG)
+        ],
+        axis=0,
+    )
+    cells = row_grid * N_COLS + col_grid
+    inside = farthest <= radius_km - 1e-6
+    return cells[inside].tolist(), cells[~inside].tolist()
+
+
+async def radius_price_summary(
+    session: AsyncSession, drg_code: int, lat: float, lon: float, radius_km: float
+) -> PriceSummary:
+    # Cells fully inside the radius come from the rollup; only rows in the edge
+    # cells are read and filtered by exact distance
+    inside, edge = covering_cells(lat, lon, radius_km)
+    summary = PriceSummary()
+    if inside:
+        stmt = select(DrgPriceStats).where(
+            DrgPriceStats.drg_code == drg_code,
+            DrgPriceStats.region_type == "cell",
+            DrgPriceStats.region_key == any_(bindparam("cells", [str(c) for c in inside], type_=ARRAY(String))),
+        )
+        for row in (await session.execute(stmt)).scalars():
+            summary.add_rollup(row)
+    if edge:
+        origin = func.ll_to_earth(literal(lat), literal(lon))
+        stmt = select(
+            ProviderSearch.average_covered_charges,
+            ProviderSearch.total_discharges,
+            ProviderSearch.provider_id,
+            ProviderSearch.name,
+        ).where(
+            ProviderSearch.drg_code == drg_code,
+            ProviderSearch.grid_cell == any_(bindparam("edge_cells", edge, type_=ARRAY(Integer))),
+            ProviderSearch.average_covered_charges.isnot(None),
+            func.earth_distance(origin, ProviderSearch.earth) <= literal(radius_km * 1000.0),
+        )
+        rows = (await session.execute(stmt)).all()
+        summary.add_prices(
+            [float(r.average_covered_charges) for r in rows],
+            [r.total_discharges for r in rows],
+            [(r.provider_id, r.name) for r in rows],
+        )
+    return summary
+
+
+async def region_price_summary(session: AsyncSession, drg_code: int, region_type: str, region_key: str) -> PriceSummary:
+    summary = PriceSummary()
+    row = (
+        await session.execute(
+            select(DrgPriceStats).where(
+                DrgPriceStats.drg_code == drg_code,
+                DrgPriceStats.region_type == region_type,
+                DrgPriceStats.region_key == region_key,
+            )
+        )
+    ).scalar_one_or_none()
+    if row is not None:
+        summary.add_rollup(row)
+    return summary
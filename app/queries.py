@@ -0,0 +1,327 @@
+from __future__ import annotations
+
+import re
+from decimal import Decimal
+from functools import lru_cache
+from typing import Optional, Sequence, Union
+
+from sqlalchemy import and_, any_, bindparam, cast, false, func, literal, null, select, true, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by
+from sqlalchemy.types import Float, Integer, Numeric, String
+
+from .models import ProviderSearch
+from .pagination import Cursor
+
+
+# "470", "DRG 470", "ms-drg 470", "drg470"
+_DRG_CODE_RE = re.compile(r"^\s*(?:ms[-\s]?)?(?:drg)?\s*#?\s*(\d{1,3})\s*$", re.IGNORECASE)
+
+
+def parse_drg_code(term: Optional[str]) -> Optional[int]:
+    if not term:
+        return None
+    m = _DRG_CODE_RE.match(term)
+    return int(m.group(1)) if m else None
+
+
+# Search values are named bind parameters ("lat", "lon", "radius_m", "drg_code",
+# ...), so a statement built once per query shape can be re-executed with new
+# values; see provider_search_query().
+
+
+# A DRG filter: a code as typed ("470", "DRG 470"), or the list of codes free
+# text was resolved to in-process (drg_index.DrgIndex.resolve)
+DrgFilter = Union[str, Sequence[int], None]
+
+
+def drg_condition(term: DrgFilter):
+    # An exact match on drg_code either way (btree / btree_gist indexes)
+    if term is not None and not isinstance(term, str):
+        return ProviderSearch.drg_code == any_(bindparam("drg_codes", list(term), type_=ARRAY(Integer)))
+    if not term or not term.strip():
+        return true()
+    code = parse_drg_code(term)
+    if code is None:
+        raise ValueError(f"free-text DRG term {term!r}: resolve it to codes with DrgIndex.resolve() first")
+    return ProviderSearch.drg_code == bindparam("drg_code", code, type_=Integer)
+
+
+def drg_cache_key(term: str) -> tuple:
+    code = parse_drg_code(term)
+    return ("code", code) if code is not None else ("text", term)
+
+
+def _origin(lat: float, lon: float):
+    return func.ll_to_earth(bindparam("lat", lat, type_=Float), bindparam("lon", lon, type_=Float))
+
+
+def distance_km(lat: float, lon: float):
+    return func.earth_distance(_origin(lat, lon), ProviderSearch.earth) / literal(1000.0)
+
+
+def earth_chord(lat: float, lon: float):
+    # cube <-> distance (straight-line meters) orders exactly like earth_distance
+    # and can be served by a KNN scan of the GiST index on earth
+    origin = _origin(lat, lon)
+    return ProviderSearch.earth.op("<->", return_type=Float)(origin)
+
+
+def _tie_breakers() -> list:
+    return [ProviderSearch.provider_id.collate("C"), ProviderSearch.ms_drg_definition.collate("C")]
+
+
+def sort_keys(sort: str, lat: float, lon: float) -> tuple:
+    # (value stored in the cursor, full ORDER BY key). NULL prices and ratings
+    # sort last through a leading IS NULL flag so every key is one row
+    # comparison matching an index in 0006_search_sort_indexes.
+    if sort == "distance":
+        chord = earth_chord(lat, lon)
+        return chord, [chord, *_tie_breakers()]
+    if sort == "rating":
+        rating = ProviderSearch.rating
+        return rating, [rating.is_(None), -rating, *_tie_breakers()]
+    charges = ProviderSearch.average_covered_charges
+    return charges, [charges.is_(None), charges, *_tie_breakers()]
+
+
+def keyset_condition(cursor: Cursor, lat: float, lon: float):
+    # Rows strictly after the cursor in sort_keys() order
+    _, keys = sort_keys(cursor.sort, lat, lon)
+    ties = (
+        bindparam("after_provider_id", cursor.provider_id, type_=String),
+        bindparam("after_definition", cursor.ms_drg_definition, type_=String),
+    )
+    if cursor.value is None and cursor.sort != "distance":
+        # Already inside the trailing NULL group
+        return and_(keys[0], tuple_(*keys[2:]) > tuple_(*ties))
+    value = bindparam("after_value", _cursor_value(cursor), type_=_CURSOR_TYPES[cursor.sort])
+    if cursor.sort == "distance":
+        return tuple_(*keys) > tuple_(value, *ties)
+    return tuple_(*keys) > tuple_(false(), value, *ties)
+
+
+_CURSOR_TYPES = {"price": Numeric(14, 2), "rating": Integer, "distance": Float}
+
+
+def _cursor_value(cursor: Cursor):
+    # Cursor value in the form its ORDER BY key compares it (ratings are negated)
+    if cursor.value is None:
+        return None
+    if cursor.sort == "distance":
+        return float(cursor.value)
+    if cursor.sort == "rating":
+        return -int(cursor.value)
+    return Decimal(cursor.value)
+
+
+def search_conditions(
+    drg: DrgFilter,
+    lat: float,
+    lon: float,
+    radius_km: float,
+    provider_ids: Optional[Sequence[str]] = None,
+) -> list:
+    # DRG match + radius over provider_search. With provider_ids (already radius
+    # filtered by the in-process spatial index) the radius becomes an id filter;
+    # otherwise the bounding box uses the GiST index on the stored earth point,
+    # then the exact distance filter applies.
+    if provider_ids is not None:
+        ids = bindparam("provider_ids", list(provider_ids), type_=ARRAY(String))
+        return [drg_condition(drg), ProviderSearch.provider_id == any_(ids)]
+    origin = _origin(lat, lon)
+    radius_m = bindparam("radius_m", radius_km * 1000.0, type_=Float)
+    return [
+        drg_condition(drg),
+        func.earth_box(origin, radius_m).op("@>")(ProviderSearch.earth),
+        func.earth_distance(origin, ProviderSearch.earth) <= radius_m,
+    ]
+
+
+def provider_search_stmt(
+    drg: DrgFilter,
+    lat: float,
+    lon: float,
+    radius_km: float,
+    limit: Optional[int] = 100,
+    provider_ids: Optional[Sequence[str]] = None,
+    sort: str = "price",
+    after: Optional[Cursor] = None,
+):
+    # Columns come in ProviderResult field order with prices already float8, so
+    # rows can be encoded straight to JSON; sort_key (last) is the primary sort
+    # value for the next-page cursor. distance_km is only computed in SQL when
+    # the radius filter runs there.
+    sort_value, order_by = sort_keys(sort, lat, lon)
+    columns = [
+        ProviderSearch.provider_id,
+        ProviderSearch.name,
+        ProviderSearch.city,
+        ProviderSearch.state,
+        ProviderSearch.zip_code,
+        ProviderSearch.ms_drg_definition,
+        cast(ProviderSearch.average_covered_charges, Float).label("average_covered_charges"),
+        cast(ProviderSearch.average_total_payments, Float).label("average_total_payments"),
+        cast(ProviderSearch.average_medicare_payments, Float).label("average_medicare_payments"),
+        ProviderSearch.rating,
+        (distance_km(lat, lon) if provider_ids is None else cast(null(), Float)).label("distance_km"),
+        sort_value.label("sort_key"),
+    ]
+    per_code = drg is not None and not isinstance(drg, str) and sort != "distance" and limit is not None
+    conditions = search_conditions(None if per_code else drg, lat, lon, radius_km, provider_ids)
+    if after is not None:
+        conditions.append(keyset_condition(after, lat, lon))
+    # provider_id / definition break ties so the order is deterministic (and
+    # identical to the in-memory backend, which compares codepoints)
+    if limit is None:
+        return select(*columns).where(*conditions).order_by(*order_by)
+    limit_param = bindparam("limit", limit, type_=Integer)
+    if not per_code:
+        return select(*columns).where(*conditions).order_by(*order_by).limit(limit_param)
+    # Several resolved codes: drg_code = ANY(...) cannot read the
+    # (drg_code, sort key) index in order, so each code takes its own page from
+    # its index range (LATERAL per code) and only those rows are merged
+    codes = (
+        func.unnest(bindparam("drg_codes", list(drg), type_=ARRAY(Integer)))
+        .table_valued("code")
+        .render_derived(name="drg_codes")
+    )
+    page = (
+        select(*columns)
+        .where(ProviderSearch.drg_code == codes.c.code, *conditions)
+        .order_by(*order_by)
+        .limit(limit_param)
+        .lateral("per_code")
+    )
+    key = -page.c.sort_key if sort == "rating" else page.c.sort_key
+    return (
+        select(*[page.c[c.name] for c in columns])
+        .select_from(codes)
+        .join(page, true())
+        .order_by(
+            page.c.sort_key.is_(None),
+            key,
+            page.c.provider_id.collate("C"),
+            page.c.ms_drg_definition.collate("C"),
+        )
+        .limit(limit_param)
+    )
+
+
+@lru_cache(maxsize=None)
+def _provider_search_shape(drg_kind: str, sort: str, with_ids: bool, after_kind: Optional[str], limited: bool):
+    # Built once per shape from placeholder values. Reusing the same statement
+    # object skips construction and cache-key generation on every request, and
+    # the identical SQL text stays in asyncpg's prepared statement cache.
+    drg = {"none": "", "code": "0", "codes": [0]}[drg_kind]
+    after = None
+    if after_kind is not None:
+        value = None if after_kind == "null" else {"price": "0", "rating": 0, "distance": 0.0}[sort]
+        after = Cursor(sort, value, "", "")
+    return provider_search_stmt(
+        drg, 0.0, 0.0, 0.0, limit=1 if limited else None, provider_ids=[] if with_ids else None, sort=sort, after=after
+    )
+
+
+def provider_search_query(
+    drg: DrgFilter,
+    lat: float,
+    lon: float,
+    radius_km: float,
+    limit: Optional[int] = 100,
+    provider_ids: Optional[Sequence[str]] = None,
+    sort: str = "price",
+    after: Optional[Cursor] = None,
+) -> tuple:
+    # (prebuilt statement, parameters) for provider_search_stmt(...) with the same arguments
+    params = {"lat": lat, "lon": lon, "radius_m": radius_km * 1000.0, "limit": limit}
+    drg_kind = "none"
+    if drg is not None and not isinstance(drg, str):
+        drg_kind, params["drg_codes"] = "codes", list(drg)
+    elif drg and drg.strip():
+        # drg_condition raises for free text, like provider_search_stmt would
+        drg_condition(drg)
+        drg_kind, params["drg_code"] = "code", parse_drg_code(drg)
+    if provider_ids is not None:
+        params["provider_ids"] = list(provider_ids)
+    after_kind = None
+    if after is not None:
+        after_kind = "null" if after.value is None and sort != "distance" else "value"
+        params.update(
+            after_value=_cursor_value(after),
+            after_provider_id=after.provider_id,
+            after_definition=after.ms_drg_definition,
+        )
+    stmt = _provider_search_shape(drg_kind, sort, provider_ids is not None, after_kind, limit is not None)
+    return stmt, params
+
+
+# /ask intents. Each takes the conditions from search_conditions() so every
+# intent filters identically, and each is answered in a single statement.
+
+
+def _ask_columns() -> list:
+    return [
+        ProviderSearch.provider_id,
+        ProviderSearch.name,
+        ProviderSearch.city,
+        ProviderSearch.state,
+        ProviderSearch.zip_code,
+        ProviderSearch.ms_drg_definition,
+        ProviderSearch.average_covered_charges,
+        ProviderSearch.rating,
+    ]
+
+
+def cheapest_stmt(conditions: list, top_k: int):
+    return (
+        select(*_ask_columns())
+        .where(*conditions)
+        .order_by(ProviderSearch.average_covered_charges.asc().nullslast(), *_tie_breakers())
+        .limit(top_k)
+    )
+
+
+def best_rated_stmt(conditions: list, top_k: int):
+    # DISTINCT ON keeps one row per provider (its cheapest matching DRG), then
+    # the outer query ranks providers, so exactly top_k distinct hospitals return
+    per_provider = (
+        select(*_ask_columns())
+        .where(*conditions)
+        .distinct(ProviderSearch.provider_id)
+        .order_by(ProviderSearch.provider_id, ProviderSearch.average_covered_charges.asc().nullslast())
+        .subquery("per_provider")
+    )
+    return (
+        select(per_provider)
+        .order_by(
+            per_provider.c.rating.desc().nullslast(),
+            per_provider.c.average_covered_charges.asc().nullslast(),
+            per_provider.c.provider_id,
+        )
+        .limit(top_k)
+    )
+
+
+def average_cost_stmt(conditions: list):
+    return select(
+        func.avg(ProviderSearch.average_covered_charges).label("avg_cost"),
+        func.count().label("count"),
+    ).where(*conditions)
+
+
+def compare_costs_stmt(conditions: list):
+    # Spread, quartiles and the cheapest / priciest hospital in one aggregate row
+    charges = ProviderSearch.average_covered_charges
+    priced = charges.isnot(None)
+    return select(
+        func.count(charges).label("count"),
+        func.min(charges).label("min_cost"),
+        func.max(charges).label("max_cost"),
+        func.avg(charges).label("avg_cost"),
+        func.percentile_cont(0.25).within_group(charges).label("p25"),
+        func.percentile_cont(0.5).within_group(charges).label("median"),
+        func.percentile_cont(0.75).within_group(charges).label("p75"),
+        func.array_agg(aggregate_order_by(ProviderSearch.name, charges.asc())).filter(priced)[1].label("cheapest"),
+        func.array_agg(aggregate_order_by(ProviderSearch.name, charges.desc())).filter(priced)[1].label("priciest"),
+    ).where(*conditions)
+
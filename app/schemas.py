@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 
 
 class ProviderResult(BaseModel):
@@ -9,13 +9,36 @@ class ProviderResult(BaseModel):
     state: Optional[str]
     zip_code: Optional[str]
     ms_drg_definition: str
-    average_covered_charges: float
+    average_covered_charges: Optional[float]
     average_total_payments: Optional[float] = None
     average_medicare_payments: Optional[float] = None
     rating: Optional[int] = None
     distance_km: Optional[float] = None
 
 
+class BatchQuery(BaseModel):
+    drg: str
+    # Not length-checked here: a bad ZIP is reported on its item, not as a 422
+    zip: str
+    radius_km: int = Field(40, ge=1, le=500)
+    sort: Literal["price", "distance", "rating"] = "price"
+    limit: int = Field(100, ge=1, le=500)
+
+
+class BatchRequest(BaseModel):
+    queries: List[BatchQuery] = Field(..., max_length=1000)
+
+
+class BatchItem(BaseModel):
+    index: int
+    results: Optional[List[ProviderResult]] = None
+    error: Optional[str] = None
+
+
+class BatchResponse(BaseModel):
+    results: List[BatchItem]
+
+
 class AskRequest(BaseModel):
     question: str
 
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from typing import Iterable, Optional
+
+import orjson
+
+from .schemas import ProviderResult
+
+
+# provider_search_stmt() selects these first, in this order, with float8 prices,
+# so a row maps onto a ProviderResult payload without conversion or validation
+RESULT_COLUMNS = tuple(ProviderResult.model_fields)
+
+
+def result_dicts(rows: Iterable, distances: Optional[dict] = None) -> list[dict]:
+    # zip() stops at the result columns, dropping trailing ones such as sort_key
+    if distances is None:
+        return [dict(zip(RESULT_COLUMNS, row)) for row in rows]
+    results = []
+    for row in rows:
+        item = dict(zip(RESULT_COLUMNS, row))
+        item["distance_km"] = distances[item["provider_id"]]
+        results.append(item)
+    return results
+
+
+def encode_results(rows: Iterable, distances: Optional[dict] = None) -> bytes:
+    # JSON array body for /providers, same shape as List[ProviderResult]
+    return orjson.dumps(result_dicts(rows, distances))
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Awaitable, Callable, Optional
+from urllib.parse import parse_qsl
+
+from sqlalchemy import event
+
+
+# ASGI scope of the request being served; SQLAlchemy copies the context into the
+# greenlet that runs cursor events, so the hook can see which route issued a query
+current_request: ContextVar[Optional[dict]] = ContextVar("current_request", default=None)
+
+# Only statements that are safe to execute a second time are explained
+EXPLAINABLE = ("select", "with")
+
+
+class RequestContextMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = current_request.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_request.reset(token)
+
+
+def _jsonable(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, Decimal):
+        return str(value)
+    return repr(value)
+
+
+@dataclass
+class SlowQuery:
+    captured_at: str
+    duration_ms: float
+    method: Optional[str]
+    route: Optional[str]
+    path: Optional[str]
+    query_params: dict
+    statement: str
+    parameters: list
+    # EXPLAIN (ANALYZE, BUFFERS) output, filled in once the re-run finishes
+    plan: Optional[list] = None
+    plan_error: Optional[str] = None
+    explain_ms: Optional[float] = None
+    status: str = "pending"
+
+
+ExplainFn = Callable[[str, tuple], Awaitable[list]]
+
+
+class SlowQueryLog:
+    # Statements slower than threshold_ms are sampled at sample_rate and re-run
+    # under EXPLAIN (ANALYZE, BUFFERS) in the background, on their own pooled
+    # connection and at most `max_concurrent_explains` at a time, so the request
+    # that triggered it is not slowed down. The newest `max_entries` are kept.
+
+    def __init__(
+        self,
+        threshold_ms: float,
+        sample_rate: float,
+        max_entries: int = 50,
+        explain: Optional[ExplainFn] = None,
+        max_concurrent_explains: int = 1,
+    ):
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self.explain = explain
+        self.max_concurrent_explains = max_concurrent_explains
+        self.entries: "deque[SlowQuery]" = deque(maxlen=max_entries)
+        self.statements = 0
+        self.slow = 0
+        self._explaining = 0
+        self._tasks: set[asyncio.Task] = set()
+
+    def install(self, engine, explain: Optional[ExplainFn] = None) -> None:
+        if explain is not None:
+            self.explain = explain
+        sync_engine = getattr(engine, "sync_engine", engine)
+        event.listen(sync_engine, "before_cursor_execute", self._before)
+        event.listen(sync_engine, "after_cursor_execute", self._after)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._slow_query_start = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_slow_query_start", None)
+        if start is not None and not executemany:
+            self.observe(statement, parameters, (time.perf_counter() - start) * 1000.0)
+
+    def observe(self, statement: str, parameters, duration_ms: float) -> Optional[SlowQuery]:
+        self.statements += 1
+        if duration_ms < self.threshold_ms:
+            return None
+        self.slow += 1
+        if random.random() >= self.sample_rate:
+            return None
+        scope = current_request.get()
+        route = scope.get("route") if scope else None
+        entry = SlowQuery(
+            captured_at=datetime.now(timezone.utc).isoformat(),
+            duration_ms=round(duration_ms, 3),
+            method=scope.get("method") if scope else None,
+            route=getattr(route, "path", None),
+            path=scope.get("path") if scope else None,
+            query_params=dict(parse_qsl(scope.get("query_string", b"").decode("latin-1"))) if scope else {},
+            statement=statement,
+            parameters=_jsonable(list(parameters or ())),
+        )
+        self.entries.append(entry)
+        self._schedule_explain(entry, statement, tuple(parameters or ()))
+        return entry
+
+    def _schedule_explain(self, entry: SlowQuery, statement: str, parameters: tuple) -> None:
+        if not statement.lstrip().lower().startswith(EXPLAINABLE):
+            entry.status = "not_explainable"
+            return
+        if self.explain is None:
+            entry.status = "no_explainer"
+            return
+        if self._explaining >= self.max_concurrent_explains:
+            entry.status = "skipped_busy"
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            entry.status = "no_event_loop"
+            return
+        self._explaining += 1
+        task = loop.create_task(self._run_explain(entry, statement, parameters))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_explain(self, entry: SlowQuery, statement: str, parameters: tuple) -> None:
+        start = time.perf_counter()
+        try:
+            entry.plan = await self.explain(statement, parameters)
+            entry.status = "explained"
+        except Exception as exc:
+            entry.plan_error = f"{type(exc).__name__}: {exc}"
+            entry.status = "failed"
+        finally:
+            entry.explain_ms = round((time.perf_counter() - start) * 1000.0, 3)
+            self._explaining -= 1
+
+    def snapshot(self, limit: Optional[int] = None) -> dict:
+        entries = [asdict(e) for e in reversed(self.entries)]
+        return {
+            "threshold_ms": self.threshold_ms,
+            "sample_rate": self.sample_rate,
+            "statements": self.statements,
+            "slow": self.slow,
+            "entries": entries[:limit] if limit is not None else entries,
+        }
+
+    def clear(self) -> None:
+        self.entries.clear()
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import math
+from typing import Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import settings
+from .models import Provider
+from .versioning import VersionedResource
+
+
+# Radius of earthdistance's earth() in km, so distances agree with earth_distance()
+EARTH_RADIUS_KM = 6378.168
+KM_PER_DEG_LAT = math.pi * EARTH_RADIUS_KM / 180.0
+
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    # Haversine on a sphere of EARTH_RADIUS_KM (earthdistance's earth()), so it
+    # matches earth_distance() in SQL; vectorized over candidate points
+    lat1 = math.radians(lat)
+    lat2 = np.radians(lats)
+    dlat = lat2 - lat1
+    dlon = np.radians(lons) - math.radians(lon)
+    a = np.sin(dlat / 2.0) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class SpatialIndex:
+    # Fixed lat/lon bucket grid over provider coordinates. Points are sorted by
+    # cell so each cell is one contiguous slice; a radius query gathers the
+    # slices of the cells overlapping the search box, then filters by exact
+    # haversine distance.
+
+    def __init__(self, provider_ids: Sequence[str], lats: np.ndarray, lons: np.ndarray, cell_deg: float = 0.5):
+        self.cell_deg = cell_deg
+        self.n_rows = int(math.ceil(180.0 / cell_deg))
+        self.n_cols = int(math.ceil(360.0 / cell_deg))
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        keys = self._row(lats) * self.n_cols + self._col(lons)
+        order = np.argsort(keys, kind="stable")
+        self.provider_ids = np.asarray(provider_ids, dtype=object)[order]
+        self.lats = lats[order]
+        self.lons = lons[order]
+        sorted_keys = keys[order]
+        self.cell_keys, self.cell_starts = np.unique(sorted_keys, return_index=True)
+        self.cell_ends = np.append(self.cell_starts[1:], len(sorted_keys))
+
+    def _row(self, lats):
+        return np.clip(np.floor((np.asarray(lats) + 90.0) / self.cell_deg), 0, self.n_rows - 1).astype(np.int64)
+
+    def _col(self, lons):
+        return (np.floor((np.asarray(lons) + 180.0) / self.cell_deg).astype(np.int64)) % self.n_cols
+
+    def __len__(self) -> int:
+        return len(self.provider_ids)
+
+    def _candidates(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        dlat = radius_km / KM_PER_DEG_LAT
+        lat_lo, lat_hi = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+        rows = np.arange(self._row(lat_lo), self._row(lat_hi) + 1)
+        # Longitude half-width of a spherical cap: asin(sin(r) / cos(lat)); take
+        # every column when the cap reaches a pole
+        ratio = math.sin(math.radians(dlat)) / max(math.cos(math.radians(lat)), 1e-12)
+        if lat_lo <= -90.0 or lat_hi >= 90.0 or ratio >= 1.0:
+            cols = np.arange(self.n_cols)
+        else:
+            dlon = math.degrees(math.asin(ratio))
+            first = int(math.floor((lon - dlon + 180.0) / self.cell_deg))
+            last = int(math.floor((lon + dlon + 180.0) / self.cell_deg))
+            cols = np.unique(np.arange(first, last + 1) % self.n_cols)
+        if len(self.cell_keys) == 0:
+            return np.empty(0, dtype=np.int64)
+        wanted = np.add.outer(rows * self.n_cols, cols).ravel()
+        pos = np.minimum(np.searchsorted(self.cell_keys, wanted), len(self.cell_keys) - 1)
+        pos = pos[self.cell_keys[pos] == wanted]
+        if len(pos) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(s, e) for s, e in zip(self.cell_starts[pos], self.cell_ends[pos])])
+
+    def within(self, lat: float, lon: float, radius_km: float) -> tuple[np.ndarray, np.ndarray]:
+        # (provider_ids, distance_km) for every provider within radius_km, nearest first
+        idx = self._candidates(lat, lon, radius_km)
+        if len(idx) == 0:
+            return np.empty(0, dtype=object), np.empty(0, dtype=np.float64)
+        dist = haversine_km(lat, lon, self.lats[idx], self.lons[idx])
+        hit = dist <= radius_km
+        idx, dist = idx[hit], dist[hit]
+        order = np.argsort(dist, kind="stable")
+        return self.provider_ids[idx[order]], dist[order]
+
+
+async def _fetch_provider_points(session: AsyncSession) -> Sequence:
+    return (
+        await session.execute(
+            select(Provider.provider_id, Provider.latitude, Provider.longitude).where(
+                Provider.latitude.isnot(None), Provider.longitude.isnot(None)
+            )
+        )
+    ).all()
+
+
+def _build_spatial_index(rows: Sequence) -> SpatialIndex:
+    return SpatialIndex(
+        [r.provider_id for r in rows],
+        np.fromiter((r.latitude for r in rows), dtype=np.float64, count=len(rows)),
+        np.fromiter((r.longitude for r in rows), dtype=np.float64, count=len(rows)),
+        cell_deg=settings.spatial_cell_deg,
+    )
+
+
+spatial_index = VersionedResource(_fetch_provider_points, _build_spatial_index)
+
+
+async def providers_within(
+    session: AsyncSession, lat: float, lon: float, radius_km: float
+) -> Optional[tuple[np.ndarray, np.ndarray]]:
+    # None when the in-process index is disabled and SQL should do the radius filter
+    if not settings.spatial_index_enabled:
+        return None
+    index = await spatial_index.get(session)
+    return index.within(lat, lon, radius_km)
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Generic, Optional, TypeVar
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import settings
+from .models import DataVersion
+
+
+class DataVersionTracker:
+    # Caches the ETL data version and re-reads it at most every `check_interval`
+    # seconds, so each worker notices a reload without a query per request.
+
+    def __init__(self, check_interval: float):
+        self.check_interval = check_interval
+        self._version: Optional[int] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def current(self, session: AsyncSession) -> int:
+        if self._version is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return self._version
+        async with self._lock:
+            if self._version is None or time.monotonic() - self._checked_at >= self.check_interval:
+                value = (await session.execute(select(DataVersion.version).where(DataVersion.id == 1))).scalar()
+                self._version = int(value or 0)
+                self._checked_at = time.monotonic()
+        return self._version
+
+    def invalidate(self) -> None:
+        self._checked_at = 0.0
+
+
+data_version = DataVersionTracker(settings.data_version_check_seconds)
+
+
+T = TypeVar("T")
+
+
+class VersionedResource(Generic[T]):
+    # In-process structure derived from the database (indexes, column stores, ...).
+    # Built on first use and rebuilt when the data version changes; the new value
+    # replaces the old one in a single assignment, and while a rebuild is running
+    # other requests keep using the previous value. `fetch` reads the rows on the
+    # event loop; the CPU-bound `build` runs in a worker thread so a rebuild
+    # after every ETL load does not stall the worker's other requests.
+
+    def __init__(self, fetch: Callable[[AsyncSession], Awaitable[Any]], build: Callable[[Any], T]):
+        self._fetch = fetch
+        self._build = build
+        self._value: Optional[T] = None
+        self._version: Optional[int] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def version(self) -> Optional[int]:
+        return self._version
+
+    async def get(self, session: AsyncSession) -> T:
+        version = await data_version.current(session)
+        if self._value is not None and (self._version == version or self._lock.locked()):
+            return self._value
+        async with self._lock:
+            if self._value is None or self._version != version:
+                rows = await self._fetch(session)
+                value = await asyncio.to_thread(self._build, rows)
+                self._value, self._version = value, version
+        return self._value  # type: ignore[return-value]
+
+    def reset(self) -> None:
+        self._value = None
+        self._version = None
@@ -0,0 +1,95 @@
+"""Serialization cost of a /providers response: model path vs direct path.
+
+    python -m benchmarks.bench_serialization [--repeat N]
+
+"models" is the previous path: Decimal rows -> ProviderResult per row ->
+model_dump -> orjson, plus FastAPI's response_model validation and
+serialization of the returned list. "direct" is the current path: float rows
+from SQL encoded straight to orjson bytes (app.serialization.encode_results).
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from decimal import Decimal
+from typing import List
+
+import orjson
+from pydantic import TypeAdapter
+
+from app.schemas import ProviderResult
+from app.serialization import encode_results
+
+
+def make_rows(n: int, seed: int = 0) -> tuple[list[tuple], list[tuple]]:
+    # The same rows as the database returns them before (Numeric) and after (float8)
+    rng = random.Random(seed)
+    decimal_rows, float_rows = [], []
+    for i in range(n):
+        charges = Decimal(f"{rng.uniform(5000, 250000):.2f}")
+        total = Decimal(f"{rng.uniform(3000, 60000):.2f}")
+        medicare = Decimal(f"{rng.uniform(2000, 50000):.2f}")
+        head = (f"{330000 + i}", f"HOSPITAL {i}", "NEW YORK", "NY", "10001", "470 - MAJOR JOINT REPLACEMENT")
+        tail = (rng.randint(1, 10), rng.uniform(0, 40))
+        decimal_rows.append(head + (charges, total, medicare) + tail + (charges,))
+        float_rows.append(head + (float(charges), float(total), float(medicare)) + tail + (charges,))
+    return decimal_rows, float_rows
+
+
+_response_adapter = TypeAdapter(List[ProviderResult])
+
+
+def via_models(rows: list[tuple]) -> bytes:
+    results = [
+        ProviderResult(
+            provider_id=r[0],
+            name=r[1],
+            city=r[2],
+            state=r[3],
+            zip_code=r[4],
+            ms_drg_definition=r[5],
+            average_covered_charges=float(r[6]) if r[6] is not None else None,
+            average_total_payments=float(r[7]) if r[7] is not None else None,
+            average_medicare_payments=float(r[8]) if r[8] is not None else None,
+            rating=r[9],
+            distance_km=float(r[10]) if r[10] is not None else None,
+        )
+        for r in rows
+    ]
+    body = orjson.dumps([m.model_dump() for m in results])
+    # FastAPI's response_model pass over the same models: validate, then serialize
+    _response_adapter.dump_json(_response_adapter.validate_python(results))
+    return body
+
+
+def direct(rows: list[tuple]) -> bytes:
+    return encode_results(rows)
+
+
+def best_of(fn, rows, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(rows)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    print(f"{'rows':>7} {'models ms':>10} {'direct ms':>10} {'speedup':>8}")
+    for n in (100, 10_000):
+        decimal_rows, float_rows = make_rows(n)
+        assert orjson.loads(via_models(decimal_rows)) == orjson.loads(direct(float_rows))
+        slow = best_of(via_models, decimal_rows, args.repeat)
+        fast = best_of(direct, float_rows, args.repeat)
+        print(f"{n:>7} {slow * 1e3:>10.3f} {fast * 1e3:>10.3f} {slow / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
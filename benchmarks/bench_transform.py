@@ -0,0 +1,119 @@
+"""ETL read + transform throughput on generated data, without a database.
+
+    python -m benchmarks.bench_transform --providers 3000 --drgs 100 --repeat 3
+    python -m benchmarks.bench_transform --csv data/bench_sf1.csv --cprofile transform.prof
+
+Runs the same pandas reader and transform_chunk as etl.py, chunk by chunk, and
+reports rows/s for read, fingerprint, transform and its geocode / clean_money
+parts (best of --repeat runs), plus peak RSS, as JSON.
+"""
+
+from __future__ import annotations
+
+import argparse
+import cProfile
+import json
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from app.geo import ZIP_SPACE, ZipIndex
+from etl import EtlStats, chunk_fingerprint, peak_rss_mb, transform_chunk
+
+from .generate import candidate_zips, write_csv
+from .report import run_metadata
+
+
+def zip_index_for(zip_source: str) -> ZipIndex:
+    # The real snapshot when there is one; otherwise every generated ZIP gets a
+    # fixed pseudo-random point, so geocoding does the same amount of work
+    if zip_source == "index":
+        try:
+            from app.geo import get_zip_index
+
+            return get_zip_index()
+        except Exception:
+            pass
+    table = np.full((ZIP_SPACE, 2), np.nan)
+    zips = candidate_zips("ranges")
+    rng = np.random.default_rng(0)
+    table[zips, 0] = rng.uniform(25.0, 49.0, len(zips))
+    table[zips, 1] = rng.uniform(-124.0, -67.0, len(zips))
+    return ZipIndex(table)
+
+
+def run_once(csv_path: Path, zip_index: ZipIndex, chunksize: int) -> EtlStats:
+    stats = EtlStats()
+    provider_seen: set = set()
+    chunks = pd.read_csv(csv_path, dtype=str, chunksize=chunksize, encoding="latin1", on_bad_lines="skip")
+    while True:
+        with stats.stage("read"):
+            chunk = next(chunks, None)
+        if chunk is None:
+            break
+        stats.add_rows("read", len(chunk))
+        with stats.stage("fingerprint", len(chunk)):
+            chunk_fingerprint(chunk)
+        with stats.stage("transform", len(chunk)):
+            transform_chunk(chunk, zip_index, provider_seen, stats)
+    return stats
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--csv", type=Path, help="existing CSV; otherwise one is generated")
+    parser.add_argument("--providers", type=int, default=3000)
+    parser.add_argument("--drgs", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--zips", choices=["index", "ranges"], default="index")
+    parser.add_argument("--chunksize", type=int, default=5000, help="etl.py reads 5000 rows per chunk")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--cprofile", type=Path, help="write cProfile stats of one extra run here")
+    parser.add_argument("--out", type=Path, help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = args.csv
+        if csv_path is None:
+            csv_path = Path(tmp) / "bench.csv"
+            write_csv(csv_path, args.providers, args.drgs, seed=args.seed, zip_source=args.zips)
+        zip_index = zip_index_for(args.zips)
+
+        best: dict = {}
+        for _ in range(args.repeat):
+            stats = run_once(csv_path, zip_index, args.chunksize)
+            for name, t in stats.stages.items():
+                if name not in best or t.seconds < best[name]["seconds"]:
+                    best[name] = {"rows": t.rows, "seconds": round(t.seconds, 4)}
+        if args.cprofile:
+            profiler = cProfile.Profile()
+            profiler.runcall(run_once, csv_path, zip_index, args.chunksize)
+            profiler.dump_stats(args.cprofile)
+
+    for timing in best.values():
+        timing["rows_per_second"] = round(timing["rows"] / timing["seconds"]) if timing["seconds"] else None
+    report = {
+        **run_metadata(),
+        "config": {
+            "csv": str(args.csv) if args.csv else None,
+            "providers": None if args.csv else args.providers,
+            "drgs": None if args.csv else args.drgs,
+            "seed": args.seed,
+            "chunksize": args.chunksize,
+            "repeat": args.repeat,
+        },
+        "stages": best,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
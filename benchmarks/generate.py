@@ -0,0 +1,247 @@
+"""Deterministic CMS-shaped inpatient CSVs at configurable scale.
+
+    python -m benchmarks.generate --providers 3000 --drgs 100 --out data/bench_sf1.csv
+    python -m benchmarks.generate --scale 10 --out data/bench_sf10.csv
+
+Rows are providers x DRGs, each provider billing a `--coverage` share of the
+DRGs. The same arguments (and ZIP snapshot) always produce the same file.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+# Scale factor 1 is roughly one national CMS release
+BASE_PROVIDERS = 3000
+BASE_DRGS = 100
+
+CMS_COLUMNS = [
+    "Rndrng_Prvdr_CCN",
+    "Rndrng_Prvdr_Org_Name",
+    "Rndrng_Prvdr_City",
+    "Rndrng_Prvdr_St",
+    "Rndrng_Prvdr_State_FIPS",
+    "Rndrng_Prvdr_Zip5",
+    "Rndrng_Prvdr_State_Abrvtn",
+    "Rndrng_Prvdr_RUCA",
+    "Rndrng_Prvdr_RUCA_Desc",
+    "DRG_Cd",
+    "DRG_Desc",
+    "Tot_Dschrgs",
+    "Avg_Submtd_Cvrd_Chrg",
+    "Avg_Tot_Pymt_Amt",
+    "Avg_Mdcr_Pymt_Amt",
+]
+
+# (first ZIP3, last ZIP3, state, FIPS); a few ZIP3s inside these ranges belong
+# to a neighbouring state, which does not matter for generated data
+STATE_ZIP3 = [
+    (10, 27, "MA", "25"), (28, 29, "RI", "44"), (30, 38, "NH", "33"), (39, 49, "ME", "23"),
+    (50, 59, "VT", "50"), (60, 69, "CT", "09"), (70, 89, "NJ", "34"), (100, 149, "NY", "36"),
+    (150, 196, "PA", "42"), (197, 199, "DE", "10"), (200, 205, "DC", "11"), (206, 219, "MD", "24"),
+    (220, 246, "VA", "51"), (247, 268, "WV", "54"), (270, 289, "NC", "37"), (290, 299, "SC", "45"),
+    (300, 319, "GA", "13"), (320, 349, "FL", "12"), (350, 369, "AL", "01"), (370, 385, "TN", "47"),
+    (386, 397, "MS", "28"), (400, 427, "KY", "21"), (430, 459, "OH", "39"), (460, 479, "IN", "18"),
+    (480, 499, "MI", "26"), (500, 528, "IA", "19"), (530, 549, "WI", "55"), (550, 567, "MN", "27"),
+    (570, 577, "SD", "46"), (580, 588, "ND", "38"), (590, 599, "MT", "30"), (600, 629, "IL", "17"),
+    (630, 658, "MO", "29"), (660, 679, "KS", "20"), (680, 693, "NE", "31"), (700, 714, "LA", "22"),
+    (716, 729, "AR", "05"), (730, 749, "OK", "40"), (750, 799, "TX", "48"), (800, 816, "CO", "08"),
+    (820, 831, "WY", "56"), (832, 838, "ID", "16"), (840, 847, "UT", "49"), (850, 865, "AZ", "04"),
+    (870, 884, "NM", "35"), (889, 898, "NV", "32"), (900, 961, "CA", "06"), (967, 968, "HI", "15"),
+    (970, 979, "OR", "41"), (980, 994, "WA", "53"), (995, 999, "AK", "02"),
+]
+
+# Common MS-DRGs with a typical covered charge; the rest are synthesized
+COMMON_DRGS = [
+    (470, "MAJOR HIP AND KNEE JOINT REPLACEMENT OR REATTACHMENT OF LOWER EXTREMITY WITHOUT MCC", 65000),
+    (871, "SEPTICEMIA OR SEVERE SEPSIS WITHOUT MV >96 HOURS WITH MCC", 85000),
+    (291, "HEART FAILURE AND SHOCK WITH MCC", 55000),
+    (292, "HEART FAILURE AND SHOCK WITH CC", 38000),
+    (193, "SIMPLE PNEUMONIA AND PLEURISY WITH MCC", 48000),
+    (194, "SIMPLE PNEUMONIA AND PLEURISY WITH CC", 34000),
+    (190, "CHRONIC OBSTRUCTIVE PULMONARY DISEASE WITH MCC", 45000),
+    (392, "ESOPHAGITIS, GASTROENTERITIS AND MISCELLANEOUS DIGESTIVE DISORDERS WITHOUT MCC", 28000),
+    (690, "KIDNEY AND URINARY TRACT INFECTIONS WITHOUT MCC", 26000),
+    (683, "RENAL FAILURE WITH CC", 33000),
+    (682, "RENAL FAILURE WITH MCC", 50000),
+    (603, "CELLULITIS WITHOUT MCC", 27000),
+    (65, "INTRACRANIAL HEMORRHAGE OR CEREBRAL INFARCTION WITH CC OR TPA IN 24 HRS", 42000),
+    (64, "INTRACRANIAL HEMORRHAGE OR CEREBRAL INFARCTION WITH MCC", 70000),
+    (247, "PERCUTANEOUS CARDIOVASCULAR PROCEDURES WITH DRUG-ELUTING STENT WITHOUT MCC", 90000),
+    (246, "PERCUTANEOUS CARDIOVASCULAR PROCEDURES WITH DRUG-ELUTING STENT WITH MCC OR 4+ ARTERIES OR STENTS", 120000),
+    (280, "ACUTE MYOCARDIAL INFARCTION, DISCHARGED ALIVE WITH MCC", 60000),
+    (308, "CARDIAC ARRHYTHMIA AND CONDUCTION DISORDERS WITH MCC", 45000),
+    (309, "CARDIAC ARRHYTHMIA AND CONDUCTION DISORDERS WITH CC", 32000),
+    (312, "SYNCOPE AND COLLAPSE", 28000),
+    (378, "G.I. HEMORRHAGE WITH CC", 36000),
+    (377, "G.I. HEMORRHAGE WITH MCC", 55000),
+    (640, "MISCELLANEOUS DISORDERS OF NUTRITION, METABOLISM, FLUIDS AND ELECTROLYTES WITH MCC", 35000),
+    (641, "MISCELLANEOUS DISORDERS OF NUTRITION, METABOLISM, FLUIDS AND ELECTROLYTES WITHOUT MCC", 24000),
+    (189, "PULMONARY EDEMA AND RESPIRATORY FAILURE", 52000),
+    (207, "RESPIRATORY SYSTEM DIAGNOSIS WITH VENTILATOR SUPPORT >96 HOURS", 230000),
+    (853, "INFECTIOUS AND PARASITIC DISEASES WITH O.R. PROCEDURE WITH MCC", 200000),
+    (460, "SPINAL FUSION EXCEPT CERVICAL WITHOUT MCC", 140000),
+    (480, "HIP AND FEMUR PROCEDURES EXCEPT MAJOR JOINT WITH MCC", 95000),
+    (481, "HIP AND FEMUR PROCEDURES EXCEPT MAJOR JOINT WITH CC", 75000),
+    (885, "PSYCHOSES", 30000),
+    (897, "ALCOHOL, DRUG ABUSE OR DEPENDENCE WITHOUT REHABILITATION THERAPY WITHOUT MCC", 22000),
+    (314, "OTHER CIRCULATORY SYSTEM DIAGNOSES WITH MCC", 58000),
+    (177, "RESPIRATORY INFECTIONS AND INFLAMMATIONS WITH MCC", 62000),
+    (252, "OTHER VASCULAR PROCEDURES WITH MCC", 110000),
+    (329, "MAJOR SMALL AND LARGE BOWEL PROCEDURES WITH MCC", 170000),
+    (330, "MAJOR SMALL AND LARGE BOWEL PROCEDURES WITH CC", 100000),
+    (39, "EXTRACRANIAL PROCEDURES WITHOUT CC/MCC", 45000),
+    (439, "DISORDERS OF PANCREAS EXCEPT MALIGNANCY WITH CC", 36000),
+    (638, "DIABETES WITH CC", 29000),
+]
+
+_BODY = ["CARDIAC", "RENAL", "HEPATIC", "PULMONARY", "NEUROLOGICAL", "VASCULAR", "ENDOCRINE", "SKIN", "BONE", "BLOOD"]
+_KIND = ["DISORDERS", "PROCEDURES", "INFECTIONS", "INJURIES", "MALIGNANCY", "DIAGNOSES"]
+_SEVERITY = ["WITH MCC", "WITH CC", "WITHOUT CC/MCC", "WITHOUT MCC"]
+_NAME_HEAD = ["ST. MARY", "MERCY", "GOOD SAMARITAN", "UNIVERSITY", "COMMUNITY", "REGIONAL", "MEMORIAL", "GENERAL", "BAPTIST", "SACRED HEART"]
+_NAME_TAIL = ["HOSPITAL", "MEDICAL CENTER", "HEALTH SYSTEM", "HOSPITAL CENTER", "REGIONAL MEDICAL CENTER"]
+_CITIES = ["SPRINGFIELD", "FRANKLIN", "GREENVILLE", "CLINTON", "MADISON", "SALEM", "FAIRVIEW", "RIVERSIDE", "GEORGETOWN", "ARLINGTON"]
+_RUCA = [("1", "Metropolitan area core: primary flow within an urbanized area of 50,000 and greater"),
+         ("4", "Micropolitan area core: primary flow within an Urban Cluster of 10,000 to 49,999"),
+         ("7", "Small town core: primary flow within an Urban Cluster of 2,500 to 9,999")]
+
+
+def drg_catalog(n_drgs: int, seed: int = 0) -> pd.DataFrame:
+    # Common DRGs first, then synthetic codes on unused numbers
+    rng = np.random.default_rng([seed, 1])
+    rows = [(code, desc, float(price)) for code, desc, price in COMMON_DRGS[:n_drgs]]
+    used = {r[0] for r in rows}
+    free = [c for c in range(1, 1000) if c not in used]
+    extra = n_drgs - len(rows)
+    if extra > len(free):
+        raise ValueError(f"at most {len(COMMON_DRGS) + len(free)} DRGs")
+    for code in sorted(rng.choice(free, size=max(extra, 0), replace=False).tolist()):
+        desc = f"{rng.choice(_BODY)} {rng.choice(_KIND)} {rng.choice(_SEVERITY)}"
+        rows.append((code, desc, float(np.round(rng.lognormal(np.log(45000), 0.6), -2))))
+    return pd.DataFrame(rows, columns=["drg_code", "description", "base_charge"])
+
+
+def candidate_zips(source: str = "index") -> np.ndarray:
+    # ZIPs the API can geocode (from the ZIP snapshot), or every ZIP in the
+    # state ranges when there is no snapshot
+    if source == "index":
+        try:
+            from app.geo import get_zip_index
+
+            table = np.asarray(get_zip_index().table)
+            known = np.flatnonzero(~np.isnan(table[:, 0]))
+            zip3 = known // 100
+            in_state = np.zeros(len(known), dtype=bool)
+            for lo, hi, _, _ in STATE_ZIP3:
+                in_state |= (zip3 >= lo) & (zip3 <= hi)
+            if in_state.any():
+                return known[in_state]
+        except Exception as exc:  # no snapshot and no pgeocode data
+            print(f"ZIP snapshot unavailable ({exc}); using state ZIP ranges", file=sys.stderr)
+    return np.concatenate([np.arange(lo * 100, (hi + 1) * 100) for lo, hi, _, _ in STATE_ZIP3])
+
+
+def _states_for(zips: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    zip3 = zips // 100
+    states = np.full(len(zips), "", dtype=object)
+    fips = np.full(len(zips), "", dtype=object)
+    for lo, hi, state, code in STATE_ZIP3:
+        hit = (zip3 >= lo) & (zip3 <= hi)
+        states[hit] = state
+        fips[hit] = code
+    return states, fips
+
+
+def provider_frame(n_providers: int, zips: np.ndarray, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng([seed, 2])
+    chosen = np.sort(rng.choice(zips, size=n_providers, replace=len(zips) < n_providers))
+    states, fips = _states_for(chosen)
+    ruca = rng.integers(0, len(_RUCA), n_providers)
+    names = [
+        f"{_NAME_HEAD[a]} {_NAME_TAIL[b]}{' ' + str(i) if i >= 50 else ''}"
+        for i, (a, b) in enumerate(zip(rng.integers(0, len(_NAME_HEAD), n_providers), rng.integers(0, len(_NAME_TAIL), n_providers)))
+    ]
+    return pd.DataFrame(
+        {
+            # CCN: two-digit state code (FIPS here) + four-digit sequence
+            "Rndrng_Prvdr_CCN": [f"{f}{i:04d}" for i, f in enumerate(fips)],
+            "Rndrng_Prvdr_Org_Name": names,
+            "Rndrng_Prvdr_City": np.asarray(_CITIES, dtype=object)[rng.integers(0, len(_CITIES), n_providers)],
+            "Rndrng_Prvdr_St": [f"{n} MAIN STREET" for n in rng.integers(1, 9999, n_providers)],
+            "Rndrng_Prvdr_State_FIPS": fips,
+            "Rndrng_Prvdr_Zip5": [f"{z:05d}" for z in chosen],
+            "Rndrng_Prvdr_State_Abrvtn": states,
+            "Rndrng_Prvdr_RUCA": [_RUCA[r][0] for r in ruca],
+            "Rndrng_Prvdr_RUCA_Desc": [_RUCA[r][1] for r in ruca],
+            # Hospital-level price multiplier
+            "cost_factor": rng.lognormal(0.0, 0.35, n_providers),
+        }
+    )
+
+
+def write_csv(
+    out: Path,
+    n_providers: int,
+    n_drgs: int,
+    coverage: float = 0.6,
+    seed: int = 0,
+    zip_source: str = "index",
+    providers_per_block: int = 1000,
+) -> int:
+    # Streams blocks of providers so memory stays flat at any scale; returns rows written
+    drgs = drg_catalog(n_drgs, seed)
+    providers = provider_frame(n_providers, candidate_zips(zip_source), seed)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    total = 0
+    with open(out, "w", encoding="latin1", newline="") as fh:
+        pd.DataFrame(columns=CMS_COLUMNS).to_csv(fh, index=False)
+        for start in range(0, n_providers, providers_per_block):
+            block = providers.iloc[start : start + providers_per_block]
+            rng = np.random.default_rng([seed, 3, start])
+            billed = rng.random((len(block), len(drgs))) < coverage
+            p_idx, d_idx = np.nonzero(billed)
+            n = len(p_idx)
+            charges = (
+                drgs["base_charge"].to_numpy()[d_idx]
+                * block["cost_factor"].to_numpy()[p_idx]
+                * rng.lognormal(0.0, 0.15, n)
+            )
+            total_payments = charges * rng.uniform(0.18, 0.32, n)
+            rows = block.iloc[p_idx][CMS_COLUMNS[:9]].reset_index(drop=True)
+            rows["DRG_Cd"] = [f"{c:03d}" for c in drgs["drg_code"].to_numpy()[d_idx]]
+            rows["DRG_Desc"] = drgs["description"].to_numpy()[d_idx]
+            # CMS suppresses counts under 11
+            rows["Tot_Dschrgs"] = 11 + rng.geometric(0.05, n)
+            rows["Avg_Submtd_Cvrd_Chrg"] = np.round(charges, 2)
+            rows["Avg_Tot_Pymt_Amt"] = np.round(total_payments, 2)
+            rows["Avg_Mdcr_Pymt_Amt"] = np.round(total_payments * rng.uniform(0.75, 0.95, n), 2)
+            rows[CMS_COLUMNS].to_csv(fh, index=False, header=False)
+            total += n
+    return total
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1.0, help=f"multiplies {BASE_PROVIDERS} providers")
+    parser.add_argument("--providers", type=int, help="overrides --scale")
+    parser.add_argument("--drgs", type=int, default=BASE_DRGS)
+    parser.add_argument("--coverage", type=float, default=0.6, help="share of DRGs billed by each provider")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--zips", choices=["index", "ranges"], default="index", help="where provider ZIPs come from")
+    parser.add_argument("--out", type=Path, default=Path("data/bench.csv"))
+    args = parser.parse_args(argv)
+
+    n_providers = args.providers or max(1, int(round(BASE_PROVIDERS * args.scale)))
+    rows = write_csv(args.out, n_providers, args.drgs, args.coverage, args.seed, args.zips)
+    print(f"Wrote {rows} rows ({n_providers} providers x {args.drgs} DRGs) to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
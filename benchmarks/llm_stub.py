@@ -0,0 +1,46 @@
+"""OpenAI-compatible stand-in for the /ask parameter extraction.
+
+    LLM_STUB_DELAY_MS=300 uvicorn benchmarks.llm_stub:app --port 8100
+    OPENAI_API_KEY=stub OPENAI_BASE_URL=http://localhost:8100/v1 uvicorn app.main:app
+
+Answers /v1/chat/completions with the regex parser's output after a fixed
+delay, so /ask load runs exercise the real client path without network calls,
+cost or model variance.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+from dataclasses import asdict
+
+from fastapi import FastAPI, Request
+
+from app.nl import _fallback_parse
+
+
+DELAY_SECONDS = float(os.getenv("LLM_STUB_DELAY_MS", "0")) / 1000.0
+
+app = FastAPI(title="LLM stub")
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    question = next((m["content"] for m in reversed(body.get("messages", [])) if m.get("role") == "user"), "")
+    question = question.removeprefix("Question: ")
+    if DELAY_SECONDS:
+        await asyncio.sleep(DELAY_SECONDS)
+    content = json.dumps(asdict(_fallback_parse(question)))
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [
+            {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+        ],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
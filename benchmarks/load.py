@@ -0,0 +1,173 @@
+"""Concurrent load driver for /providers and /ask.
+
+    python -m benchmarks.load --csv data/bench_sf1_d100_s0.csv --concurrency 32 --duration 30 \
+        --mix providers=0.8,ask=0.2 --out data/results/$(git rev-parse --short HEAD).json
+
+Requests are drawn deterministically (--seed) from (DRG, ZIP) pairs present in
+the dataset, or from --drg/--zip when no CSV is given. Run the API against the
+LLM stub (benchmarks/llm_stub.py) for /ask. Prints JSON with rps and
+p50/p95/p99 latency per endpoint and overall; the warmup period is excluded.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from .report import latency_summary, run_metadata
+
+
+ASK_TEMPLATES = [
+    "Who is cheapest for DRG {drg} within {radius} km of {zip}?",
+    "What is the average cost of DRG {drg} near {zip} within {radius} km?",
+    "Which are the best rated hospitals for DRG {drg} within {radius} km of {zip}?",
+    "Compare prices for DRG {drg} within {radius} km of {zip}",
+]
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - {"providers", "ask"}
+    if unknown:
+        raise ValueError(f"unknown endpoints in mix: {sorted(unknown)}")
+    return mix
+
+
+def workload_pairs(csv: Optional[Path], drg: str, zip_code: str, sample: int, seed: int) -> list[tuple[str, str]]:
+    if csv is None:
+        return [(drg, zip_code)]
+    frame = pd.read_csv(
+        csv, dtype=str, usecols=["DRG_Cd", "Rndrng_Prvdr_Zip5"], encoding="latin1"
+    ).dropna().drop_duplicates()
+    frame = frame.sort_values(["DRG_Cd", "Rndrng_Prvdr_Zip5"]).reset_index(drop=True)
+    picked = np.random.default_rng(seed).choice(len(frame), size=min(sample, len(frame)), replace=False)
+    return [(frame.at[i, "DRG_Cd"], frame.at[i, "Rndrng_Prvdr_Zip5"]) for i in sorted(picked.tolist())]
+
+
+def build_requests(
+    pairs: list[tuple[str, str]], mix: dict, radii: list[int], count: int, seed: int
+) -> list[tuple[str, str, dict]]:
+    # (endpoint, method, kwargs for httpx) in a fixed pseudo-random order
+    rng = np.random.default_rng(seed)
+    names = sorted(mix)
+    weights = np.array([mix[n] for n in names], dtype=np.float64)
+    kinds = rng.choice(len(names), size=count, p=weights / weights.sum())
+    picks = rng.integers(0, len(pairs), size=count)
+    radius_picks = rng.integers(0, len(radii), size=count)
+    templates = rng.integers(0, len(ASK_TEMPLATES), size=count)
+    requests = []
+    for kind, pick, r, t in zip(kinds.tolist(), picks.tolist(), radius_picks.tolist(), templates.tolist()):
+        drg, zip_code = pairs[pick]
+        radius = radii[r]
+        if names[kind] == "providers":
+            requests.append(("providers", "GET", {"url": "/providers", "params": {"drg": drg, "zip": zip_code, "radius_km": radius}}))
+        else:
+            question = ASK_TEMPLATES[t].format(drg=drg, zip=zip_code, radius=radius)
+            requests.append(("ask", "POST", {"url": "/ask", "json": {"question": question}}))
+    return requests
+
+
+async def run_load(
+    base_url: str,
+    requests: list[tuple[str, str, dict]],
+    concurrency: int,
+    duration: float,
+    warmup: float,
+    timeout: float,
+) -> dict:
+    results: dict[str, list[float]] = {}
+    errors: Counter = Counter()
+    statuses: Counter = Counter()
+    cursor = 0
+    start = time.perf_counter()
+    measure_from = start + warmup
+    stop_at = measure_from + duration
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal cursor
+        while time.perf_counter() < stop_at:
+            name, method, kwargs = requests[cursor % len(requests)]
+            cursor += 1
+            sent = time.perf_counter()
+            try:
+                resp = await client.request(method, **kwargs)
+                status = resp.status_code
+            except httpx.HTTPError as exc:
+                status = type(exc).__name__
+            done = time.perf_counter()
+            if sent < measure_from:
+                continue
+            statuses[f"{name}:{status}"] += 1
+            if status == 200:
+                results.setdefault(name, []).append(done - sent)
+            else:
+                errors[name] += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    elapsed = max(time.perf_counter() - measure_from, 1e-9)
+
+    endpoints = {name: latency_summary(results.get(name, []), errors[name], elapsed) for name in sorted(set(results) | set(errors))}
+    overall = latency_summary([v for values in results.values() for v in values], sum(errors.values()), elapsed)
+    return {"overall": overall, "endpoints": endpoints, "status_counts": dict(sorted(statuses.items()))}
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--csv", type=Path, help="benchmark dataset to draw (DRG, ZIP) pairs from")
+    parser.add_argument("--drg", default="470")
+    parser.add_argument("--zip", default="10001")
+    parser.add_argument("--pairs", type=int, default=1000, help="distinct (DRG, ZIP) pairs to draw from the CSV")
+    parser.add_argument("--radius", default="40", help="comma-separated radii in km, picked at random")
+    parser.add_argument("--mix", default="providers=0.8,ask=0.2")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="seconds of load before measuring")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    radii = [int(r) for r in args.radius.split(",")]
+    pairs = workload_pairs(args.csv, args.drg, args.zip, args.pairs, args.seed)
+    requests = build_requests(pairs, mix, radii, count=max(10_000, len(pairs) * 10), seed=args.seed)
+    report = asyncio.run(run_load(args.base_url, requests, args.concurrency, args.duration, args.warmup, args.timeout))
+    report = {
+        **run_metadata(),
+        "config": {
+            "base_url": args.base_url,
+            "csv": str(args.csv) if args.csv else None,
+            "pairs": len(pairs),
+            "radius_km": radii,
+            "mix": mix,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "seed": args.seed,
+        },
+        **report,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import os
+import platform
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, capture_output=True, text=True)
+        return out + ("-dirty" if dirty.stdout.strip() else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_metadata() -> dict:
+    # Enough context to line up results from different commits and machines
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def latency_summary(latencies_s: Iterable[float], errors: int, elapsed_s: float) -> dict:
+    values = np.asarray(list(latencies_s), dtype=np.float64) * 1000.0
+    summary = {
+        "requests": int(len(values)),
+        "errors": int(errors),
+        "rps": round(len(values) / elapsed_s, 2) if elapsed_s > 0 else None,
+    }
+    if len(values):
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        summary["latency_ms"] = {
+            "p50": round(float(p50), 3),
+            "p95": round(float(p95), 3),
+            "p99": round(float(p99), 3),
+            "mean": round(float(values.mean()), 3),
+            "max": round(float(values.max()), 3),
+        }
+    return summary
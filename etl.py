@@ -1,22 +1,33 @@
 from __future__ import annotations
 
+import argparse
 import asyncio
+import cProfile
 import csv
+import hashlib
+import json
 import os
+import pstats
 import re
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Set
+from typing import Any, Dict, Iterable, List, Optional, Set
 
+import numpy as np
 import pandas as pd
-import pgeocode
-from sqlalchemy import text
+from sqlalchemy import delete, func, select, text
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 from app.config import settings
-from app.models import Procedure, Provider, Rating
+from app.models import DataVersion, Drg, LoadManifest, LoadManifestChunk, Procedure, Provider, Rating
 from app.database import Base
+from app.geo import ZipIndex, get_zip_index
+from app.metrics import ETL_LAST_RUN_ROWS_PER_SECOND, ETL_ROWS, ETL_SECONDS
 
 # Alembic programmatic API
 from alembic.config import Config as AlembicConfig
@@ -39,6 +50,12 @@ def clean_money(value: Any) -> float | None:
         return None
 
 
+def clean_money_series(values: pd.Series) -> pd.Series:
+    # Column-wise clean_money: strip currency formatting, unparseable -> NaN
+    stripped = values.astype("string").str.replace(r"[^0-9.\-]", "", regex=True)
+    return pd.to_numeric(stripped, errors="coerce").astype("float64")
+
+
 def stable_rating_from_provider_id(provider_id: str) -> int:
     # Deterministic pseudo-random rating in [1, 10]
     h = 0
@@ -47,6 +64,189 @@ def stable_rating_from_provider_id(provider_id: str) -> int:
     return (h % 10) + 1
 
 
+def stable_ratings(provider_ids: pd.Series) -> np.ndarray:
+    # stable_rating_from_provider_id over a whole column: the rolling hash advances
+    # one character position at a time for every id that is still that long
+    ids = provider_ids.to_numpy(dtype=str)
+    if len(ids) == 0:
+        return np.empty(0, dtype=np.int64)
+    lengths = np.char.str_len(ids)
+    chars = ids.astype("U").view(np.uint32).reshape(len(ids), -1).astype(np.int64)
+    h = np.zeros(len(ids), dtype=np.int64)
+    for pos in range(chars.shape[1]):
+        live = lengths > pos
+        h[live] = (h[live] * 131 + chars[live, pos]) % 1000003
+    return (h % 10) + 1
+
+
+PROVIDER_COLUMNS = ["provider_id", "name", "city", "state", "zip_code", "latitude", "longitude"]
+RATING_COLUMNS = ["provider_id", "rating"]
+DRG_COLUMNS = ["drg_code", "description", "ms_drg_definition"]
+PROCEDURE_COLUMNS = [
+    "provider_id",
+    "ms_drg_definition",
+    "drg_code",
+    "total_discharges",
+    "average_covered_charges",
+    "average_total_payments",
+    "average_medicare_payments",
+    "row_hash",
+]
+
+
+@dataclass
+class RecordBatch:
+    # Load-ready rows for one CSV chunk, one frame per target table
+    providers: pd.DataFrame
+    ratings: pd.DataFrame
+    drgs: pd.DataFrame
+    procedures: pd.DataFrame
+    rows_read: int = 0
+    chunk_index: int = -1
+    chunk_hash: str | None = None
+
+    def records(self, table: str) -> List[Dict[str, Any]]:
+        frame: pd.DataFrame = getattr(self, table)
+        return frame.astype(object).where(frame.notna(), None).to_dict("records")
+
+    def tuples(self, table: str) -> List[tuple]:
+        frame: pd.DataFrame = getattr(self, table)
+        return list(frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None))
+
+
+def _text_column(chunk: pd.DataFrame, name: str) -> pd.Series:
+    if name not in chunk.columns:
+        return pd.Series("", index=chunk.index, dtype="string")
+    return chunk[name].astype("string").fillna("").str.strip()
+
+
+def _drg_definitions(chunk: pd.DataFrame) -> pd.Series:
+    # "<code> - <desc>"; empty when the row has neither
+    return (_text_column(chunk, "DRG_Cd") + " - " + _text_column(chunk, "DRG_Desc")).str.strip(" -")
+
+
+def chunk_fingerprint(chunk: pd.DataFrame) -> str:
+    # Content hash of a raw CSV chunk (values and header), used to skip unchanged chunks
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update("\x1f".join(c.strip() for c in chunk.columns).encode())
+    digest.update(pd.util.hash_pandas_object(chunk, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def row_fingerprints(frame: pd.DataFrame) -> np.ndarray:
+    # Stable 64-bit hash per row, stored as a signed BIGINT
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy().view(np.int64)
+
+
+def chunk_keys(chunk: pd.DataFrame) -> pd.DataFrame:
+    # (provider_id, ms_drg_definition) keys present in a raw chunk, without a full transform
+    chunk = chunk.rename(columns={c: c.strip() for c in chunk.columns})
+    keys = pd.DataFrame(
+        {"provider_id": _text_column(chunk, "Rndrng_Prvdr_CCN"), "ms_drg_definition": _drg_definitions(chunk)}
+    )
+    return keys[(keys["provider_id"] != "") & (keys["ms_drg_definition"] != "")]
+
+
+def transform_chunk(
+    chunk: pd.DataFrame, zip_index: ZipIndex, provider_seen: Set[str] | None = None, stats: "EtlStats | None" = None
+) -> RecordBatch:
+    # Column-wise equivalent of the old per-row loop; providers already in
+    # provider_seen are not emitted again (the set is updated in place).
+    # With stats, geocoding and money parsing are also timed on their own.
+    stage = stats.stage if stats is not None else (lambda name, rows=0: nullcontext())
+    rows_read = len(chunk)
+    chunk = chunk.rename(columns={c: c.strip() for c in chunk.columns})
+    prov_id = _text_column(chunk, "Rndrng_Prvdr_CCN")
+    keep = prov_id != ""
+    chunk = chunk[keep]
+    prov_id = prov_id[keep]
+
+    # Providers: first row per CCN wins, geocoded once per unique ZIP
+    first = ~prov_id.duplicated()
+    if provider_seen:
+        first &= ~prov_id.isin(provider_seen)
+    prov_rows = chunk[first]
+    zips = _text_column(prov_rows, "Rndrng_Prvdr_Zip5")
+    with stage("geocode", len(zips)):
+        unique_zips = zips[zips != ""].unique()
+        lat, lon = zip_index.lookup_many(list(unique_zips))
+        lat_by_zip = pd.Series(lat, index=unique_zips, dtype="float64")
+        lon_by_zip = pd.Series(lon, index=unique_zips, dtype="float64")
+        latitude = zips.map(lat_by_zip).astype("float64")
+        longitude = zips.map(lon_by_zip).astype("float64")
+    providers = pd.DataFrame(
+        {
+            "provider_id": prov_id[first],
+            "name": _text_column(prov_rows, "Rndrng_Prvdr_Org_Name"),
+            "city": _text_column(prov_rows, "Rndrng_Prvdr_City").replace("", pd.NA),
+            "state": _text_column(prov_rows, "Rndrng_Prvdr_State_Abrvtn").replace("", pd.NA),
+            "zip_code": zips.replace("", pd.NA),
+            "latitude": latitude,
+            "longitude": longitude,
+        },
+        columns=PROVIDER_COLUMNS,
+    )
+    # Key order keeps row-lock order identical across concurrent writers
+    providers = providers.sort_values("provider_id", kind="stable").reset_index(drop=True)
+    if provider_seen is not None:
+        provider_seen.update(providers["provider_id"].tolist())
+    ratings = pd.DataFrame(
+        {"provider_id": providers["provider_id"], "rating": stable_ratings(providers["provider_id"])},
+        columns=RATING_COLUMNS,
+    )
+
+    # Procedures: "<code> - <desc>" definitions, rows without one are dropped
+    ms_drg_def = _drg_definitions(chunk)
+    has_def = ms_drg_def != ""
+    drg_code = pd.to_numeric(_text_column(chunk, "DRG_Cd"), errors="coerce")
+    drg_code = drg_code.where(drg_code == np.trunc(drg_code)).astype("Int64")
+    discharges = np.trunc(pd.to_numeric(_text_column(chunk, "Tot_Dschrgs")[has_def], errors="coerce"))
+    with stage("clean_money", int(has_def.sum())):
+        covered = clean_money_series(_text_column(chunk, "Avg_Submtd_Cvrd_Chrg")[has_def])
+        total_payments = clean_money_series(_text_column(chunk, "Avg_Tot_Pymt_Amt")[has_def])
+        medicare_payments = clean_money_series(_text_column(chunk, "Avg_Mdcr_Pymt_Amt")[has_def])
+    procedures = pd.DataFrame(
+        {
+            "provider_id": prov_id[has_def],
+            "ms_drg_definition": ms_drg_def[has_def],
+            "drg_code": drg_code[has_def],
+            "total_discharges": discharges.where(discharges != 0).astype("Int64"),
+            "average_covered_charges": covered,
+            "average_total_payments": total_payments,
+            "average_medicare_payments": medicare_payments,
+        },
+        columns=PROCEDURE_COLUMNS[:-1],
+    )
+    # One row per conflict key so a single upsert statement never touches a row twice
+    procedures = (
+        procedures.drop_duplicates(["provider_id", "ms_drg_definition"], keep="last")
+        .sort_values(["provider_id", "ms_drg_definition"], kind="stable")
+        .reset_index(drop=True)
+    )
+    procedures["row_hash"] = row_fingerprints(procedures)
+
+    # DRG dictionary entries seen in this chunk
+    has_code = drg_code.notna() & has_def
+    drgs = pd.DataFrame(
+        {
+            "drg_code": drg_code[has_code],
+            "description": _text_column(chunk, "DRG_Desc")[has_code].replace("", pd.NA),
+            "ms_drg_definition": ms_drg_def[has_code],
+        },
+        columns=DRG_COLUMNS,
+    )
+    # Prefer a row that carries a description for each code
+    drgs = (
+        drgs.iloc[np.argsort(drgs["description"].notna().to_numpy(), kind="stable")]
+        .drop_duplicates("drg_code", keep="last")
+        .sort_values("drg_code")
+        .reset_index(drop=True)
+    )
+    return RecordBatch(
+        providers=providers, ratings=ratings, drgs=drgs, procedures=procedures, rows_read=rows_read
+    )
+
+
 async def apply_migrations(engine: AsyncEngine):
     # Decide whether to upgrade or stamp based on existing schema
     async with engine.begin() as conn:
@@ -73,110 +273,623 @@ async def apply_migrations(engine: AsyncEngine):
         await asyncio.to_thread(alembic_command.upgrade, cfg, "head")
     else:
         if has_providers_table:
-            # Schema already applied from raw SQL; record current head
-            await asyncio.to_thread(alembic_command.stamp, cfg, "head")
+            # Schema already applied from raw SQL (equivalent to 0001_init); record that,
+            # then apply any later revisions
+            await asyncio.to_thread(alembic_command.stamp, cfg, "0001_init")
+            await asyncio.to_thread(alembic_command.upgrade, cfg, "head")
         else:
             # Fresh DB; apply migrations
             await asyncio.to_thread(alembic_command.upgrade, cfg, "head")
 
 
-async def load_csv(engine: AsyncEngine):
-    nomi = pgeocode.Nominatim("us")
-    provider_seen: Set[str] = set()
+async def bump_data_version(session: AsyncSession) -> None:
+    # Readers compare this against their cached version to drop stale results
+    await session.execute(
+        DataVersion.__table__.update()
+        .where(DataVersion.id == 1)
+        .values(version=DataVersion.version + 1, updated_at=func.now())
+    )
+
+
+@dataclass
+class StageTiming:
+    rows: int = 0
+    seconds: float = 0.0
+
+
+@dataclass
+class ChunkProfile:
+    index: int
+    rows: int = 0
+    # Offsets from the start of the load: first read to commit
+    started: float = 0.0
+    finished: float = 0.0
+    stages: Dict[str, float] = field(default_factory=dict)
+    peak_rss_mb: Optional[float] = None
+
+
+# Chunk the current task (or transform thread) is working on, for --profile
+current_chunk: ContextVar[Optional[int]] = ContextVar("current_chunk", default=None)
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return None
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1024 * 1024 if os.uname().sysname == "Darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+class EtlStats:
+    # Accumulates rows and wall time per named stage across all chunks; with
+    # profile=True also per chunk, with the peak RSS after each commit
+
+    def __init__(self, profile: bool = False) -> None:
+        self.stages: Dict[str, StageTiming] = {}
+        self.queue_depths: List[int] = []
+        self.counters: Dict[str, int] = {}
+        self.elapsed = 0.0
+        self.profile = profile
+        self.chunks: Dict[int, ChunkProfile] = {}
+        self._t0 = time.perf_counter()
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextmanager
+    def stage(self, name: str, rows: int = 0):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            timing = self.stages.setdefault(name, StageTiming())
+            timing.seconds += seconds
+            ETL_SECONDS.labels(name).inc(seconds)
+            self.add_rows(name, rows)
+            if self.profile and current_chunk.get() is not None:
+                chunk = self.chunk(current_chunk.get())
+                chunk.stages[name] = chunk.stages.get(name, 0.0) + seconds
+
+    def add_rows(self, name: str, rows: int) -> None:
+        # Also exported as etl_rows_total{stage}; rate() of it is live rows/s
+        self.stages.setdefault(name, StageTiming()).rows += rows
+        if rows:
+            ETL_ROWS.labels(name).inc(rows)
+
+    def chunk(self, index: int) -> ChunkProfile:
+        if index not in self.chunks:
+            self.chunks[index] = ChunkProfile(index, started=time.perf_counter() - self._t0)
+        return self.chunks[index]
+
+    def chunk_done(self, index: int) -> None:
+        if self.profile:
+            chunk = self.chunk(index)
+            chunk.finished = time.perf_counter() - self._t0
+            chunk.peak_rss_mb = peak_rss_mb()
+
+    def profile_report(self) -> str:
+        # Per-chunk seconds for each stage: mean / p95 / max across chunks
+        chunks = [c for c in self.chunks.values() if c.stages]
+        if not chunks:
+            return "no chunks profiled"
+        names = list(dict.fromkeys(name for c in chunks for name in c.stages))
+        lines = [f"{'stage (per chunk)':<22}{'mean ms':>10}{'p95 ms':>10}{'max ms':>10}{'rows/s':>14}"]
+        for name in names:
+            values = np.array([c.stages.get(name, 0.0) for c in chunks]) * 1000.0
+            t = self.stages[name]
+            rate = t.rows / t.seconds if t.seconds > 0 and t.rows else 0.0
+            lines.append(
+                f"{name:<22}{values.mean():>10.2f}{np.percentile(values, 95):>10.2f}{values.max():>10.2f}{rate:>14,.0f}"
+            )
+        latencies = np.array([c.finished - c.started for c in chunks if c.finished])
+        if len(latencies):
+            lines.append(f"chunk latency (read to commit): mean {latencies.mean():.3f}s, max {latencies.max():.3f}s")
+        rows = sum(c.rows for c in chunks)
+        if self.elapsed:
+            lines.append(f"throughput: {rows / self.elapsed:,.0f} rows/s over {len(chunks)} chunks")
+        rss = peak_rss_mb()
+        if rss is not None:
+            lines.append(f"peak RSS: {rss:,.1f} MB")
+        return "\n".join(lines)
 
+    def profile_dict(self) -> dict:
+        return {
+            "elapsed_seconds": self.elapsed,
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": {name: asdict(t) for name, t in self.stages.items()},
+            "counters": self.counters,
+            "chunks": [asdict(c) for _, c in sorted(self.chunks.items())],
+        }
+
+    def publish(self) -> None:
+        for name, t in self.stages.items():
+            if t.rows and t.seconds > 0:
+                ETL_LAST_RUN_ROWS_PER_SECOND.labels(name).set(t.rows / t.seconds)
+
+    def report(self) -> str:
+        lines = [f"{'stage':<22}{'rows':>12}{'seconds':>12}{'rows/s':>14}"]
+        for name, t in self.stages.items():
+            rate = t.rows / t.seconds if t.seconds > 0 else 0.0
+            lines.append(f"{name:<22}{t.rows:>12}{t.seconds:>12.3f}{rate:>14,.0f}")
+        for name, n in self.counters.items():
+            lines.append(f"{name}: {n}")
+        if self.queue_depths:
+            mean_depth = sum(self.queue_depths) / len(self.queue_depths)
+            lines.append(f"queue depth: max {max(self.queue_depths)}, mean {mean_depth:.1f}")
+        if self.elapsed:
+            lines.append(f"total: {self.elapsed:.3f}s wall (stage times are summed across concurrent tasks)")
+        return "\n".join(lines)
+
+
+async def upsert_batch(session: AsyncSession, batch: RecordBatch, stats: EtlStats) -> None:
+    # Fallback loader: multi-row INSERT ... ON CONFLICT statements built by SQLAlchemy
+    with stats.stage("upsert.records", batch.rows_read):
+        providers_to_upsert = batch.records("providers")
+        ratings_to_upsert = batch.records("ratings")
+        drgs_to_upsert = batch.records("drgs")
+        procedures_to_upsert = batch.records("procedures")
+
+    # Bulk upsert providers
+    if providers_to_upsert:
+        stmt = pg_insert(Provider.__table__).values(providers_to_upsert)
+        stmt = stmt.on_conflict_do_nothing(index_elements=[Provider.provider_id])
+        with stats.stage("providers.upsert", len(providers_to_upsert)):
+            await session.execute(stmt)
+
+    # Bulk upsert ratings
+    if ratings_to_upsert:
+        stmt = pg_insert(Rating.__table__).values(ratings_to_upsert)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Rating.provider_id], set_={"rating": stmt.excluded.rating}
+        )
+        with stats.stage("ratings.upsert", len(ratings_to_upsert)):
+            await session.execute(stmt)
+
+    # Bulk upsert DRG dictionary
+    if drgs_to_upsert:
+        stmt = pg_insert(Drg.__table__).values(drgs_to_upsert)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Drg.drg_code],
+            set_={"description": stmt.excluded.description, "ms_drg_definition": stmt.excluded.ms_drg_definition},
+            # A code-only row never overwrites a described one
+            where=stmt.excluded.description.isnot(None),
+        )
+        with stats.stage("drgs.upsert", len(drgs_to_upsert)):
+            await session.execute(stmt)
+
+    # Bulk upsert procedures
+    if procedures_to_upsert:
+        stmt = pg_insert(Procedure.__table__).values(procedures_to_upsert)
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_procedure_per_provider_drg",
+            set_={
+                "drg_code": stmt.excluded.drg_code,
+                "total_discharges": stmt.excluded.total_discharges,
+                "average_covered_charges": stmt.excluded.average_covered_charges,
+                "average_total_payments": stmt.excluded.average_total_payments,
+                "average_medicare_payments": stmt.excluded.average_medicare_payments,
+                "row_hash": stmt.excluded.row_hash,
+            },
+            # Unchanged rows (same fingerprint) are left untouched
+            where=Procedure.__table__.c.row_hash.is_distinct_from(stmt.excluded.row_hash),
+        )
+        with stats.stage("procedures.upsert", len(procedures_to_upsert)):
+            result = await session.execute(stmt)
+        stats.count("procedures.written", max(result.rowcount, 0))
+
+
+# Staging tables for the COPY loader. They are session-local temp tables (never
+# WAL-logged, emptied on commit), so concurrent loaders cannot see each other's rows.
+STAGING_DDL = [
+    "CREATE TEMP TABLE IF NOT EXISTS stg_providers ("
+    " provider_id varchar(32), name varchar(255), city varchar(128), state varchar(8),"
+    " zip_code varchar(16), latitude double precision, longitude double precision"
+    ") ON COMMIT DELETE ROWS",
+    "CREATE TEMP TABLE IF NOT EXISTS stg_ratings (provider_id varchar(32), rating integer) ON COMMIT DELETE ROWS",
+    "CREATE TEMP TABLE IF NOT EXISTS stg_drgs ("
+    " drg_code integer, description varchar(255), ms_drg_definition varchar(255)"
+    ") ON COMMIT DELETE ROWS",
+    "CREATE TEMP TABLE IF NOT EXISTS stg_procedures ("
+    " provider_id varchar(32), ms_drg_definition varchar(255), drg_code integer, total_discharges integer,"
+    " average_covered_charges double precision, average_total_payments double precision,"
+    " average_medicare_payments double precision, row_hash bigint"
+    ") ON COMMIT DELETE ROWS",
+]
+
+# One set-based merge per table; rows are applied in key order so that
+# concurrent writers always take row locks in the same order
+MERGE_SQL = {
+    "providers": """
+        INSERT INTO providers (provider_id, name, city, state, zip_code, latitude, longitude)
+        SELECT DISTINCT ON (provider_id) provider_id, name, city, state, zip_code, latitude, longitude
+        FROM stg_providers
+        ORDER BY provider_id
+        ON CONFLICT (provider_id) DO NOTHING
+    """,
+    "ratings": """
+        INSERT INTO ratings (provider_id, rating)
+        SELECT DISTINCT ON (provider_id) provider_id, rating
+        FROM stg_ratings
+        ORDER BY provider_id
+        ON CONFLICT (provider_id) DO UPDATE SET rating = EXCLUDED.rating
+    """,
+    "drgs": """
+        INSERT INTO drgs (drg_code, description, ms_drg_definition)
+        SELECT DISTINCT ON (drg_code) drg_code, description, ms_drg_definition
+        FROM stg_drgs
+        ORDER BY drg_code
+        ON CONFLICT (drg_code) DO UPDATE SET
+            description = EXCLUDED.description,
+            ms_drg_definition = EXCLUDED.ms_drg_definition
+        WHERE EXCLUDED.description IS NOT NULL
+            AND (drgs.description, drgs.ms_drg_definition)
+                IS DISTINCT FROM (EXCLUDED.description, EXCLUDED.ms_drg_definition)
+    """,
+    "procedures": """
+        INSERT INTO procedures (
+            provider_id, ms_drg_definition, drg_code, total_discharges,
+            average_covered_charges, average_total_payments, average_medicare_payments, row_hash
+        )
+        SELECT DISTINCT ON (provider_id, ms_drg_definition)
+            provider_id, ms_drg_definition, drg_code, total_discharges,
+            average_covered_charges::numeric(14, 2), average_total_payments::numeric(14, 2),
+            average_medicare_payments::numeric(14, 2), row_hash
+        FROM stg_procedures
+        ORDER BY provider_id, ms_drg_definition
+        ON CONFLICT ON CONSTRAINT uq_procedure_per_provider_drg DO UPDATE SET
+            drg_code = EXCLUDED.drg_code,
+            total_discharges = EXCLUDED.total_discharges,
+            average_covered_charges = EXCLUDED.average_covered_charges,
+            average_total_payments = EXCLUDED.average_total_payments,
+            average_medicare_payments = EXCLUDED.average_medicare_payments,
+            row_hash = EXCLUDED.row_hash
+        WHERE procedures.row_hash IS DISTINCT FROM EXCLUDED.row_hash
+    """,
+}
+
+COPY_COLUMNS = {
+    "providers": PROVIDER_COLUMNS,
+    "ratings": RATING_COLUMNS,
+    "drgs": DRG_COLUMNS,
+    "procedures": PROCEDURE_COLUMNS,
+}
+
+
+async def copy_batch(session: AsyncSession, batch: RecordBatch, stats: EtlStats) -> None:
+    # Stream each frame into its staging table with COPY, then merge set-based
+    for ddl in STAGING_DDL:
+        await session.execute(text(ddl))  # also opens the transaction the COPY joins
+    conn = await session.connection()
+    raw = await conn.get_raw_connection()
+    driver_conn = raw.driver_connection
+    for table in ("providers", "ratings", "drgs", "procedures"):
+        rows = batch.tuples(table)
+        if not rows:
+            continue
+        with stats.stage(f"{table}.copy", len(rows)):
+            await driver_conn.copy_records_to_table(f"stg_{table}", records=rows, columns=COPY_COLUMNS[table])
+        with stats.stage(f"{table}.merge", len(rows)):
+            result = await session.execute(text(MERGE_SQL[table]))
+        if table == "procedures":
+            stats.count("procedures.written", max(result.rowcount, 0))
+
+
+LOADERS = {"copy": copy_batch, "upsert": upsert_batch}
+
+
+def resolve_loader(engine: AsyncEngine, loader: str) -> str:
+    # COPY needs the asyncpg driver; anything else uses the upsert path
+    if loader == "copy" and engine.dialect.driver != "asyncpg":
+        print(f"COPY loader requires asyncpg (driver is {engine.dialect.driver}); using upsert")
+        return "upsert"
+    return loader
+
+
+def file_fingerprint(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+async def read_manifest(session: AsyncSession, source_file: str) -> tuple[str | None, Dict[int, str]]:
+    file_hash = (
+        await session.execute(select(LoadManifest.file_hash).where(LoadManifest.source_file == source_file))
+    ).scalar()
+    rows = await session.execute(
+        select(LoadManifestChunk.chunk_index, LoadManifestChunk.chunk_hash).where(
+            LoadManifestChunk.source_file == source_file
+        )
+    )
+    return file_hash, {int(r.chunk_index): r.chunk_hash for r in rows}
+
+
+async def other_loaded_files(session: AsyncSession, source_file: str) -> List[str]:
+    rows = await session.execute(
+        select(LoadManifest.source_file).where(LoadManifest.source_file != source_file).order_by(LoadManifest.source_file)
+    )
+    return list(rows.scalars())
+
+
+async def record_chunk_manifest(session: AsyncSession, source_file: str, batch: RecordBatch) -> None:
+    stmt = pg_insert(LoadManifestChunk.__table__).values(
+        source_file=source_file, chunk_index=batch.chunk_index, chunk_hash=batch.chunk_hash, row_count=batch.rows_read
+    )
+    stmt = stmt.on_conflict_do_update(
+        constraint="pk_load_manifest_chunks",
+        set_={"chunk_hash": stmt.excluded.chunk_hash, "row_count": stmt.excluded.row_count, "loaded_at": func.now()},
+    )
+    await session.execute(stmt)
+
+
+async def finish_manifest(
+    session: AsyncSession, source_file: str, file_hash: str, chunk_count: int, row_count: int
+) -> None:
+    # Drop chunk entries past the end of a file that shrank, then record the file itself
+    await session.execute(
+        delete(LoadManifestChunk).where(
+            LoadManifestChunk.source_file == source_file, LoadManifestChunk.chunk_index >= chunk_count
+        )
+    )
+    stmt = pg_insert(LoadManifest.__table__).values(
+        source_file=source_file, file_hash=file_hash, chunk_count=chunk_count, row_count=row_count
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[LoadManifest.source_file],
+        set_={
+            "file_hash": stmt.excluded.file_hash,
+            "chunk_count": stmt.excluded.chunk_count,
+            "row_count": stmt.excluded.row_count,
+            "loaded_at": func.now(),
+        },
+    )
+    await session.execute(stmt)
+
+
+async def delete_missing_procedures(session: AsyncSession, keys: pd.DataFrame) -> int:
+    # Remove procedures whose (provider_id, DRG) key no longer appears in the release
+    keys = keys.drop_duplicates()
+    result = await session.execute(
+        text(
+            """
+            DELETE FROM procedures p
+            WHERE NOT EXISTS (
+                SELECT 1
+                FROM unnest(CAST(:provider_ids AS text[]), CAST(:definitions AS text[])) AS k(provider_id, ms_drg_definition)
+                WHERE k.provider_id = p.provider_id AND k.ms_drg_definition = p.ms_drg_definition
+            )
+            """
+        ),
+        {
+            "provider_ids": keys["provider_id"].tolist(),
+            "definitions": keys["ms_drg_definition"].tolist(),
+        },
+    )
+    return max(result.rowcount, 0)
+
+
+async def refresh_search_view(session: AsyncSession) -> None:
+    # CONCURRENTLY keeps the views readable by the API during the refresh;
+    # drg_price_stats rolls up provider_search, so it goes second
+    await session.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY provider_search"))
+    await session.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY drg_price_stats"))
+
+
+async def load_csv(
+    engine: AsyncEngine,
+    loader: str = "copy",
+    workers: int = 2,
+    queue_size: int = 4,
+    incremental: bool = False,
+    delete_missing: bool = False,
+    csv_path: Path = CSV_PATH,
+    stats: EtlStats | None = None,
+    offload: bool = True,
+) -> EtlStats:
+    # Pipelined load: one producer reads and transforms chunks in a worker thread
+    # while `workers` writer tasks, each on its own pooled connection, drain a
+    # bounded queue. The queue bound is the backpressure: parsing stops when
+    # writers fall `queue_size` batches behind.
+    #
+    # Every chunk's content hash is recorded in load_manifest_chunks together with
+    # its rows. In incremental mode, chunks whose hash is unchanged are skipped and
+    # changed chunks only rewrite procedures whose row fingerprint differs.
+    #
+    # offload=False reads and transforms on the event loop thread instead of a
+    # worker thread (so a profiler attached to the main thread sees that work).
+    stats = stats or EtlStats()
+    write_batch = LOADERS[resolve_loader(engine, loader)]
+    zip_index = get_zip_index()
+    workers = max(1, workers)
+    source_file = csv_path.name
     async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    file_hash = await asyncio.to_thread(file_fingerprint, csv_path)
     async with async_session() as session:
+        previous_file_hash, previous_chunks = await read_manifest(session, source_file)
+        # procedures do not record their source file, so deleting what is
+        # missing from this file would also delete every other file's rows
+        others = await other_loaded_files(session, source_file) if delete_missing else []
+    if others:
+        raise ValueError(f"--delete-missing needs a single source file, but {', '.join(others)} is also loaded")
+    if incremental and previous_file_hash == file_hash and not delete_missing:
+        print(f"{source_file} is unchanged since the last load; nothing to do")
+        return stats
+
+    # Cross-chunk provider dedupe is only safe with a single writer; with several,
+    # every batch carries its own providers so its procedures never reference a
+    # provider row that another writer has not committed yet
+    provider_seen: Set[str] | None = set() if workers == 1 else None
+    queue: asyncio.Queue[RecordBatch | None] = asyncio.Queue(maxsize=max(1, queue_size))
+    seen_keys: List[pd.DataFrame] = []
+    totals = {"chunks": 0, "rows": 0}
+
+    async def run(fn, *args):
+        return await asyncio.to_thread(fn, *args) if offload else fn(*args)
+
+    async def produce() -> None:
         # Stream in chunks to reduce memory
-        chunks = pd.read_csv(CSV_PATH, dtype=str, chunksize=5000, encoding="latin1", on_bad_lines="skip")
-        for chunk in chunks:
-            # Normalize columns
-            chunk = chunk.rename(columns={c: c.strip() for c in chunk.columns})
-            # Fill NaNs with None-like
-            chunk = chunk.where(pd.notnull(chunk), None)
-
-            providers_to_upsert: List[Dict[str, Any]] = []
-            procedures_to_upsert: List[Dict[str, Any]] = []
-            ratings_to_upsert: List[Dict[str, Any]] = []
-
-            for _, row in chunk.iterrows():
-                # Map CSV column names to our schema
-                prov_id = (row.get("Rndrng_Prvdr_CCN") or "").strip()
-                if not prov_id:
-                    continue
-                if prov_id not in provider_seen:
-                    provider_seen.add(prov_id)
-                    zip_code = (row.get("Rndrng_Prvdr_Zip5") or "").strip()
-                    rec = nomi.query_postal_code(zip_code) if zip_code else None
-                    lat = float(rec.latitude) if rec is not None and pd.notna(rec.latitude) else None
-                    lon = float(rec.longitude) if rec is not None and pd.notna(rec.longitude) else None
-                    providers_to_upsert.append(
-                        {
-                            "provider_id": prov_id,
-                            "name": (row.get("Rndrng_Prvdr_Org_Name") or "").strip(),
-                            "city": (row.get("Rndrng_Prvdr_City") or None),
-                            "state": (row.get("Rndrng_Prvdr_State_Abrvtn") or None),
-                            "zip_code": zip_code or None,
-                            "latitude": lat,
-                            "longitude": lon,
-                        }
-                    )
-                    ratings_to_upsert.append({"provider_id": prov_id, "rating": stable_rating_from_provider_id(prov_id)})
-
-                drg_code = (row.get("DRG_Cd") or "").strip()
-                drg_desc = (row.get("DRG_Desc") or "").strip()
-                ms_drg_def = (f"{drg_code} - {drg_desc}").strip(" -") if (drg_code or drg_desc) else ""
-                if not ms_drg_def:
-                    continue
-                procedures_to_upsert.append(
-                    {
-                        "provider_id": prov_id,
-                        "ms_drg_definition": ms_drg_def,
-                        "total_discharges": int((row.get("Tot_Dschrgs") or 0)) or None,
-                        "average_covered_charges": clean_money(row.get("Avg_Submtd_Cvrd_Chrg")),
-                        "average_total_payments": clean_money(row.get("Avg_Tot_Pymt_Amt")),
-                        "average_medicare_payments": clean_money(row.get("Avg_Mdcr_Pymt_Amt")),
-                    }
-                )
-
-            # Bulk upsert providers
-            if providers_to_upsert:
-                stmt = pg_insert(Provider.__table__).values(providers_to_upsert)
-                stmt = stmt.on_conflict_do_nothing(index_elements=[Provider.provider_id])
-                await session.execute(stmt)
-
-            # Bulk upsert ratings
-            if ratings_to_upsert:
-                stmt = pg_insert(Rating.__table__).values(ratings_to_upsert)
-                stmt = stmt.on_conflict_do_update(
-                    index_elements=[Rating.provider_id], set_={"rating": stmt.excluded.rating}
-                )
-                await session.execute(stmt)
-
-            # Bulk upsert procedures
-            if procedures_to_upsert:
-                stmt = pg_insert(Procedure.__table__).values(procedures_to_upsert)
-                stmt = stmt.on_conflict_do_update(
-                    constraint="uq_procedure_per_provider_drg",
-                    set_={
-                        "total_discharges": stmt.excluded.total_discharges,
-                        "average_covered_charges": stmt.excluded.average_covered_charges,
-                        "average_total_payments": stmt.excluded.average_total_payments,
-                        "average_medicare_payments": stmt.excluded.average_medicare_payments,
-                    },
-                )
-                await session.execute(stmt)
-
-            await session.commit()
-
-
-async def main():
+        chunks = pd.read_csv(csv_path, dtype=str, chunksize=5000, encoding="latin1", on_bad_lines="skip")
+        chunk_index = 0
+        while True:
+            current_chunk.set(chunk_index)
+            with stats.stage("read"):
+                chunk = await run(next, chunks, None)
+            if chunk is None:
+                stats.chunks.pop(chunk_index, None)
+                break
+            stats.add_rows("read", len(chunk))
+            if stats.profile:
+                stats.chunk(chunk_index).rows = len(chunk)
+            totals["chunks"] = chunk_index + 1
+            totals["rows"] += len(chunk)
+            with stats.stage("fingerprint", len(chunk)):
+                chunk_hash = chunk_fingerprint(chunk)
+                if delete_missing:
+                    seen_keys.append(chunk_keys(chunk))
+            if incremental and previous_chunks.get(chunk_index) == chunk_hash:
+                stats.count("chunks.skipped")
+                chunk_index += 1
+                continue
+            with stats.stage("transform", len(chunk)):
+                batch = await run(transform_chunk, chunk, zip_index, provider_seen, stats)
+            batch.chunk_index, batch.chunk_hash = chunk_index, chunk_hash
+            with stats.stage("queue.put_wait"):
+                await queue.put(batch)
+            stats.queue_depths.append(queue.qsize())
+            chunk_index += 1
+        for _ in range(workers):
+            await queue.put(None)
+
+    async def write() -> None:
+        async with async_session() as session:
+            while True:
+                with stats.stage("queue.get_wait"):
+                    batch = await queue.get()
+                if batch is None:
+                    return
+                current_chunk.set(batch.chunk_index)
+                stats.queue_depths.append(queue.qsize())
+                await write_batch(session, batch, stats)
+                await record_chunk_manifest(session, source_file, batch)
+                with stats.stage("commit", batch.rows_read):
+                    await session.commit()
+                stats.chunk_done(batch.chunk_index)
+                stats.count("chunks.written")
+                current_chunk.set(None)
+
+    start = time.perf_counter()
+    async with asyncio.TaskGroup() as tg:
+        tg.create_task(produce())
+        for _ in range(workers):
+            tg.create_task(write())
+
+    async with async_session() as session:
+        if delete_missing:
+            keys = pd.concat(seen_keys, ignore_index=True) if seen_keys else pd.DataFrame(
+                columns=["provider_id", "ms_drg_definition"]
+            )
+            with stats.stage("delete_missing"):
+                stats.count("procedures.deleted", await delete_missing_procedures(session, keys))
+        await finish_manifest(session, source_file, file_hash, totals["chunks"], totals["rows"])
+        # A changed file hash refreshes even when every chunk was skipped: an
+        # earlier run may have committed its chunks and died before refreshing
+        changed = previous_file_hash != file_hash
+        if changed or stats.counters.get("chunks.written") or stats.counters.get("procedures.deleted"):
+            with stats.stage("refresh_search_view"):
+                await refresh_search_view(session)
+            await bump_data_version(session)
+        # One commit: the file is only recorded as loaded once its views are
+        # refreshed, so a failed REFRESH leaves it to be picked up next run
+        await session.commit()
+    stats.elapsed = time.perf_counter() - start
+    stats.publish()
+    return stats
+
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load the CMS inpatient CSV into Postgres")
+    parser.add_argument(
+        "--loader",
+        choices=sorted(LOADERS),
+        default=os.getenv("ETL_LOADER", "copy"),
+        help="copy: COPY into staging tables + set-based merge (default); upsert: INSERT ... ON CONFLICT",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("ETL_WORKERS", "2")),
+        help="concurrent DB writer tasks, each with its own connection",
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=int(os.getenv("ETL_QUEUE_SIZE", "4")),
+        help="max transformed batches buffered between the parser and the writers",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="skip chunks whose content hash matches the last load and only rewrite changed rows",
+    )
+    parser.add_argument(
+        "--delete-missing",
+        action="store_true",
+        help="delete procedures absent from this file (only for a complete release that is the only file loaded)",
+    )
+    parser.add_argument("--csv", type=Path, default=CSV_PATH, help="source CSV (default: sample_prices_ny.csv)")
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=Path("etl_profile.json"),
+        type=Path,
+        help="time every stage per chunk and track peak RSS; per-chunk JSON goes to PROFILE (default etl_profile.json)",
+    )
+    parser.add_argument(
+        "--cprofile",
+        type=Path,
+        help="also write cProfile stats here (reading and transforming then run on the main thread)",
+    )
+    return parser.parse_args(argv)
+
+
+async def main(argv: List[str] | None = None):
+    args = parse_args(argv)
     print(f"Using DATABASE_URL={settings.database_url}")
-    if not CSV_PATH.exists():
-        raise SystemExit(f"CSV file not found at {CSV_PATH}")
+    if not args.csv.exists():
+        raise SystemExit(f"CSV file not found at {args.csv}")
     engine = create_async_engine(settings.database_url, pool_pre_ping=True, future=True)
     await apply_migrations(engine)
-    await load_csv(engine)
+    profiler = cProfile.Profile() if args.cprofile else None
+    if profiler is not None:
+        profiler.enable()
+    stats = await load_csv(
+        engine,
+        loader=args.loader,
+        workers=args.workers,
+        queue_size=args.queue_size,
+        incremental=args.incremental,
+        delete_missing=args.delete_missing,
+        csv_path=args.csv,
+        stats=EtlStats(profile=bool(args.profile or args.cprofile)),
+        offload=profiler is None,
+    )
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.cprofile)
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+        print(f"cProfile stats written to {args.cprofile} (inspect with python -m pstats)")
     await engine.dispose()
+    print(stats.report())
+    if stats.profile:
+        print(stats.profile_report())
+    if args.profile:
+        args.profile.write_text(json.dumps(stats.profile_dict(), indent=2))
+        print(f"Per-chunk profile written to {args.profile}")
     print("ETL complete.")
 
 
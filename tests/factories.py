@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+
+def provider_row(provider_id, definition, charges, lat=40.75, lon=-73.99, rating=None):
+    # One provider_search row, as ProviderColumns reads it
+    return {
+        "provider_id": provider_id,
+        "name": f"Hospital {provider_id}",
+        "city": "NEW YORK",
+        "state": "NY",
+        "zip_code": "10001",
+        "latitude": lat,
+        "longitude": lon,
+        "drg_code": int(definition.split()[0]),
+        "ms_drg_definition": definition,
+        "average_covered_charges": charges,
+        "average_total_payments": None,
+        "average_medicare_payments": None,
+        "rating": rating,
+    }
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.columnar import ProviderColumns
+from app.config import settings
+from app.drg_index import DrgIndex
+from app.geo import ZipIndex
+
+from tests.factories import provider_row
+
+
+class _FixedVersion:
+    async def current(self, session):
+        return 1
+
+
+class _Columns(ProviderColumns):
+    def search(self, drg, *args, **kwargs):
+        if drg == "999":
+            raise RuntimeError("boom")
+        return super().search(drg, *args, **kwargs)
+
+
+class _Fixed:
+    def __init__(self, value):
+        self.value = value
+
+    async def get(self, session):
+        return self.value
+
+
+@pytest.fixture()
+def client(monkeypatch):
+    # Memory backend over a few rows, so the batch runs without a database
+    columns = _Fixed(
+        _Columns(
+            [
+                provider_row("100", "470 - MAJOR JOINT REPLACEMENT", 20.0),
+                provider_row("200", "194 - SIMPLE PNEUMONIA", 10.0),
+            ]
+        )
+    )
+    drgs = _Fixed(DrgIndex([(470, "470 - MAJOR JOINT REPLACEMENT"), (194, "194 - SIMPLE PNEUMONIA")]))
+    zips = ZipIndex.from_frame(pd.DataFrame({"postal_code": ["10001"], "latitude": [40.75], "longitude": [-73.99]}))
+    monkeypatch.setattr(settings, "search_backend", "memory")
+    monkeypatch.setattr(main, "data_version", _FixedVersion())
+    monkeypatch.setattr(main, "provider_columns", columns)
+    monkeypatch.setattr(main, "drg_index", drgs)
+    monkeypatch.setattr(main, "get_zip_index", lambda: zips)
+    main.provider_cache.clear()
+    return TestClient(main.app)
+
+
+def test_batch_keeps_input_order_and_reports_item_errors(client):
+    body = {
+        "queries": [
+            {"drg": "194", "zip": "10001"},
+            {"drg": "470", "zip": "99999"},
+            {"drg": "470", "zip": "10001", "radius_km": 10},
+            {"drg": "999", "zip": "10001"},
+            {"drg": "pneumonia", "zip": "10001", "limit": 1},
+            {"drg": "194", "zip": "bad"},
+        ]
+    }
+    items = client.post("/providers/batch", json=body).json()["results"]
+    assert [item["index"] for item in items] == [0, 1, 2, 3, 4, 5]
+    assert [r["provider_id"] for r in items[0]["results"]] == ["200"]
+    assert items[1]["results"] is None and "ZIP" in items[1]["error"]
+    assert [r["provider_id"] for r in items[2]["results"]] == ["100"]
+    assert items[3] == {"index": 3, "results": None, "error": "Query failed: RuntimeError"}
+    assert [r["provider_id"] for r in items[4]["results"]] == ["200"]
+    assert items[5]["error"] is not None
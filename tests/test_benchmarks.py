@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import json
+
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+
+from app.geo import ZIP_SPACE, ZipIndex
+from benchmarks.generate import write_csv
+from benchmarks.llm_stub import app as llm_stub
+from benchmarks.load import build_requests, parse_mix, workload_pairs
+from etl import transform_chunk
+
+
+def test_generator_is_deterministic_and_loads(tmp_path):
+    a, b = tmp_path / "a.csv", tmp_path / "b.csv"
+    rows = write_csv(a, 40, 12, coverage=0.5, seed=7, zip_source="ranges", providers_per_block=16)
+    write_csv(b, 40, 12, coverage=0.5, seed=7, zip_source="ranges", providers_per_block=16)
+    assert a.read_bytes() == b.read_bytes()
+
+    chunk = pd.read_csv(a, dtype=str, encoding="latin1")
+    assert len(chunk) == rows and 0 < rows < 40 * 12
+    batch = transform_chunk(chunk, ZipIndex(np.full((ZIP_SPACE, 2), np.nan)))
+    assert len(batch.providers) == chunk["Rndrng_Prvdr_CCN"].nunique()
+    assert len(batch.procedures) == rows and batch.procedures["average_covered_charges"].notna().all()
+    assert len(batch.drgs) == 12
+
+
+def test_workload_is_reproducible(tmp_path):
+    path = tmp_path / "bench.csv"
+    write_csv(path, 20, 5, seed=1, zip_source="ranges")
+    pairs = workload_pairs(path, "470", "10001", sample=10, seed=3)
+    assert pairs == workload_pairs(path, "470", "10001", sample=10, seed=3)
+    mix = parse_mix("providers=3,ask=1")
+    reqs = build_requests(pairs, mix, [10, 40], count=200, seed=3)
+    assert reqs == build_requests(pairs, mix, [10, 40], count=200, seed=3)
+    assert {name for name, _, _ in reqs} == {"providers", "ask"}
+
+
+def test_llm_stub_answers_like_openai():
+    resp = TestClient(llm_stub).post(
+        "/v1/chat/completions",
+        json={"model": "m", "messages": [{"role": "system", "content": "x"}, {"role": "user", "content": "Question: cheapest DRG 470 near 10001"}]},
+    )
+    params = json.loads(resp.json()["choices"][0]["message"]["content"])
+    assert params["drg_query"] == "470" and params["zip_code"] == "10001" and params["intent"] == "cheapest"
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+from app.cache import ResultCache, normalize_drg
+
+
+def test_normalize_drg():
+    assert normalize_drg("  Heart   FAILURE ") == "heart failure"
+
+
+def test_lru_eviction_by_bytes():
+    cache = ResultCache(max_bytes=10, ttl_seconds=60)
+    cache.put("a", 1, b"1234")
+    cache.put("b", 1, b"1234")
+    assert cache.get("a", 1) == b"1234"  # "a" becomes most recently used
+    cache.put("c", 1, b"1234")
+    assert cache.get("b", 1) is None
+    assert cache.get("a", 1) == b"1234"
+    assert cache.stats.evictions == 1
+    cache.put("huge", 1, b"x" * 11)
+    assert cache.get("huge", 1) is None
+
+
+def test_ttl_expiry():
+    cache = ResultCache(max_bytes=100, ttl_seconds=0.01)
+    cache.put("a", 1, b"x")
+    time.sleep(0.02)
+    assert cache.get("a", 1) is None
+    assert cache.stats.expirations == 1
+
+
+def test_new_data_version_drops_entries():
+    cache = ResultCache(max_bytes=100, ttl_seconds=60)
+    cache.put("a", 1, b"x")
+    assert cache.get("a", 2) is None
+    assert cache.stats.invalidations == 1
+    snap = cache.snapshot()
+    assert snap["entries"] == 0 and snap["data_version"] == 2
+
+
+def test_versioned_resource_builds_off_the_event_loop(monkeypatch):
+    from app import versioning
+
+    class _Version:
+        value = 1
+
+        async def current(self, session):
+            return self.value
+
+    version = _Version()
+    monkeypatch.setattr(versioning, "data_version", version)
+    threads = []
+
+    async def fetch(session):
+        return [version.value]
+
+    def build(rows):
+        threads.append(threading.current_thread())
+        return rows[0]
+
+    resource = versioning.VersionedResource(fetch, build)
+
+    async def run():
+        assert await resource.get(None) == 1
+        version.value = 2
+        assert await resource.get(None) == 2
+        assert await resource.get(None) == 2
+
+    asyncio.run(run())
+    assert len(threads) == 2 and threading.main_thread() not in threads
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import asyncio
+
+import orjson
+import pytest
+
+from app.cache import normalize_drg
+from app.columnar import ProviderColumns, _fetch_provider_rows
+from app.config import settings
+from app.pagination import NEXT_CURSOR_HEADER, InvalidCursor, decode_cursor, encode_cursor
+from app.queries import drg_cache_key
+
+from tests.factories import provider_row
+
+
+def test_search_filters_orders_and_breaks_ties():
+    columns = ProviderColumns(
+        [
+            provider_row("300", "470 - MAJOR JOINT REPLACEMENT", 100.0, rating=4),
+            provider_row("200", "470 - MAJOR JOINT REPLACEMENT", 100.0),
+            provider_row("100", "470 - MAJOR JOINT REPLACEMENT", None),
+            provider_row("400", "470 - MAJOR JOINT REPLACEMENT", 50.0, lat=34.05, lon=-118.24),
+            provider_row("500", "194 - SIMPLE PNEUMONIA", 10.0),
+        ]
+    )
+    got, next_cursor = columns.search("470", 40.75, -73.99, 40)
+    assert next_cursor is None
+    assert [r["provider_id"] for r in got] == ["200", "300", "100"]
+    assert got[1]["rating"] == 4 and got[0]["rating"] is None
+    assert got[2]["average_covered_charges"] is None
+    assert got[0]["distance_km"] == pytest.approx(0.0, abs=1e-6)
+
+    assert [r["provider_id"] for r in columns.search([194], 40.75, -73.99, 40)[0]] == ["500"]
+    assert len(columns.search("", 40.75, -73.99, 5000)[0]) == 5
+    assert columns.search("999", 40.75, -73.99, 40) == ([], None)
+
+
+def test_search_filters_on_resolved_codes():
+    columns = ProviderColumns(
+        [
+            provider_row("100", "470 - MAJOR JOINT REPLACEMENT", 100.0),
+            provider_row("200", "291 - HEART FAILURE AND SHOCK WITH MCC", 50.0),
+            provider_row("300", "292 - HEART FAILURE AND SHOCK WITH CC", 20.0),
+        ]
+    )
+    # Resolved codes come best match first; rows still follow the sort order
+    assert [r["provider_id"] for r in columns.search([292, 291], 40.75, -73.99, 40)[0]] == ["300", "200"]
+    assert columns.search([999], 40.75, -73.99, 40) == ([], None)
+    # Free text is resolved by main.resolve_drg, as for SQL
+    with pytest.raises(ValueError):
+        columns.search("hart failure", 40.75, -73.99, 40)
+
+
+@pytest.mark.parametrize("sort", ["price", "distance", "rating"])
+def test_keyset_pages_cover_the_full_order(sort):
+    # Repeated prices, ratings and distances plus NULLs exercise every tie path
+    rows = [
+        provider_row(
+            f"{i:03d}",
+            "470 - MAJOR JOINT REPLACEMENT",
+            None if i % 7 == 0 else float(i % 5) * 10.0,
+            lat=40.0 + (i % 9) * 0.01,
+            lon=-74.0,
+            rating=None if i % 4 == 0 else i % 3 + 3,
+        )
+        for i in range(40)
+    ]
+    columns = ProviderColumns(rows)
+    full, _ = columns.search("470", 40.0, -74.0, 100, limit=1000, sort=sort)
+    query = ("470", sort)
+    seen, token = [], None
+    while True:
+        page, cursor = columns.search("470", 40.0, -74.0, 100, limit=6, sort=sort, after=decode_cursor(token, sort, query))
+        seen.extend(page)
+        if cursor is None:
+            break
+        token = encode_cursor(cursor, query)
+    assert [r["provider_id"] for r in seen] == [r["provider_id"] for r in full]
+    assert len(full) == 40
+
+
+def test_cursor_is_bound_to_its_search():
+    columns = ProviderColumns([provider_row("1", "470 - X", 1.0), provider_row("2", "470 - X", 2.0)])
+    _, cursor = columns.search("470", 40.75, -73.99, 40, limit=1)
+    token = encode_cursor(cursor, ("470", "10001"))
+    assert decode_cursor(token, "price", ("470", "10001")) == cursor
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token, "price", ("470", "10002"))
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token, "rating", ("470", "10001"))
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-a-cursor", "price", ("470", "10001"))
+
+
+@pytest.mark.parametrize("spatial_index", [True, False])
+def test_backends_serve_identical_pages(monkeypatch, spatial_index):
+    # Needs Postgres with the sample CSV loaded (python etl.py); skipped otherwise.
+    # Both backends run the real request path: resolve_drg, the spatial index
+    # (or the SQL radius filter) and keyset pagination through every page.
+    from app import main
+    from app.database import async_session_maker
+
+    monkeypatch.setattr(settings, "spatial_index_enabled", spatial_index)
+
+    async def pages(session, backend, drg, zip_code, lat, lon, radius, sort):
+        monkeypatch.setattr(settings, "search_backend", backend)
+        query = (drg_cache_key(normalize_drg(drg)), zip_code, radius, sort)
+        out, token = [], None
+        while True:
+            main.provider_cache.clear()
+            payload, headers = await main._provider_page(session, drg, zip_code, lat, lon, radius, sort, 25, token)
+            token = headers.get(NEXT_CURSOR_HEADER)
+            out.append((orjson.loads(payload), decode_cursor(token, sort, query)))
+            if token is None:
+                return out
+
+    async def compare():
+        async with async_session_maker() as session:
+            if len(await _fetch_provider_rows(session)) == 0:
+                pytest.skip("provider_search is empty")
+            for drg, zip_code, lat, lon, radius, sort in [
+                ("470", "10001", 40.7506, -73.9972, 40, "price"),
+                ("pneumonia", "10001", 40.7506, -73.9972, 100, "price"),
+                ("heart failure", "10001", 40.7506, -73.9972, 100, "distance"),
+                ("", "12207", 42.6526, -73.7562, 25, "rating"),
+                ("291", "13202", 43.0481, -76.1474, 500, "distance"),
+            ]:
+                sql = await pages(session, "sql", drg, zip_code, lat, lon, radius, sort)
+                memory = await pages(session, "memory", drg, zip_code, lat, lon, radius, sort)
+                assert len(memory) == len(sql)
+                for (mem_rows, mem_cursor), (sql_rows, sql_cursor) in zip(memory, sql):
+                    assert [r["provider_id"] for r in mem_rows] == [r["provider_id"] for r in sql_rows]
+                    for mem, row in zip(mem_rows, sql_rows):
+                        assert {k: v for k, v in mem.items() if k != "distance_km"} == {
+                            k: v for k, v in row.items() if k != "distance_km"
+                        }
+                        assert mem["distance_km"] == pytest.approx(row["distance_km"], abs=1e-6)
+                    # Price cursors hold the decimal text, distance cursors a float chord
+                    assert (mem_cursor is None) == (sql_cursor is None)
+                    if mem_cursor is not None:
+                        assert (mem_cursor.provider_id, mem_cursor.ms_drg_definition) == (
+                            sql_cursor.provider_id,
+                            sql_cursor.ms_drg_definition,
+                        )
+                        if mem_cursor.value is None or sql_cursor.value is None:
+                            assert mem_cursor.value == sql_cursor.value
+                        else:
+                            assert float(mem_cursor.value) == pytest.approx(float(sql_cursor.value), abs=1e-6)
+
+    try:
+        asyncio.run(compare())
+    except (OSError, ConnectionError) as exc:
+        pytest.skip(f"database not reachable: {exc}")
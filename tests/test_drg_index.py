@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from app.drg_index import DrgIndex, trigrams, word_similarity
+from app.drg_semantic import TfidfMatrix, features
+from benchmarks.generate import COMMON_DRGS
+
+
+DRGS = DrgIndex([(code, f"{code:03d} - {desc}") for code, desc, _ in COMMON_DRGS])
+
+
+def test_word_similarity_matches_pg_trgm():
+    # 0.8 is the example in the pg_trgm documentation
+    assert trigrams("cat") == ["  c", " ca", "cat", "at "]
+    assert word_similarity("word", "two words") == pytest.approx(0.8)
+    assert word_similarity("word", "word") == 1.0
+    assert word_similarity("", "word") == 0.0
+    assert word_similarity("knee replacment", "470 - MAJOR HIP AND KNEE JOINT REPLACEMENT") == pytest.approx(0.583333, abs=1e-6)
+
+
+def test_resolve_ranks_and_tolerates_typos():
+    assert DRGS.resolve("knee replacment") == [470]
+    assert DRGS.resolve("heart failure") == [291, 292]
+    assert DRGS.resolve("septicemia") == [871]
+    assert DRGS.resolve("DRG 194") == [194]
+    assert DRGS.resolve("zzzz") == []
+    # Substring matches are always kept, as with the old ILIKE
+    assert set(DRGS.resolve("hip")) == {470, 480, 481}
+    # ...but the term is literal text, not a LIKE pattern
+    assert DRGS.resolve("%") == [] and DRGS.resolve("_") == []
+    assert DRGS.resolve("h_p") == []
+
+
+def test_suggest_prefixes_then_typos():
+    assert [s["drg_code"] for s in DRGS.suggest("heart fa")] == [291, 292]
+    assert [s["drg_code"] for s in DRGS.suggest("pneu", limit=1)] == [193]
+    assert DRGS.suggest("47")[0] == {
+        "drg_code": 470,
+        "ms_drg_definition": "470 - MAJOR HIP AND KNEE JOINT REPLACEMENT OR REATTACHMENT OF LOWER EXTREMITY WITHOUT MCC",
+    }
+    assert [s["drg_code"] for s in DRGS.suggest("septcemia")][:1] == [871]
+    assert DRGS.suggest("  ") == []
+
+
+def test_tfidf_scores_are_cosines():
+    texts = ["heart failure and shock", "simple pneumonia", "heart attack"]
+    matrix = TfidfMatrix(texts)
+    dense = np.zeros((len(texts), matrix.n_features))
+    for r, text in enumerate(texts):
+        ids, weights = matrix._weights(features(text))
+        dense[r, ids] = weights
+    ids, weights = matrix._weights(features("heart pneumonia"))
+    query = np.zeros(matrix.n_features)
+    query[ids] = weights
+    assert np.allclose(matrix.scores("heart pneumonia"), dense @ query)
+    assert matrix.scores("simple pneumonia")[1] == pytest.approx(1.0)
+    assert not matrix.scores("zzz").any()
+
+
+def test_resolve_uses_synonyms_over_loose_trigram_matches():
+    assert DRGS.resolve("hip surgery") == [470, 480, 481]
+    assert DRGS.resolve("heart attack") == [280]
+    assert DRGS.resolve("blood infection") == [871]
+    assert DRGS.resolve("kidney infection") == [690]
+
+
+def test_generic_head_words_do_not_match_other_body_parts():
+    for term in ["eye surgery", "heart surgery", "shoulder surgery", "brain surgery"]:
+        assert 470 not in DRGS.resolve(term)
+    assert DRGS.resolve("heart surgery") == []
+    assert DRGS.resolve("hart failure") == [291, 292]
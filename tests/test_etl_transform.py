@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import pandas as pd
+
+from app.geo import ZipIndex
+from etl import (
+    EtlStats,
+    chunk_fingerprint,
+    chunk_keys,
+    clean_money,
+    clean_money_series,
+    current_chunk,
+    stable_rating_from_provider_id,
+    stable_ratings,
+    transform_chunk,
+)
+
+
+ZIPS = ZipIndex.from_frame(
+    pd.DataFrame({"postal_code": ["10001"], "latitude": [40.7484], "longitude": [-73.9967]})
+)
+
+
+def _chunk() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "Rndrng_Prvdr_CCN ": ["330001", "330001", "330002", None],
+            "Rndrng_Prvdr_Org_Name": [" Hospital A ", "Hospital A", "Hospital B", "Orphan"],
+            "Rndrng_Prvdr_City": ["New York", "New York", None, "X"],
+            "Rndrng_Prvdr_State_Abrvtn": ["NY", "NY", "NY", "NY"],
+            "Rndrng_Prvdr_Zip5": ["10001", "10001", "99999", "10001"],
+            "DRG_Cd": ["470", "291", "470", "470"],
+            "DRG_Desc": ["MAJOR JOINT", "HEART FAILURE", None, "MAJOR JOINT"],
+            "Tot_Dschrgs": ["12", "0", None, "5"],
+            "Avg_Submtd_Cvrd_Chrg": ["$84,621.50", "1000", "nan", "1"],
+            "Avg_Tot_Pymt_Amt": ["$20,000", None, "", "1"],
+            "Avg_Mdcr_Pymt_Amt": ["15000.25", "x", "3", "1"],
+        }
+    )
+
+
+def test_money_and_ratings_match_scalar_helpers():
+    values = pd.Series(["$84,621.50", "nan", "", None, "-12", "abc"])
+    expected = [clean_money(v) for v in values]
+    got = clean_money_series(values).tolist()
+    assert [g if g == g else None for g in got] == expected
+    ids = pd.Series(["330001", "10", "", "999999"])
+    assert stable_ratings(ids).tolist() == [stable_rating_from_provider_id(i) for i in ids]
+
+
+def test_transform_chunk_builds_load_ready_batches():
+    seen: set[str] = set()
+    batch = transform_chunk(_chunk(), ZIPS, seen)
+    assert batch.rows_read == 4
+    providers = batch.records("providers")
+    assert [p["provider_id"] for p in providers] == ["330001", "330002"]
+    assert providers[0]["name"] == "Hospital A"
+    assert (providers[0]["latitude"], providers[0]["longitude"]) == (40.7484, -73.9967)
+    assert providers[1]["city"] is None and providers[1]["latitude"] is None
+    assert seen == {"330001", "330002"}
+
+    procedures = batch.records("procedures")
+    assert all(isinstance(p.pop("row_hash"), int) for p in procedures)
+    assert [p["ms_drg_definition"] for p in procedures] == ["291 - HEART FAILURE", "470 - MAJOR JOINT", "470"]
+    assert procedures[1] == {
+        "provider_id": "330001",
+        "ms_drg_definition": "470 - MAJOR JOINT",
+        "drg_code": 470,
+        "total_discharges": 12,
+        "average_covered_charges": 84621.5,
+        "average_total_payments": 20000.0,
+        "average_medicare_payments": 15000.25,
+    }
+    assert procedures[0]["total_discharges"] is None
+    assert batch.records("drgs") == [
+        {"drg_code": 291, "description": "HEART FAILURE", "ms_drg_definition": "291 - HEART FAILURE"},
+        {"drg_code": 470, "description": "MAJOR JOINT", "ms_drg_definition": "470 - MAJOR JOINT"},
+    ]
+
+    # Providers already seen in an earlier chunk are not emitted again
+    again = transform_chunk(_chunk(), ZIPS, seen)
+    assert again.records("providers") == [] and len(again.records("procedures")) == 3
+
+
+def test_fingerprints_track_content_changes():
+    original = _chunk()
+    edited = _chunk()
+    edited.loc[0, "Avg_Submtd_Cvrd_Chrg"] = "$90,000.00"
+    assert chunk_fingerprint(original) == chunk_fingerprint(_chunk())
+    assert chunk_fingerprint(original) != chunk_fingerprint(edited)
+
+    before = transform_chunk(original, ZIPS).procedures.set_index("ms_drg_definition")["row_hash"]
+    after = transform_chunk(edited, ZIPS).procedures.set_index("ms_drg_definition")["row_hash"]
+    changed = before[before != after].index.tolist()
+    assert changed == ["470 - MAJOR JOINT"]
+
+    keys = chunk_keys(original)
+    assert len(keys) == 3 and set(keys["provider_id"]) == {"330001", "330002"}
+
+
+def test_profile_attributes_stages_to_chunks():
+    stats = EtlStats(profile=True)
+    for index in (0, 1):
+        current_chunk.set(index)
+        with stats.stage("read"):
+            chunk = _chunk()
+        stats.chunk(index).rows = len(chunk)
+        with stats.stage("transform", len(chunk)):
+            transform_chunk(chunk, ZIPS, stats=stats)
+        stats.chunk_done(index)
+    current_chunk.set(None)
+
+    assert set(stats.chunks) == {0, 1}
+    assert set(stats.chunks[1].stages) == {"read", "transform", "geocode", "clean_money"}
+    assert stats.stages["clean_money"].rows == 6 and stats.stages["transform"].rows == 8
+    assert stats.chunks[1].finished >= stats.chunks[1].started
+    profile = stats.profile_dict()
+    assert [c["index"] for c in profile["chunks"]] == [0, 1]
+    assert "clean_money" in stats.profile_report()
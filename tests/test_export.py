@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import csv
+import io
+from decimal import Decimal
+
+import orjson
+
+from app.export import EXPORT_COLUMNS, encode_csv, encode_ndjson
+
+
+def _row(provider_id, charges, rating=None):
+    # provider_search_stmt row: ProviderResult columns (float prices), then sort_key
+    return (
+        provider_id,
+        f"Hospital, {provider_id}",
+        "NEW YORK",
+        "NY",
+        "10001",
+        "470 - MAJOR JOINT REPLACEMENT",
+        charges,
+        None,
+        1.5,
+        rating,
+        2.5,
+        Decimal(str(charges)),
+    )
+
+
+def test_ndjson_one_object_per_line():
+    body = encode_ndjson([_row("1", 100.25, 4), _row("2", 99.0)])
+    lines = [orjson.loads(line) for line in body.splitlines()]
+    assert [line["provider_id"] for line in lines] == ["1", "2"]
+    assert lines[0]["average_covered_charges"] == 100.25
+    assert lines[1]["rating"] is None and list(lines[0]) == list(EXPORT_COLUMNS)
+
+
+def test_csv_header_once_and_quoted_fields():
+    body = encode_csv([], header=True) + encode_csv([_row("1", 100.25)]) + encode_csv([_row("2", 5.0)])
+    rows = list(csv.reader(io.StringIO(body.decode())))
+    assert rows[0] == list(EXPORT_COLUMNS)
+    assert [r[0] for r in rows[1:]] == ["1", "2"]
+    assert rows[1][1] == "Hospital, 1"
+    assert rows[1][7] == ""
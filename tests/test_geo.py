@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import math
+
+import pandas as pd
+
+from app.geo import ZipIndex
+
+
+def _sample_index() -> ZipIndex:
+    frame = pd.DataFrame(
+        {
+            "postal_code": ["10001", "00501", "99950", "1234", "10002"],
+            "latitude": [40.7484, 40.8154, 55.5422, 1.0, None],
+            "longitude": [-73.9967, -73.0451, -131.4316, 1.0, None],
+        }
+    )
+    return ZipIndex.from_frame(frame)
+
+
+def test_lookup_known_and_unknown():
+    index = _sample_index()
+    assert index.lookup("10001") == (40.7484, -73.9967)
+    assert index.lookup("00501") == (40.8154, -73.0451)
+    assert index.lookup("10002") is None  # present but without coordinates
+    assert index.lookup("12345") is None
+    assert index.lookup("abcde") is None
+    assert index.lookup("1234") is None
+    assert len(index) == 3
+
+
+def test_snapshot_roundtrip_is_memory_mapped(tmp_path):
+    path = tmp_path / "zips.npy"
+    _sample_index().save(path)
+    loaded = ZipIndex.load(path)
+    assert loaded.lookup("99950") == (55.5422, -131.4316)
+    assert not loaded.table.flags.writeable
+
+
+def test_lookup_many_matches_scalar_lookup():
+    index = _sample_index()
+    lat, lon = index.lookup_many(["10001", None, "99950", "bad"])
+    assert lat[0] == 40.7484 and lon[2] == -131.4316
+    assert math.isnan(lat[1]) and math.isnan(lon[3])
+
+
+def test_non_ascii_digits_are_malformed():
+    index = _sample_index()
+    assert index.lookup("1000²") is None
+    assert index.lookup("１０００１") is None
+    lat, _ = index.lookup_many(["1000²", "10001"])
+    assert math.isnan(lat[0]) and lat[1] == 40.7484
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.metrics import MetricsMiddleware, render, timed
+
+
+def _count(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(f"{name}_count", labels) or 0.0
+
+
+def test_requests_labelled_by_route_template_and_status():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        if item_id == 0:
+            raise HTTPException(status_code=404)
+        return {"id": item_id}
+
+    client = TestClient(app)
+    ok = dict(method="GET", route="/items/{item_id}", status="200")
+    missing = dict(method="GET", route="/items/{item_id}", status="404")
+    other = dict(method="GET", route="other", status="404")
+    before = (_count("http_request_duration_seconds", **ok), _count("http_request_duration_seconds", **missing))
+    before_other = _count("http_request_duration_seconds", **other)
+
+    client.get("/items/1")
+    client.get("/items/2")
+    client.get("/items/0")
+    client.get("/nowhere")
+
+    assert _count("http_request_duration_seconds", **ok) == before[0] + 2
+    assert _count("http_request_duration_seconds", **missing) == before[1] + 1
+    assert _count("http_request_duration_seconds", **other) == before_other + 1
+
+
+def test_stage_timer_and_exposition():
+    before = _count("app_stage_duration_seconds", stage="geocode")
+    with timed("geocode"):
+        pass
+    assert _count("app_stage_duration_seconds", stage="geocode") == before + 1
+    body, content_type = render()
+    assert content_type.startswith("text/plain")
+    assert b'app_stage_duration_seconds_bucket{le="0.0001",stage="geocode"}' in body
+
+
+def test_etl_stage_rows_exported():
+    from etl import EtlStats
+
+    before = REGISTRY.get_sample_value("etl_rows_total", {"stage": "transform"}) or 0.0
+    stats = EtlStats()
+    with stats.stage("transform", 5000):
+        pass
+    stats.add_rows("transform", 10)
+    assert stats.stages["transform"].rows == 5010
+    assert REGISTRY.get_sample_value("etl_rows_total", {"stage": "transform"}) == before + 5010
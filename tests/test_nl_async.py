@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app import nl
+from app.config import settings
+from app.nl_cache import NLParseCache, normalize_question
+
+
+class _StubLLMHandler(BaseHTTPRequestHandler):
+    # Minimal stand-in for POST /v1/chat/completions
+    delay = 0.0
+    calls = 0
+    payload = {"intent": "best_rated", "drg_query": "470", "zip_code": "10001", "radius_km": 25, "top_k": 5}
+
+    def do_POST(self):  # noqa: N802
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        type(self).calls += 1
+        time.sleep(self.delay)
+        body = json.dumps(
+            {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": 0,
+                "model": "stub",
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": json.dumps(self.payload)},
+                    }
+                ],
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def stub_llm(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubLLMHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "openai_base_url", f"http://127.0.0.1:{server.server_port}/v1")
+    monkeypatch.setattr(settings, "nl_timeout_seconds", 0.5)
+    monkeypatch.setattr(_StubLLMHandler, "delay", 0.0)
+    monkeypatch.setattr(_StubLLMHandler, "calls", 0)
+    monkeypatch.setattr(nl, "parse_cache", NLParseCache(max_entries=100, version="test"))
+    yield _StubLLMHandler
+    server.shutdown()
+    server.server_close()
+
+
+async def _extract(question: str) -> nl.NLParams:
+    try:
+        return await nl.extract_params_async(question)
+    finally:
+        await nl.aclose_async_client()
+
+
+def test_async_extraction_uses_llm(stub_llm):
+    params = asyncio.run(_extract("Best hospitals for DRG 470 near 10001?"))
+    assert params.intent == "best_rated"
+    assert params.drg_query == "470"
+    assert params.zip_code == "10001"
+    assert params.radius_km == 25
+    assert params.top_k == 5
+
+
+def test_budget_exceeded_falls_back_to_regex(stub_llm):
+    stub_llm.delay = 2.0
+    start = time.monotonic()
+    params = asyncio.run(_extract("Cheapest DRG 291 within 10 km of 10032"))
+    assert time.monotonic() - start < 1.5
+    assert params.intent == "cheapest"
+    assert params.drg_query == "291"
+    assert params.zip_code == "10032"
+    assert params.radius_km == 10
+
+
+def test_slow_llm_does_not_block_event_loop(stub_llm):
+    stub_llm.delay = 0.3
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        await _extract("Best DRG 470 near 10001")
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(scenario()) >= 10
+
+
+def test_repeated_question_is_served_from_cache(stub_llm):
+    first = asyncio.run(_extract("Best hospitals for DRG 470 near 10001?"))
+    second = asyncio.run(_extract("  best hospitals, for drg 470 near 10001 "))
+    assert first == second
+    assert stub_llm.calls == 1
+
+
+def test_persistent_cache_survives_restart_and_prompt_change(tmp_path):
+    path = str(tmp_path / "nl.sqlite")
+    params = {"intent": "cheapest", "drg_query": "470", "zip_code": "10001", "radius_km": 40, "top_k": 3}
+
+    async def scenario():
+        cache = NLParseCache(max_entries=10, version="v1", path=path)
+        await cache.put("Cheapest DRG 470 near 10001?", params)
+        cache.close()
+        reopened = NLParseCache(max_entries=10, version="v1", path=path)
+        hit = await reopened.get("cheapest drg 470 near 10001")
+        reopened.close()
+        changed = NLParseCache(max_entries=10, version="v2", path=path)
+        miss = await changed.get("cheapest drg 470 near 10001")
+        changed.close()
+        return hit, miss
+
+    hit, miss = asyncio.run(scenario())
+    assert hit == params
+    assert miss is None
+    assert normalize_question("DRG-470!!") == "drg 470"
+
+
+def test_fallback_parse_keeps_procedure_text():
+    params = nl._fallback_parse("Who is cheapest for hip surgery within 5 miles of 10001?")
+    assert params.drg_query == "hip surgery" and params.zip_code == "10001" and params.radius_km == 8
+    assert nl._fallback_parse("Average cost of DRG 470 near 10001").drg_query == "470"
+    assert nl._fallback_parse("cheapest hospital near 10001").drg_query is None
+    assert params.drg_guessed and not nl._fallback_parse("DRG 470 near 10001").drg_guessed
+
+
+def test_fallback_parse_ignores_question_words():
+    for question in [
+        "What's the cheapest hospital near 10001?",
+        "Tell me the cheapest hospital near 10001",
+        "Which hospital is closest to 10001?",
+        "Show me top-rated hospitals within 10 miles of 10001",
+        "What\u2019s the best place near 10001?",
+    ]:
+        assert nl._fallback_parse(question).drg_query is None, question
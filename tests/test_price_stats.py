@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.price_stats import HIST_RATIO, PriceSummary, covering_cells, grid_cell
+from app.spatial import haversine_km
+
+
+def test_covering_cells_split_inside_and_edge():
+    rng = np.random.default_rng(3)
+    lat0, lon0, radius = 40.75, -73.99, 150
+    inside, edge = covering_cells(lat0, lon0, radius)
+    assert inside and edge and not set(inside) & set(edge)
+    lats = rng.uniform(38, 43.5, 20000)
+    lons = rng.uniform(-77.5, -70.5, 20000)
+    dist = haversine_km(lat0, lon0, lats, lons)
+    cells = np.array([grid_cell(a, b) for a, b in zip(lats, lons)])
+    # Every point within the radius is in a covering cell; inside cells hold no point beyond it
+    assert set(cells[dist <= radius]) <= set(inside) | set(edge)
+    assert np.all(dist[np.isin(cells, inside)] <= radius)
+
+
+def test_summaries_merge_like_the_raw_rows():
+    rng = np.random.default_rng(5)
+    charges = rng.lognormal(11, 0.6, 500)
+    discharges = rng.integers(0, 60, 500)
+
+    whole = PriceSummary()
+    whole.add_prices(charges, discharges)
+    merged = PriceSummary()
+    for part in np.array_split(np.arange(500), 7):
+        piece = PriceSummary()
+        piece.add_prices(charges[part], discharges[part])
+        merged.add_rollup(
+            SimpleNamespace(**{k: getattr(piece, k) for k in vars(piece) if k != "hist"},
+                            hist_buckets=list(piece.hist), hist_weights=list(piece.hist.values()))
+        )
+
+    assert merged.provider_count == 500 and merged.min_charges == charges.min()
+    assert np.isclose(merged.mean, charges.mean())
+    weights = np.where(discharges > 0, discharges, 1).astype(float)
+    assert np.isclose(merged.weighted_mean, np.average(charges, weights=weights))
+    order = np.argsort(charges)
+    cumulative = np.cumsum(weights[order])
+    exact_median = charges[order][np.searchsorted(cumulative, 0.5 * cumulative[-1])]
+    assert abs(np.log(merged.percentile(0.5) / exact_median)) <= np.log(HIST_RATIO)
+    assert merged.percentile(0.5) == whole.percentile(0.5)
+
+
+def test_summaries_name_the_cheapest_and_priciest_provider():
+    charges = [300.0, 100.0, 500.0, 100.0, 500.0, 200.0]
+    providers = [(f"{i:02d}", f"Hospital {i}") for i in (5, 4, 3, 2, 1, 0)]
+    whole = PriceSummary()
+    whole.add_prices(charges, [1] * 6, providers)
+    merged = PriceSummary()
+    for part in ([0, 1], [2, 3], [4, 5]):
+        piece = PriceSummary()
+        piece.add_prices([charges[i] for i in part], [1] * len(part), [providers[i] for i in part])
+        merged.add_rollup(
+            SimpleNamespace(**{k: getattr(piece, k) for k in vars(piece) if k != "hist"},
+                            hist_buckets=list(piece.hist), hist_weights=list(piece.hist.values()))
+        )
+    # Equal charges go to the lowest provider_id, as in cheapest_stmt()
+    for summary in (whole, merged):
+        assert (summary.min_charges, summary.cheapest_name) == (100.0, "Hospital 2")
+        assert (summary.max_charges, summary.priciest_name) == (500.0, "Hospital 1")
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.pagination import Cursor
+from app.queries import (
+    best_rated_stmt,
+    compare_costs_stmt,
+    drg_cache_key,
+    drg_condition,
+    parse_drg_code,
+    provider_search_query,
+    provider_search_stmt,
+    search_conditions,
+)
+
+
+def test_parse_drg_code():
+    assert parse_drg_code("470") == 470
+    assert parse_drg_code(" DRG 291 ") == 291
+    assert parse_drg_code("ms-drg 470") == 470
+    assert parse_drg_code("drg470") == 470
+    assert parse_drg_code("heart failure") is None
+    assert parse_drg_code("470 major joint") is None
+    assert parse_drg_code(None) is None
+
+
+def test_drg_condition_routes_codes_to_exact_match():
+    assert "provider_search.drg_code =" in str(drg_condition("DRG 470"))
+    # Free text is resolved in-process (DrgIndex.resolve) before it gets here
+    with pytest.raises(ValueError):
+        drg_condition("joint")
+    with pytest.raises(ValueError):
+        provider_search_query("joint", 40.75, -73.99, 25)
+    assert drg_cache_key("470") == drg_cache_key("drg 470")
+
+
+def test_ask_intents_are_single_sql_statements():
+    conditions = search_conditions("470", 40.75, -73.99, 25)
+    best = str(best_rated_stmt(conditions, 3).compile(dialect=postgresql.dialect()))
+    assert "DISTINCT ON (provider_search.provider_id)" in best and "LIMIT" in best
+    compare = str(compare_costs_stmt(conditions).compile(dialect=postgresql.dialect()))
+    assert compare.count("WITHIN GROUP") == 3
+    assert "array_agg(provider_search.name ORDER BY provider_search.average_covered_charges DESC)" in compare
+
+
+def test_prebuilt_shapes_match_fresh_statements():
+    dialect = postgresql.dialect()
+    cases = [
+        (("470", 40.75, -73.99, 25), {}),
+        (([469, 470], 40.75, -73.99, 25), {"sort": "distance", "after": Cursor("distance", 12.5, "330", "470 - X")}),
+        (("", 40.75, -73.99, 25), {"sort": "rating", "after": Cursor("rating", None, "330", "470 - X"), "provider_ids": ["1"]}),
+        (("291", 42.65, -73.75, 100), {"after": Cursor("price", "1500.25", "330", "291 - Y"), "limit": None}),
+        (([292, 291], 42.65, -73.75, 100), {"sort": "rating", "after": Cursor("rating", 4, "330", "291 - Y")}),
+    ]
+    for args, kwargs in cases:
+        fresh = provider_search_stmt(*args, **kwargs).compile(dialect=dialect)
+        stmt, params = provider_search_query(*args, **kwargs)
+        compiled = stmt.compile(dialect=dialect)
+        assert compiled.string == fresh.string
+        assert compiled.construct_params(params) == fresh.params
+        # Same shape, different values: the very same statement object
+        assert provider_search_query(args[0], 10.0, 20.0, 5, **kwargs)[0] is stmt
+
+
+def test_resolved_codes_page_each_code_from_its_index_range():
+    dialect = postgresql.dialect()
+    stmt, params = provider_search_query([470, 469], 40.75, -73.99, 25)
+    compiled = stmt.compile(dialect=dialect)
+    # One ordered, limited scan per code, merged; not a sort of every match
+    assert "FROM unnest(%(drg_codes)s::INTEGER[]) AS drg_codes(code) JOIN LATERAL" in compiled.string
+    assert "WHERE provider_search.drg_code = drg_codes.code" in compiled.string
+    assert compiled.string.count("LIMIT %(limit)s") == 2
+    assert compiled.construct_params(params)["drg_codes"] == [470, 469]
+    assert compiled.string == provider_search_stmt([470, 469], 40.75, -73.99, 25).compile(dialect=dialect).string
+    assert provider_search_query([194], 1.0, 2.0, 5)[0] is stmt
+    # Distance (KNN) and unlimited exports filter all codes at once
+    for kwargs in ({"sort": "distance"}, {"limit": None}):
+        text = provider_search_query([470, 469], 40.75, -73.99, 25, **kwargs)[0].compile(dialect=dialect).string
+        assert "provider_search.drg_code = ANY (%(drg_codes)s" in text and "LATERAL" not in text
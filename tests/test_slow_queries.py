@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import asyncio
+from decimal import Decimal
+
+import pytest
+
+from app.slow_queries import SlowQueryLog, current_request
+
+
+class _Route:
+    path = "/providers"
+
+
+def test_slow_query_captured_with_route_and_plan():
+    explained = []
+
+    async def explain(statement, parameters):
+        explained.append((statement, parameters))
+        return ["Limit  (cost=0.42..8.44 rows=1 width=64) (actual time=0.010..0.011 rows=1 loops=1)"]
+
+    log = SlowQueryLog(threshold_ms=100, sample_rate=1.0, max_entries=2, explain=explain)
+
+    async def run():
+        current_request.set(
+            {"method": "GET", "path": "/providers", "route": _Route(), "query_string": b"drg=470&zip=10001&radius_km=500"}
+        )
+        assert log.observe("SELECT 1", (), 5.0) is None  # under the threshold
+        entry = log.observe("SELECT * FROM provider_search WHERE drg_code = $1", (470, Decimal("1.50")), 812.0)
+        await asyncio.gather(*log._tasks)
+        return entry
+
+    entry = asyncio.run(run())
+    assert entry.route == "/providers" and entry.query_params["radius_km"] == "500"
+    assert entry.parameters == [470, "1.50"]
+    assert entry.status == "explained" and entry.plan[0].startswith("Limit")
+    assert explained == [("SELECT * FROM provider_search WHERE drg_code = $1", (470, Decimal("1.50")))]
+    snap = log.snapshot()
+    assert snap["statements"] == 2 and snap["slow"] == 1 and len(snap["entries"]) == 1
+
+
+def test_ring_buffer_keeps_newest_and_skips_writes():
+    log = SlowQueryLog(threshold_ms=0, sample_rate=1.0, max_entries=2)
+    log.observe("SELECT 1", (), 1.0)
+    log.observe("SELECT 2", (), 1.0)
+    log.observe("UPDATE data_version SET version = version + 1", (), 1.0)
+    entries = log.snapshot()["entries"]
+    assert [e["statement"][:6] for e in entries] == ["UPDATE", "SELECT"]
+    assert entries[0]["status"] == "not_explainable" and entries[0]["route"] is None
+
+
+def test_admin_endpoints_need_a_configured_token(monkeypatch):
+    from fastapi import HTTPException
+
+    from app.config import settings
+    from app.main import require_admin
+
+    monkeypatch.setattr(settings, "admin_token", None)
+    with pytest.raises(HTTPException):
+        require_admin(None)
+    monkeypatch.setattr(settings, "admin_token", "s3cret")
+    for token in (None, "", "s3cre", "S3CRET"):
+        with pytest.raises(HTTPException):
+            require_admin(token)
+    require_admin("s3cret")
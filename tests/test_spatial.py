@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import numpy as np
+
+from app.spatial import SpatialIndex, haversine_km
+
+
+def _points(n: int = 5000, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    lats = np.concatenate([rng.uniform(24, 49, n), rng.uniform(60, 89.9, 200), [0.0, 0.1]])
+    lons = np.concatenate([rng.uniform(-125, -66, n), rng.uniform(-180, 180, 200), [179.9, -179.9]])
+    ids = [f"P{i:05d}" for i in range(len(lats))]
+    return ids, lats, lons
+
+
+def test_within_matches_brute_force():
+    ids, lats, lons = _points()
+    index = SpatialIndex(ids, lats, lons, cell_deg=0.5)
+    for lat, lon, radius in [(40.75, -73.99, 40), (40.75, -73.99, 500), (45.0, -100.0, 1), (85.0, 10.0, 500), (0.05, 180.0, 30)]:
+        got_ids, got_dist = index.within(lat, lon, radius)
+        dist = haversine_km(lat, lon, lats, lons)
+        expected = {ids[i] for i in np.flatnonzero(dist <= radius)}
+        assert set(got_ids) == expected
+        assert np.all(np.diff(got_dist) >= 0)
+        assert np.all(got_dist <= radius)
+
+
+def test_wraps_across_the_antimeridian():
+    index = SpatialIndex(["east", "west"], np.array([0.0, 0.0]), np.array([179.95, -179.95]))
+    got_ids, got_dist = index.within(0.0, 179.99, 20)
+    assert set(got_ids) == {"east", "west"}
+
+
+def test_empty_index():
+    index = SpatialIndex([], np.array([]), np.array([]))
+    got_ids, got_dist = index.within(40.0, -73.0, 100)
+    assert len(got_ids) == 0 and len(got_dist) == 0